@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+#
+# digital_circuit_async.py: asyncio co-simulation
+#
+# An AsyncSimulator drives a simulator from coroutines, next to other asyncio components (a
+# stimulus producer reading a socket or a file, a consumer checking the outputs):
+#
+# - await apply(values) sets the input groups
+# - await settle() runs the simulation loop in slices of a bounded number of events, and yields to
+#   the event loop between slices, so that a long cascade does not block the other tasks; it returns
+#   the output groups once the circuit has settled
+# - await settle(deliver=True) also delivers them to the output queue, and outputs() is an async
+#   iterator over the delivered output vectors, in order, until close()
+#
+# The output queue is bounded: a delivery waits while it is full, so that a producer faster than its
+# consumer is held back, and memory stays flat on an unbounded stimulus stream. drive() runs the
+# whole stream, delivering every output vector, and pulling a vector from a (sync or async)
+# iterable only when the previous one has been delivered:
+#
+#	asim = AsyncSimulator(sim, [x, y], [s])
+#
+#	async def check():
+#		async for vector, (total,) in asim.outputs():
+#			assert total == sum(vector)
+#
+#	await asyncio.gather( asim.drive(vectors), check() )
+
+import asyncio
+
+from digital_circuit_core import *
+
+
+# the end of the output stream
+_CLOSED = object()
+
+
+class AsyncSimulator(object):
+	""" An asyncio facade over a simulator, with a bounded queue of output vectors """
+
+	def __init__(self, sim, inputs, outputs, slice_events=1000, max_pending=16):
+		"""
+		:param sim: the simulator the circuit was built on
+		:param inputs: input wire groups
+		:param outputs: output wire groups
+		:param slice_events: maximum number of events run before yielding to the event loop
+		:param max_pending: maximum number of output vectors delivered and not yet consumed
+		:type sim: Simulator
+		:type inputs: list
+		:type outputs: list
+		:type slice_events: int
+		:type max_pending: int
+		"""
+		self.simulator = sim
+		self.input_groups = inputs
+		self.output_groups = outputs
+		self.slice_events = slice_events
+		self.max_pending = max_pending
+		self._queue = None
+		# the last vector applied
+		self.vector = None
+		self.events = 0
+		self.closed = False
+
+	@property
+	def queue(self):
+		""" The queue of the delivered output vectors, created in the running event loop on first use
+
+		:rtype: asyncio.Queue
+		"""
+		if self._queue is None:
+			self._queue = asyncio.Queue(self.max_pending)
+		return self._queue
+
+	async def apply(self, values):
+		""" Set the input groups: the gates they feed are scheduled, the simulation does not run
+
+		:param values: integers, one per input group
+		:type values: tuple
+		"""
+		if self.closed:
+			raise ValueError('the simulator is closed')
+		for wires, value in zip(self.input_groups, values):
+			self.simulator.set_wires(wires, value)
+		self.vector = tuple(values)
+
+	async def settle(self, deliver=False):
+		""" Run the simulation until the agenda is empty, in slices
+
+		:param deliver: also deliver the output vector to the consumers of outputs() (waiting while the output queue is full)
+		:type deliver: bool
+		:returns: the output vector (a tuple of integers, one per output group)
+		:rtype: tuple
+		"""
+		sim = self.simulator
+		while True:
+			self.events += sim.run( max_events=self.slice_events )
+			if sim.agenda.is_empty():
+				break
+			await asyncio.sleep(0)
+		result = tuple( sim.wires_to_integer(wires) for wires in self.output_groups )
+		if deliver:
+			await self.queue.put( (self.vector, result) )
+		return result
+
+	async def drive(self, vectors):
+		""" Apply and settle a stream of vectors, delivering the output vectors, then close the
+		    output stream
+
+		:param vectors: stimulus vectors (tuples of integers, one per input group)
+		:type vectors: iterable or async iterable
+		"""
+		try:
+			if hasattr(vectors, '__aiter__'):
+				async for vector in vectors:
+					await self.apply(vector)
+					await self.settle(deliver=True)
+			else:
+				for vector in vectors:
+					await self.apply(vector)
+					await self.settle(deliver=True)
+		finally:
+			await self.close()
+
+	async def close(self):
+		""" End the output stream: the iterators of outputs() stop once it is drained. Closing does
+		    not wait: if the queue is full, the iterators find it closed when they have emptied it. """
+		if not self.closed:
+			self.closed = True
+			if not self.queue.full():
+				# wakes up the iterators waiting for a vector
+				self.queue.put_nowait(_CLOSED)
+
+	async def outputs(self):
+		""" The output vectors, as they are delivered
+
+		:returns: (input vector, output vector) pairs
+		:rtype: async generator
+		"""
+		while True:
+			if self.closed and self.queue.empty():
+				return
+			item = await self.queue.get()
+			if item is _CLOSED:
+				# other iterators stop as well
+				self.queue.put_nowait(_CLOSED)
+				return
+			yield item
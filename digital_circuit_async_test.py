@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+#
+# digital_circuit_async_test.py: unit tests for the asyncio co-simulation
+
+import asyncio
+import itertools
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_async import *
+
+
+def adder(n):
+	sim = CircuitLibrary()
+	x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+	sim.RippleCarryAdder(x, y, s)
+	sim.propagate()
+	return AsyncSimulator(sim, [x, y], [s], slice_events=10, max_pending=4)
+
+
+class AsyncSimulatorUnitTest( unittest.TestCase ):
+
+	def testApplySettle(self):
+		asim = adder(8)
+		async def run():
+			await asim.apply( (200, 100) )
+			return await asim.settle()
+		self.assertEqual( asyncio.run(run()), (300,) )
+		self.assertGreater( asim.events, asim.slice_events )
+
+	def testWithoutConsumer(self):
+		""" Settling without delivering never waits for a consumer """
+		asim = adder(4)
+		async def run():
+			results = []
+			for v in range( 3*asim.max_pending ):
+				await asim.apply( (v % 16, 1) )
+				results.append( await asim.settle() )
+			await asim.close()
+			remaining = [ item async for item in asim.outputs() ]
+			return results, remaining
+		results, remaining = asyncio.run( asyncio.wait_for(run(), 10) )
+		self.assertEqual( results, [ (v % 16 + 1,) for v in range( 3*asim.max_pending ) ] )
+		self.assertEqual( remaining, [] )
+
+	def testCloseFullQueue(self):
+		""" Closing does not wait for the queue to be drained """
+		asim = adder(4)
+		async def run():
+			for v in range(asim.max_pending):
+				await asim.apply( (v, v) )
+				await asim.settle(deliver=True)
+			await asim.close()
+			return [ outputs for vector, outputs in [ item async for item in asim.outputs() ] ]
+		self.assertEqual( asyncio.run( asyncio.wait_for(run(), 10) ), [ (2*v,) for v in range(4) ] )
+
+	def testStream(self):
+		""" A producer and a consumer, through an async iterator of vectors """
+		asim = adder(6)
+		rng = random.Random(4)
+		vectors = [ (rng.getrandbits(6), rng.getrandbits(6)) for i in range(50) ]
+		async def produce():
+			for vector in vectors:
+				await asyncio.sleep(0)
+				yield vector
+		async def consume():
+			return [ item async for item in asim.outputs() ]
+		async def run():
+			results = await asyncio.gather( asim.drive(produce()), consume() )
+			return results[1]
+		self.assertEqual( asyncio.run(run()), [ (v, (sum(v),)) for v in vectors ] )
+
+	def testYields(self):
+		""" A long settle lets the other tasks run between slices """
+		asim = adder(32)
+		ticks = []
+		async def ticker():
+			while True:
+				ticks.append(1)
+				await asyncio.sleep(0)
+		async def run():
+			task = asyncio.ensure_future(ticker())
+			await asim.apply( (2**32-1, 1) )
+			result = await asim.settle()
+			task.cancel()
+			return result
+		self.assertEqual( asyncio.run(run()), (2**32,) )
+		self.assertGreater( len(ticks), 10 )
+
+	def testBackpressure(self):
+		""" An unbounded stimulus stream, and a slow consumer: the queue stays bounded """
+		asim = adder(4)
+		sizes = []
+		async def consume():
+			results = []
+			async for vector, outputs in asim.outputs():
+				sizes.append( asim.queue.qsize() )
+				results.append( outputs[0] == sum(vector) )
+				if len(results) == 200:
+					break
+				await asyncio.sleep(0)
+			return results
+		async def run():
+			driver = asyncio.ensure_future( asim.drive( (i % 16, i // 16 % 16) for i in itertools.count() ))
+			results = await consume()
+			driver.cancel()
+			return results
+		results = asyncio.run(run())
+		self.assertTrue( all(results) )
+		self.assertLessEqual( max(sizes), 4 )
+
+	def testClose(self):
+		asim = adder(2)
+		async def run():
+			await asim.drive( [ (1, 2), (3, 3) ] )
+			first = [ item async for item in asim.outputs() ]
+			second = [ item async for item in asim.outputs() ]
+			return first, second
+		first, second = asyncio.run(run())
+		self.assertEqual( first, [ ((1, 2), (3,)), ((3, 3), (6,)) ] )
+		self.assertEqual( second, [] )
+		self.assertRaises( ValueError, asyncio.run, asim.apply( (0, 0) ))
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,1003 @@
+#!/usr/bin/python3
+#
+# digital_circuit_bench.py: benchmarks for the digital circuit simulator
+#
+# Usage: python3 digital_circuit_bench.py [--json results.json] [benchmark...]
+
+import sys
+import time
+import random
+import collections
+import gc
+import tracemalloc
+import tempfile
+import os
+import json
+import platform
+import asyncio
+
+from digital_circuit_core import *
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_levelized import LevelizedEvaluator
+from digital_circuit_parallel import BitParallelEvaluator
+from digital_circuit_netlist_io import read_blif, read_verilog, write_verilog
+from digital_circuit_waveform import VCDWriter, BinaryWaveformWriter
+from digital_circuit_bus import BusSimulator
+from digital_circuit_timing import TimingAnalysis
+from digital_circuit_optimize import optimize
+from digital_circuit_template import ripple_carry_adder, template_for
+from digital_circuit_codegen import CompiledEvaluator
+from digital_circuit_sweep import Sweep
+from digital_circuit_stimulus import compare_orders, exhaustive_vectors, minimum_toggle_order
+from digital_circuit_async import AsyncSimulator
+
+
+def _schedule_vectors(sim, wire_groups, vectors, period, rng):
+	""" Schedule a train of random input vectors, one every `period` time units, ahead of the simulation.
+
+	:param wire_groups: a list of wire arrays, each receiving a random integer per vector
+	:type wire_groups: list
+	"""
+	start = sim.agenda.current_time
+	for v in range(vectors):
+		values = [ rng.getrandbits(len(g)) for g in wire_groups ]
+		def apply_vector(values=values):
+			for g, value in zip(wire_groups, values):
+				sim.set_wires(g, value)
+		sim.agenda.add( start + (v+1)*period, Action(apply_vector, 'stimulus', v) )
+
+
+def bench_agenda(agenda_classes=None, sizes=None, vectors=200, period=7, seed=0):
+	""" Events/sec of a n-bit ripple-carry adder driven by a long stimulus train,
+	for each agenda backend and adder width.
+
+	The whole stimulus is scheduled upfront, but the gate events land a few time units ahead of
+	the current time, at the front of the pending time segments: the linear agenda's scan stays
+	short, and all the backends run at roughly flat rates as the adder grows. This measures the
+	simulation loop; bench_agenda_hold() measures insertion among many pending segments.
+
+	:param agenda_classes: agenda backends to compare (default: all of them)
+	:param sizes: adder widths
+	:param vectors: number of random input vectors applied to each adder
+	:param period: time between two successive vectors
+	:type agenda_classes: list
+	:type sizes: list
+	:type vectors: int
+	:type period: int
+	:returns: a list of dictionaries (agenda, bits, events, seconds, events_per_sec)
+	:rtype: list
+	"""
+	if agenda_classes is None:
+		agenda_classes = [ LinearAgenda, Agenda, CalendarAgenda ]
+	if sizes is None:
+		sizes = [ 8, 16, 32, 48 ]
+
+	results = []
+	for agenda_class in agenda_classes:
+		for n in sizes:
+			rng = random.Random(seed)
+			sim = CircuitLibrary( agenda_class )
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			sim.RippleCarryAdder(x, y, s)
+			sim.run()
+
+			start = time.perf_counter()
+			_schedule_vectors(sim, [x, y], vectors, period, rng)
+			events = sim.run()
+			seconds = time.perf_counter() - start
+			results.append({ 'agenda': agenda_class.__name__, 'bits': n, 'events': events,
+					'seconds': seconds, 'events_per_sec': events/seconds if seconds else 0.0 })
+	return results
+
+
+def bench_agenda_hold(agenda_classes=None, sizes=None, operations=5000, seed=0):
+	""" Operations/sec of the agenda backends alone, in the hold model: with n items pending, each
+	operation removes the first item, and inserts a new one at a uniformly random delay in
+	[1, 2n]. The delays are spread, so that about n distinct time segments stay pending: the
+	linear agenda, which scans the segments on every insertion, slows down in proportion to n;
+	the heap and calendar agendas do not.
+
+	:param agenda_classes: agenda backends to compare (default: all of them)
+	:param sizes: numbers of pending items
+	:param operations: number of remove/insert operations timed
+	:type agenda_classes: list
+	:type sizes: list
+	:type operations: int
+	:returns: a list of dictionaries (agenda, pending, segments, operations, seconds, ops_per_sec)
+	:rtype: list
+	"""
+	if agenda_classes is None:
+		agenda_classes = [ LinearAgenda, Agenda, CalendarAgenda ]
+	if sizes is None:
+		sizes = [ 100, 1000, 10000 ]
+
+	results = []
+	for agenda_class in agenda_classes:
+		for n in sizes:
+			rng = random.Random(seed)
+			agenda = agenda_class()
+			for i in range(n):
+				agenda.add( rng.randint(1, 2*n), i )
+			delays = [ rng.randint(1, 2*n) for i in range(operations) ]
+			start = time.perf_counter()
+			for delay in delays:
+				agenda.pop_first()
+				agenda.add( agenda.current_time + delay, 0 )
+			seconds = time.perf_counter() - start
+			results.append({ 'agenda': agenda_class.__name__, 'pending': n, 'segments': agenda.segment_count(),
+					'operations': operations, 'seconds': seconds, 'ops_per_sec': operations/seconds })
+	return results
+
+
+class FixedQueue():
+	""" The original, fixed-size circular queue of the agenda's time segments, for comparison
+	    (it raises OverflowException once full) """
+
+	def __init__(self,size=None):
+		if size is None:
+			size=100
+		self.tail=0
+		self.head=0
+		self.array=[None]*size
+
+	def is_empty(self):
+		return self.head==self.tail
+
+	def enqueue(self, x):
+		if (self.head==0 and self.tail==len(self.array)-1) or (self.tail+1==self.head):
+			raise OverflowException()
+		self.array[self.tail] = x
+		if self.tail == len(self.array)-1:
+			self.tail = 0
+		else:
+			self.tail = self.tail + 1
+
+	def dequeue(self):
+		if (self.head==self.tail):
+			raise UnderflowException()
+		x = self.array[self.head]
+		if self.head == len( self.array)-1:
+			self.head=0
+		else:
+			self.head = self.head+1
+		return x
+
+
+def bench_queue(sizes=None, rounds=2):
+	""" Enqueue n actions in one time segment, then dequeue them all: time per operation for
+	the growable Queue, the original fixed-size queue (preallocated to n+1 slots, since it cannot grow),
+	and collections.deque.
+
+	:param sizes: numbers of actions per time segment (up to 10**7 is practical)
+	:param rounds: number of fill/empty cycles for each queue
+	:type sizes: list
+	:type rounds: int
+	:returns: a list of dictionaries (queue, n, seconds, ns_per_op)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 10**3, 10**4, 10**5, 10**6 ]
+
+	def run_queue(q, n):
+		enqueue, dequeue = q.enqueue, q.dequeue
+		for r in range(rounds):
+			for i in range(n):
+				enqueue(i)
+			for i in range(n):
+				dequeue()
+
+	def run_deque(q, n):
+		append, popleft = q.append, q.popleft
+		for r in range(rounds):
+			for i in range(n):
+				append(i)
+			for i in range(n):
+				popleft()
+
+	results = []
+	for n in sizes:
+		for name, make, run in [ ('Queue', lambda: Queue(), run_queue),
+					('FixedQueue', lambda: FixedQueue(n+1), run_queue),
+					('deque', lambda: collections.deque(), run_deque) ]:
+			q = make()
+			start = time.perf_counter()
+			run(q, n)
+			seconds = time.perf_counter() - start
+			results.append({ 'queue': name, 'n': n, 'seconds': seconds,
+					'ns_per_op': seconds * 1e9 / (2*n*rounds) })
+	return results
+
+
+def bench_levelized(sizes=None, vectors=4096, seed=0):
+	""" Vectors/sec of a n-bit ripple-carry adder: event-driven simulation vs. levelized, zero-delay
+	evaluation, one vector or many (bit-parallel) at a time.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (engine, bits, gates, vectors_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 8, 32, 128 ]
+
+	results = []
+	for n in sizes:
+		rng = random.Random(seed)
+		stimulus = [ (rng.getrandbits(n), rng.getrandbits(n)) for v in range(vectors) ]
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		start = time.perf_counter()
+		for a, b in stimulus:
+			sim.set_wires(x, a)
+			sim.set_wires(y, b)
+			sim.propagate()
+		seconds = time.perf_counter() - start
+		results.append({ 'engine': 'event', 'bits': n, 'gates': len(sim.gates), 'vectors_per_sec': vectors/seconds })
+
+		for name, evaluator in [ ('levelized', LevelizedEvaluator(sim)),
+					('bit-parallel-64', BitParallelEvaluator(sim, 64)),
+					('bit-parallel-4096', BitParallelEvaluator(sim, 4096)) ]:
+			start = time.perf_counter()
+			evaluator.simulate([x, y], [s], stimulus)
+			seconds = time.perf_counter() - start
+			results.append({ 'engine': name, 'bits': n, 'gates': len(sim.gates), 'vectors_per_sec': vectors/seconds })
+	return results
+
+
+def bench_memory(sizes=None):
+	""" Memory footprint of a n-bit ripple-carry adder, once built and settled: bytes per gate,
+	as measured by tracemalloc (netlist, agenda and the wire handles kept by the caller).
+
+	:param sizes: adder widths
+	:type sizes: list
+	:returns: a list of dictionaries (bits, gates, wires, bytes, bytes_per_gate)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 64, 1024, 16384 ]
+
+	results = []
+	for n in sizes:
+		gc.collect()
+		tracemalloc.start()
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		sim.netlist.update_fanout(force=True)
+		gc.collect()
+		size = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+		gates = sim.netlist.gate_count
+		results.append({ 'bits': n, 'gates': gates, 'wires': sim.wire_count, 'bytes': size, 'bytes_per_gate': size/gates })
+	return results
+
+
+def bench_events(sizes=None, vectors=200, seed=0):
+	""" Transitions scheduled, suppressed as redundant and cancelled (inertial model) while a
+	n-bit ripple-carry adder processes random input vectors, for both delay models.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (model, bits, scheduled, suppressed, cancelled, suppressed_ratio)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 8, 32, 128 ]
+
+	results = []
+	for inertial in (False, True):
+		for n in sizes:
+			rng = random.Random(seed)
+			sim = CircuitLibrary()
+			sim.inertial = inertial
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			sim.RippleCarryAdder(x, y, s)
+			sim.propagate()
+			for v in range(vectors):
+				sim.set_wires(x, rng.getrandbits(n))
+				sim.set_wires(y, rng.getrandbits(n))
+				sim.propagate()
+			total = sim.events_scheduled + sim.events_suppressed
+			results.append({ 'model': 'inertial' if inertial else 'transport', 'bits': n,
+					'scheduled': sim.events_scheduled, 'suppressed': sim.events_suppressed,
+					'cancelled': sim.events_cancelled, 'suppressed_ratio': sim.events_suppressed/total })
+	return results
+
+
+def _random_blif(f, n_inputs, n_gates, rng):
+	""" Write a random combinational BLIF netlist: each gate reads two earlier signals """
+	f.write('.model random\n.inputs {}\n'.format(' '.join( 'i{}'.format(k) for k in range(n_inputs) )))
+	f.write('.outputs g{}\n'.format(n_gates-1))
+	covers = ( '11 1\n', '1- 1\n-1 1\n', '0- 1\n' )
+	signal = lambda k: 'i{}'.format(k) if k < n_inputs else 'g{}'.format(k-n_inputs)
+	for g in range(n_gates):
+		a, b = rng.randrange(n_inputs+g), rng.randrange(n_inputs+g)
+		f.write('.names {} {} g{}\n{}'.format(signal(a), signal(b), g, rng.choice(covers)))
+	f.write('.end\n')
+
+
+def bench_netlist_io(sizes=None, seed=0):
+	""" Load time of random BLIF netlists, and export/import time of the same circuit as
+	structural Verilog.
+
+	:param sizes: numbers of gates (1000000 is a good stress test)
+	:type sizes: list
+	:returns: a list of dictionaries (format, gates, seconds, gates_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 10000, 100000 ]
+
+	results = []
+	for n in sizes:
+		rng = random.Random(seed)
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'random.blif')
+			with open(path, 'w') as f:
+				_random_blif(f, 64, n, rng)
+			sim = Simulator()
+			start = time.perf_counter()
+			read_blif(sim, path)
+			seconds = time.perf_counter() - start
+			results.append({ 'format': 'blif', 'gates': len(sim.gates), 'seconds': seconds, 'gates_per_sec': len(sim.gates)/seconds })
+
+			path = os.path.join(directory, 'random.v')
+			with open(path, 'w') as f:
+				write_verilog(sim, f)
+			sim = Simulator()
+			start = time.perf_counter()
+			read_verilog(sim, path)
+			seconds = time.perf_counter() - start
+			results.append({ 'format': 'verilog', 'gates': len(sim.gates), 'seconds': seconds, 'gates_per_sec': len(sim.gates)/seconds })
+	return results
+
+
+def bench_waveform(sizes=None, vectors=200, seed=0):
+	""" Cost of recording all the wires of a n-bit ripple-carry adder processing random vectors,
+	in VCD and in binary, compared with the same run without recording.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (format, bits, transitions, seconds, overhead)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 32, 256 ]
+
+	results = []
+	for n in sizes:
+		baseline = None
+		for name, writer in (('none', None), ('vcd', VCDWriter), ('binary', BinaryWaveformWriter)):
+			rng = random.Random(seed)
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			sim.RippleCarryAdder(x, y, s)
+			sim.propagate()
+			with tempfile.TemporaryFile('wb' if writer is BinaryWaveformWriter else 'w+') as out:
+				recorder = writer(sim, out) if writer is not None else None
+				if recorder is not None:
+					recorder.start()
+				start = time.perf_counter()
+				for v in range(vectors):
+					sim.set_wires(x, rng.getrandbits(n))
+					sim.set_wires(y, rng.getrandbits(n))
+					sim.propagate()
+				if recorder is not None:
+					recorder.close()
+				seconds = time.perf_counter() - start
+			if baseline is None:
+				baseline = seconds
+			results.append({ 'format': name, 'bits': n, 'transitions': recorder.transition_count if recorder else 0,
+					'seconds': seconds, 'overhead': seconds/baseline - 1 })
+	return results
+
+
+def _adder(sim, n, rng):
+	x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y]
+
+def _majority_chain(sim, n, rng):
+	""" n majority voting circuits, the output of each one being the first input of the next one """
+	y, z = sim.WireArray(n), sim.WireArray(n)
+	x = sim.Wire()
+	inputs = [ [x], y, z ]
+	for i in range(n):
+		o = sim.Wire()
+		sim.MajorityVoting(x, y[i], z[i], o)
+		# settle each stage: built in one go, the chain would ripple O(n^2) transitions
+		sim.run()
+		x = o
+	return inputs
+
+def _two_switches_chain(sim, n, rng):
+	""" n two-switch circuits, the output of each one being the first input of the next one """
+	y = sim.WireArray(n)
+	x = sim.Wire()
+	inputs = [ [x], y ]
+	for i in range(n):
+		o = sim.Wire()
+		sim.TwoSwitches(x, y[i], o)
+		# settle each stage: built in one go, the chain would ripple O(n^2) transitions
+		sim.run()
+		x = o
+	return inputs
+
+def _random_dag(sim, n, rng):
+	""" n random gates, each reading one or two earlier signals, over 64 primary inputs """
+	inputs = sim.WireArray(64)
+	wires = list(inputs)
+	for g in range(n):
+		o = sim.Wire()
+		kind = rng.randrange(3)
+		if kind == 0:
+			sim.AndGate( rng.choice(wires), rng.choice(wires), o )
+		elif kind == 1:
+			sim.OrGate( rng.choice(wires), rng.choice(wires), o )
+		else:
+			sim.Inverter( rng.choice(wires), o )
+		wires.append(o)
+	return [ inputs ]
+
+# circuit families of the scaling benchmark: name -> (builder, sizes)
+SCALE_CIRCUITS = {
+	'adder': (_adder, [ 8, 64, 512, 4096 ]),
+	'majority_chain': (_majority_chain, [ 16, 256, 4096 ]),
+	# with transport delays, the glitches of a two-switch chain multiply along it: a single vector
+	# costs O(n^2) transitions (12 million for 4096 stages)
+	'two_switches_chain': (_two_switches_chain, [ 16, 256, 1024 ]),
+	'random_dag': (_random_dag, [ 1000, 10000, 100000 ]),
+}
+
+
+def bench_scale(circuits=None, seconds=0.5, seed=0):
+	""" Throughput of the simulator on growing circuits: ripple-carry adders, chains of majority
+	voting and two-switch circuits, and random DAG netlists. For each circuit:
+
+	- construction time (building the netlist, and settling it)
+	- events/sec, while random input vectors are applied for about `seconds`
+	- peak memory during construction, and memory per gate once settled (tracemalloc, in a separate build)
+
+	:param circuits: circuit family names (default: all of SCALE_CIRCUITS)
+	:param seconds: simulation time budget for each circuit
+	:type circuits: list
+	:type seconds: float
+	:returns: a list of dictionaries (circuit, size, gates, build_seconds, vectors, events, events_per_sec, peak_bytes, bytes_per_gate)
+	:rtype: list
+	"""
+	if circuits is None:
+		circuits = sorted(SCALE_CIRCUITS)
+
+	results = []
+	for name in circuits:
+		builder, sizes = SCALE_CIRCUITS[name]
+		for n in sizes:
+			rng = random.Random(seed)
+			start = time.perf_counter()
+			sim = CircuitLibrary()
+			groups = builder(sim, n, rng)
+			sim.run()
+			build_seconds = time.perf_counter() - start
+
+			events = vectors = 0
+			start = time.perf_counter()
+			while time.perf_counter() - start < seconds:
+				for g in groups:
+					sim.set_wires(g, rng.getrandbits(len(g)))
+				events += sim.run()
+				vectors += 1
+			elapsed = time.perf_counter() - start
+			gates = sim.netlist.gate_count
+			del sim, groups
+
+			gc.collect()
+			tracemalloc.start()
+			sim = CircuitLibrary()
+			groups = builder(sim, n, random.Random(seed))
+			sim.run()
+			sim.netlist.update_fanout(force=True)
+			size, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+			del sim, groups
+
+			results.append({ 'circuit': name, 'size': n, 'gates': gates, 'build_seconds': build_seconds,
+					'vectors': vectors, 'events': events, 'events_per_sec': events/elapsed,
+					'peak_bytes': peak, 'bytes_per_gate': size/gates })
+	return results
+
+
+def bench_native_gates(sizes=None, vectors=200, seed=0):
+	""" The classic circuits built from AND/OR/NOT gates (CircuitLibrary), compared with the same
+	circuits built with the XOR/XNOR and N-input gates (NativeCircuitLibrary): gates, wires, events
+	per input vector, settle time, and events/sec. Size 1 is the half-adder alone.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (library, bits, gates, wires, events_per_vector, settle_time, seconds, events_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 1, 8, 64, 512 ]
+
+	results = []
+	for n in sizes:
+		for library in (CircuitLibrary, NativeCircuitLibrary):
+			rng = random.Random(seed)
+			sim = library()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			if n == 1:
+				sim.HalfAdder(x[0], y[0], s[0], s[1])
+			else:
+				sim.RippleCarryAdder(x, y, s)
+			sim.propagate()
+			events = settle_time = 0
+			start = time.perf_counter()
+			for v in range(vectors):
+				sim.set_wires(x, rng.getrandbits(n))
+				sim.set_wires(y, rng.getrandbits(n))
+				t = sim.agenda.current_time
+				events += sim.run()
+				settle_time = max(settle_time, sim.agenda.current_time - t)
+			seconds = time.perf_counter() - start
+			results.append({ 'library': library.__name__, 'bits': n, 'gates': sim.netlist.gate_count,
+					'wires': sim.wire_count, 'events_per_vector': events/vectors, 'settle_time': settle_time,
+					'seconds': seconds, 'events_per_sec': events/seconds })
+	return results
+
+
+def bench_bus(sizes=None, vectors=200, seed=0):
+	""" Vectors/sec of a n-bit adder simulated at the gate level (ripple-carry adder of native gates)
+	and at the word level (a BusAdder between buses).
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (level, bits, events, seconds, vectors_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 8, 64, 256 ]
+
+	results = []
+	for n in sizes:
+		for level in ('gate', 'word'):
+			rng = random.Random(seed)
+			if level == 'gate':
+				sim = NativeCircuitLibrary()
+				x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+				sim.RippleCarryAdder(x, y, s)
+				apply = lambda a, b: (sim.set_wires(x, a), sim.set_wires(y, b))
+			else:
+				sim = BusSimulator()
+				x, y, s = sim.Bus(n), sim.Bus(n), sim.Bus(n+1)
+				sim.BusAdder(x, y, s)
+				apply = lambda a, b: (x.set_signal(a), y.set_signal(b))
+			sim.propagate()
+			events = 0
+			start = time.perf_counter()
+			for v in range(vectors):
+				apply( rng.getrandbits(n), rng.getrandbits(n) )
+				events += sim.run()
+			seconds = time.perf_counter() - start
+			results.append({ 'level': level, 'bits': n, 'events': events, 'seconds': seconds, 'vectors_per_sec': vectors/seconds })
+	return results
+
+
+def bench_adders(sizes=None, vectors=200, seed=0):
+	""" The ripple-carry adder compared with the carry-lookahead, Kogge-Stone and Brent-Kung adders,
+	all built from AND/OR/NOT gates: gates, events per input vector, worst settle time over the
+	vectors, and seconds.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (adder, bits, gates, events_per_vector, settle_time, seconds)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 8, 32, 128 ]
+
+	results = []
+	for n in sizes:
+		for adder in ('RippleCarryAdder', 'CarryLookaheadAdder', 'KoggeStoneAdder', 'BrentKungAdder'):
+			rng = random.Random(seed)
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			getattr(sim, adder)(x, y, s)
+			sim.propagate()
+			events = settle_time = 0
+			start = time.perf_counter()
+			for v in range(vectors):
+				sim.set_wires(x, rng.getrandbits(n))
+				sim.set_wires(y, rng.getrandbits(n))
+				t = sim.agenda.current_time
+				events += sim.run()
+				settle_time = max(settle_time, sim.agenda.current_time - t)
+			seconds = time.perf_counter() - start
+			results.append({ 'adder': adder, 'bits': n, 'gates': sim.netlist.gate_count,
+					'events_per_vector': events/vectors, 'settle_time': settle_time, 'seconds': seconds })
+	return results
+
+
+def bench_timing(sizes=None):
+	""" Static timing analysis of ripple-carry adders, against the simulation of their worst input
+	vector (a carry across all the bits): delay and seconds of each. The analysis times every path
+	in one pass, so it must take less than simulating that one vector: this is checked from 512 bits
+	on (below, the timings are too short to compare).
+
+	:param sizes: adder widths
+	:type sizes: list
+	:returns: a list of dictionaries (bits, gates, static_delay, sta_seconds, simulated_delay, simulation_seconds, sta_speedup)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 64, 512, 4096 ]
+
+	results = []
+	for n in sizes:
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		start = time.perf_counter()
+		sta = TimingAnalysis(sim)
+		sta_seconds = time.perf_counter() - start
+		sim.set_wires(x, 2**n - 1)
+		sim.propagate()
+		t = sim.agenda.current_time
+		start = time.perf_counter()
+		sim.set_wires(y, 1)
+		sim.propagate()
+		simulation_seconds = time.perf_counter() - start
+		if n >= 512:
+			assert sta_seconds < simulation_seconds, 'static timing of {} bits is slower than one simulated vector'.format(n)
+		results.append({ 'bits': n, 'gates': sim.netlist.gate_count, 'static_delay': sta.delay, 'sta_seconds': sta_seconds,
+				'simulated_delay': sim.agenda.current_time - t, 'simulation_seconds': simulation_seconds,
+				'sta_speedup': simulation_seconds/sta_seconds })
+	return results
+
+
+def bench_optimize(sizes=None, vectors=200, seed=0):
+	""" Gates and events saved by the netlist optimizer on the adders (and on an incrementer: a
+	ripple-carry adder with one operand tied to 1), and time taken by the optimization.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (circuit, bits, optimize_seconds, then the savings() figures)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 16, 128 ]
+
+	results = []
+	for n in sizes:
+		for circuit in ('RippleCarryAdder', 'CarryLookaheadAdder', 'KoggeStoneAdder', 'BrentKungAdder', 'incrementer'):
+			rng = random.Random(seed)
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			if circuit == 'incrementer':
+				sim.RippleCarryAdder(x, y, s)
+				inputs, constants = x, dict( (w, int(i == 0)) for i, w in enumerate(y) )
+				stimulus = [ rng.getrandbits(n) for v in range(vectors) ]
+			else:
+				getattr(sim, circuit)(x, y, s)
+				inputs, constants = x+y, None
+				stimulus = [ rng.getrandbits(2*n) for v in range(vectors) ]
+			start = time.perf_counter()
+			result = optimize(sim, inputs, s, constants=constants)
+			optimize_seconds = time.perf_counter() - start
+			if constants:
+				# the original circuit gets the same constants
+				for w, value in constants.items():
+					w.set_signal(value)
+			row = { 'circuit': circuit, 'bits': n, 'optimize_seconds': optimize_seconds }
+			row.update( result.savings(stimulus) )
+			results.append(row)
+	return results
+
+
+def bench_snapshot(sizes=None, vectors=100, seed=0):
+	""" Independent stimulus runs, each from the settled state of a ripple-carry adder: rebuilding
+	and settling the circuit for every vector, against restoring a snapshot of the settled circuit.
+
+	:param sizes: adder widths
+	:param vectors: number of random input vectors
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (bits, method, seconds, vectors_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 16, 128, 512 ]
+
+	def build(n):
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		return sim, x, y, s
+
+	results = []
+	for n in sizes:
+		for method in ('rebuild', 'restore'):
+			rng = random.Random(seed)
+			stimulus = [ (rng.getrandbits(n), rng.getrandbits(n)) for v in range(vectors) ]
+			start = time.perf_counter()
+			if method == 'restore':
+				sim, x, y, s = build(n)
+				state = sim.snapshot()
+			for a, b in stimulus:
+				if method == 'restore':
+					sim.restore(state)
+				else:
+					sim, x, y, s = build(n)
+				sim.set_wires(x, a)
+				sim.set_wires(y, b)
+				sim.run()
+			seconds = time.perf_counter() - start
+			results.append({ 'bits': n, 'method': method, 'seconds': seconds, 'vectors_per_sec': vectors/seconds })
+	return results
+
+
+def bench_template(sizes=None):
+	""" Construction time of a ripple-carry adder: built by RippleCarryAdder() (the circuit functions
+	run for every bit), and stamped out from the templates of HalfAdder() and FullAdder().
+
+	:param sizes: adder widths
+	:type sizes: list
+	:returns: a list of dictionaries (bits, method, gates, seconds, gates_per_sec)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 64, 512, 4096 ]
+
+	# the templates are captured once, beforehand
+	template_for(CircuitLibrary, 'HalfAdder', 4)
+	template_for(CircuitLibrary, 'FullAdder', 5)
+	results = []
+	for n in sizes:
+		for method in ('functions', 'templates'):
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			start = time.perf_counter()
+			if method == 'functions':
+				sim.RippleCarryAdder(x, y, s)
+			else:
+				ripple_carry_adder(sim, x, y, s)
+			seconds = time.perf_counter() - start
+			results.append({ 'bits': n, 'method': method, 'gates': sim.netlist.gate_count, 'seconds': seconds,
+					'gates_per_sec': sim.netlist.gate_count/seconds })
+	return results
+
+
+def bench_codegen(sizes=None, vectors=200):
+	""" Compiled netlists: the time to generate and compile the code of a ripple-carry adder, the
+	time to load it back from the cache, and the vectors per second of the compiled and levelized
+	evaluators.
+
+	:param sizes: adder widths
+	:param vectors: number of random vectors evaluated
+	:type sizes: list
+	:type vectors: int
+	:returns: a list of dictionaries (bits, gates, compile_seconds, load_seconds, compiled_vectors_per_sec, levelized_vectors_per_sec, speedup)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 16, 256, 4096 ]
+
+	results = []
+	with tempfile.TemporaryDirectory() as cache_dir:
+		for n in sizes:
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+			sim.RippleCarryAdder(x, y, s)
+			sim.propagate()
+			start = time.perf_counter()
+			CompiledEvaluator(sim, cache_dir)
+			compile_seconds = time.perf_counter() - start
+			start = time.perf_counter()
+			compiled = CompiledEvaluator(sim, cache_dir)
+			load_seconds = time.perf_counter() - start
+			rng = random.Random(n)
+			stimulus = [ (rng.getrandbits(n), rng.getrandbits(n)) for i in range(vectors) ]
+			rates = []
+			for ev in (compiled, LevelizedEvaluator(sim)):
+				start = time.perf_counter()
+				ev.simulate([x, y], [s], stimulus)
+				rates.append( vectors/(time.perf_counter() - start) )
+			results.append({ 'bits': n, 'gates': sim.netlist.gate_count, 'compile_seconds': compile_seconds,
+					'load_seconds': load_seconds, 'compiled_vectors_per_sec': rates[0],
+					'levelized_vectors_per_sec': rates[1], 'speedup': rates[0]/rates[1] })
+	return results
+
+
+def _sweep_adder_6(sim):
+	x, y, s = sim.WireArray(6), sim.WireArray(6), sim.WireArray(7)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y], [s]
+
+def _sweep_adder_16(sim):
+	x, y, s = sim.WireArray(16), sim.WireArray(16), sim.WireArray(17)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y], [s]
+
+def _add(x, y):
+	return x + y
+
+def bench_sweep(random_vectors=2048):
+	""" Test-vector sweeps of ripple-carry adders against x + y: an exhaustive 6-bit sweep, and a
+	random 16-bit one, on one worker process and on one per core.
+
+	:param random_vectors: number of vectors of the random sweep
+	:type random_vectors: int
+	:returns: a list of dictionaries (circuit, vectors, processes, seconds, vectors_per_sec, vectors_per_sec_per_core)
+	:rtype: list
+	"""
+	results = []
+	for processes in sorted( set([ 1, os.cpu_count() or 1 ]) ):
+		for name, builder, count in ( ('adder_6 exhaustive', _sweep_adder_6, None), ('adder_16 random', _sweep_adder_16, random_vectors) ):
+			result = Sweep( builder, _add, CircuitLibrary, processes=processes, shard_size=1024 ).run(count=count)
+			assert result.passed
+			results.append({ 'circuit': name, 'vectors': result.vectors, 'processes': processes, 'seconds': result.seconds,
+					'vectors_per_sec': result.vectors_per_sec, 'vectors_per_sec_per_core': result.vectors_per_sec_per_core })
+	return results
+
+
+def bench_stimulus(random_vectors=1024):
+	""" Agenda events of sweeps over ripple-carry adders, by order of the stimulus vectors: exhaustive
+	sweeps in binary and Gray code order, random sweeps in random and minimum-toggle order.
+
+	:param random_vectors: number of vectors of the random sweeps
+	:type random_vectors: int
+	:returns: a list of dictionaries (circuit, order, vectors, toggles, events, events_per_vector, events_ratio)
+	:rtype: list
+	"""
+	results = []
+	rng = random.Random(1)
+	for name, builder, widths, exhaustive in ( ('adder_6', _sweep_adder_6, [6, 6], True), ('adder_16', _sweep_adder_16, [16, 16], False) ):
+		if exhaustive:
+			orders = { 'binary': exhaustive_vectors(widths, 'binary'), 'gray': exhaustive_vectors(widths, 'gray') }
+		else:
+			vectors = [ tuple( rng.getrandbits(w) for w in widths ) for i in range(random_vectors) ]
+			orders = { 'random': vectors, 'minimum toggle': minimum_toggle_order(vectors, widths) }
+		for result in compare_orders( builder, orders, CircuitLibrary ):
+			result['circuit'] = name
+			results.append(result)
+	return [ dict( (k, r[k]) for k in ('circuit', 'order', 'vectors', 'toggles', 'events', 'events_per_vector', 'events_ratio') ) for r in results ]
+
+
+def bench_async(sizes=None, slice_events=1000, max_pending=16):
+	""" The asyncio facade: vectors per second of a stream of random vectors through an 8-bit
+	ripple-carry adder, driven by a producer task and checked by a consumer task, against the
+	plain loop; and the peak memory allocated by the asyncio stream (a second, traced run), which
+	stays flat as the stream grows: the vectors are generated lazily, and the output queue is bounded.
+
+	:param sizes: numbers of vectors
+	:param slice_events: maximum number of events run before yielding to the event loop
+	:param max_pending: size of the output queue
+	:type sizes: list
+	:type slice_events: int
+	:type max_pending: int
+	:returns: a list of dictionaries (vectors, method, seconds, vectors_per_sec, peak_kib)
+	:rtype: list
+	"""
+	if sizes is None:
+		sizes = [ 1000, 4000 ]
+
+	def run(method, count):
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		rng = random.Random(count)
+		stream = ( (rng.getrandbits(8), rng.getrandbits(8)) for i in range(count) )
+		if method == 'loop':
+			for a, b in stream:
+				sim.set_wires(x, a)
+				sim.set_wires(y, b)
+				sim.propagate()
+				assert sim.wires_to_integer(s) == a + b
+			return
+		asim = AsyncSimulator(sim, [x, y], [s], slice_events, max_pending)
+		async def check():
+			async for (a, b), (total,) in asim.outputs():
+				assert total == a + b
+		async def main():
+			await asyncio.gather( asim.drive(stream), check() )
+		asyncio.run(main())
+
+	results = []
+	for count in sizes:
+		for method in ('loop', 'asyncio'):
+			start = time.perf_counter()
+			run(method, count)
+			seconds = time.perf_counter() - start
+			peak = None
+			if method == 'asyncio':
+				gc.collect()
+				tracemalloc.start()
+				run(method, count)
+				peak = tracemalloc.get_traced_memory()[1]/1024
+				tracemalloc.stop()
+			results.append({ 'vectors': count, 'method': method, 'seconds': seconds, 'vectors_per_sec': count/seconds,
+					'peak_kib': peak })
+	return results
+
+
+def print_results(results):
+	""" Print benchmark results as an aligned table
+
+	:param results: a list of dictionaries with the same keys
+	:type results: list
+	"""
+	if not results:
+		return
+	keys = list(results[0].keys())
+	cells = [ keys ] + [ [ ('{:.4g}'.format(r[k]) if isinstance(r[k], float) else str(r[k])) for k in keys ] for r in results ]
+	widths = [ max(len(row[i]) for row in cells) for i in range(len(keys)) ]
+	for row in cells:
+		print('  '.join( c.rjust(w) for c, w in zip(row, widths) ))
+
+
+BENCHMARKS = {
+	'agenda': bench_agenda,
+	'agenda_hold': bench_agenda_hold,
+	'queue': bench_queue,
+	'levelized': bench_levelized,
+	'memory': bench_memory,
+	'events': bench_events,
+	'netlist_io': bench_netlist_io,
+	'waveform': bench_waveform,
+	'scale': bench_scale,
+	'native_gates': bench_native_gates,
+	'bus': bench_bus,
+	'adders': bench_adders,
+	'timing': bench_timing,
+	'optimize': bench_optimize,
+	'snapshot': bench_snapshot,
+	'template': bench_template,
+	'codegen': bench_codegen,
+	'sweep': bench_sweep,
+	'stimulus': bench_stimulus,
+	'async': bench_async,
+}
+
+
+def main():
+	""" Run the benchmarks named on the command line (default: all of them), print the results, and
+	optionally save them, with a description of the platform, as JSON (--json FILE) """
+	args = sys.argv[1:]
+	json_path = None
+	if '--json' in args:
+		k = args.index('--json')
+		json_path = args[k+1]
+		del args[k:k+2]
+	names = args or sorted(BENCHMARKS)
+	report = { 'python': platform.python_version(), 'implementation': platform.python_implementation(),
+		'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'benchmarks': {} }
+	for name in names:
+		print('== {}'.format(name))
+		results = BENCHMARKS[name]()
+		print_results(results)
+		report['benchmarks'][name] = results
+	if json_path is not None:
+		with open(json_path, 'w') as f:
+			json.dump(report, f, indent=1)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+#
+# digital_circuit_bus.py: word-level (RTL) simulation
+#
+# A Bus carries a n-bit integer as a single signal: a word-level operation (addition, bitwise
+# logic, multiplexer, shift) reacts to a change of its input buses in one step, and schedules its
+# output after its own delay, where the same datapath built from gates would run one event per
+# gate and bit. Buses follow the original pattern of the simulator: a value, and a list of action
+# procedures run whenever the value changes; the operations schedule Action tuples in the agenda.
+#
+# Gate-level and word-level parts of a circuit meet through adapters: BusToWires() drives single-bit
+# wires from (a slice of) a bus, WiresToBus() packs wires into a bus; BusSlice() and BusConcat()
+# do the same between buses.
+#
+#	sim = BusSimulator()
+#	a, b, s = sim.Bus(64), sim.Bus(64), sim.Bus(64)
+#	sim.BusAdder(a, b, s)
+#	a.set_signal(2**40)
+#	b.set_signal(3)
+#	sim.propagate()
+#	s.get_signal()		# 1099511627779
+
+from digital_circuit_core import *
+
+
+class Bus(object):
+	""" A n-bit signal: an integer in [0, 2**width) """
+
+	def __init__(self, simulator, width, name=''):
+		"""
+		:param simulator: the simulator the bus belongs to
+		:param width: number of bits
+		:param name: name (optional)
+		:type simulator: Simulator
+		:type width: int
+		:type name: str
+		"""
+		self.simulator = simulator
+		self.width = width
+		self.mask = (1 << width) - 1
+		self.name = name
+		self.value = 0
+		self.action_procedures = []
+
+	def __len__(self):
+		return self.width
+
+	def set_signal(self, value):
+		""" Set the value carried by the bus (truncated to its width), and run its action
+		    procedures if it changes
+
+		:param value: an integer
+		:type value: int
+		"""
+		value &= self.mask
+		if value == self.value:
+			return
+		if VERBOSE: trace('{}.set_signal({})', self.name, value)
+		self.value = value
+		for proc in self.action_procedures:
+			proc()
+		return 'done'
+
+	def get_signal(self):
+		""" The value carried by the bus
+
+		:rtype: int
+		"""
+		return self.value
+
+	def _add_action(self, proc):
+		""" Add the given procedure to the list of procedures, and run it once """
+		self.action_procedures.insert(0, proc)
+		proc()
+
+
+class BusSimulator( Simulator ):
+	""" A simulator with word-level buses and operations, besides the gates.
+
+	Each operation has its own delay (bus_add_delay...). As with the gates, an output transition is
+	not scheduled if the output already carries, or is about to carry, the same value.
+	"""
+
+	def __init__(self, agenda_class=None):
+		Simulator.__init__(self, agenda_class)
+		self.bus_add_delay = 8
+		self.bus_logic_delay = 3
+		self.bus_mux_delay = 4
+		self.bus_shift_delay = 2
+		self.bus_adapter_delay = 0
+
+	def Bus(self, width, name=''):
+		""" Creates a Bus object.
+
+		:param width: number of bits
+		:param name: name (optional)
+		:type width: int
+		:type name: str
+		:rtype: Bus
+		"""
+		return Bus(self, width, name)
+
+	def _word_operation(self, inputs, output, delay, function):
+		""" Connect input signals (buses or wires) to an output bus through a function of their values
+
+		:param inputs: input buses and wires
+		:param output: output bus
+		:param delay: delay of the operation
+		:param function: computes the output value from the input values
+		:type inputs: list
+		:type output: Bus
+		:type delay: int
+		:type function: function
+		"""
+		# last value scheduled, and number of transitions pending
+		pending = [ output.value, 0 ]
+
+		def apply(value):
+			def apply_value():
+				pending[1] -= 1
+				output.set_signal(value)
+			return apply_value
+
+		def operation():
+			value = function( *[ i.get_signal() for i in inputs ] ) & output.mask
+			if value == (pending[0] if pending[1] else output.value):
+				return
+			pending[0] = value
+			pending[1] += 1
+			self._after_delay( delay, Action( apply(value), output.name, value ))
+
+		for i in inputs:
+			i._add_action(operation)
+		return 'ok'
+
+	def BusAdder(self, a, b, s, c_in=None):
+		""" s = a + b (+ c_in): the sum is truncated to the width of s (one more bit than a and b
+		    keeps the carry)
+
+		:param a: first operand
+		:param b: second operand
+		:param s: sum
+		:param c_in: carry in, a wire (optional)
+		:type a: Bus
+		:type b: Bus
+		:type s: Bus
+		:type c_in: _WireObject
+		"""
+		if c_in is None:
+			return self._word_operation( [a, b], s, self.bus_add_delay, lambda x, y: x + y )
+		return self._word_operation( [a, b, c_in], s, self.bus_add_delay, lambda x, y, c: x + y + c )
+
+	def BusAnd(self, a, b, o):
+		""" Bitwise AND of two buses """
+		return self._word_operation( [a, b], o, self.bus_logic_delay, lambda x, y: x & y )
+
+	def BusOr(self, a, b, o):
+		""" Bitwise OR of two buses """
+		return self._word_operation( [a, b], o, self.bus_logic_delay, lambda x, y: x | y )
+
+	def BusXor(self, a, b, o):
+		""" Bitwise XOR of two buses """
+		return self._word_operation( [a, b], o, self.bus_logic_delay, lambda x, y: x ^ y )
+
+	def BusNot(self, a, o):
+		""" Bitwise complement of a bus """
+		return self._word_operation( [a], o, self.bus_logic_delay, lambda x: ~x )
+
+	def BusMux(self, sel, a, b, o):
+		""" Multiplexer: o = b if sel else a
+
+		:param sel: select signal, a wire (or a 1-bit bus)
+		:type sel: _WireObject
+		"""
+		return self._word_operation( [sel, a, b], o, self.bus_mux_delay, lambda s, x, y: y if s else x )
+
+	def BusShift(self, a, amount, o, left=True):
+		""" Logical shift of a bus, by a constant or by the value of a bus
+
+		:param amount: number of positions
+		:param left: shift direction
+		:type amount: int or Bus
+		:type left: bool
+		"""
+		if isinstance(amount, int):
+			if left:
+				return self._word_operation( [a], o, self.bus_shift_delay, lambda x: x << amount )
+			return self._word_operation( [a], o, self.bus_shift_delay, lambda x: x >> amount )
+		if left:
+			return self._word_operation( [a, amount], o, self.bus_shift_delay, lambda x, k: x << k )
+		return self._word_operation( [a, amount], o, self.bus_shift_delay, lambda x, k: x >> k )
+
+	def BusSlice(self, bus, start, stop, o):
+		""" o = bits [start, stop) of a bus """
+		mask = (1 << (stop - start)) - 1
+		return self._word_operation( [bus], o, self.bus_adapter_delay, lambda x: (x >> start) & mask )
+
+	def BusConcat(self, buses, o):
+		""" o = the concatenation of buses, the first one carrying the LSBs """
+		def concat(*values):
+			value = shift = 0
+			for bus, v in zip(buses, values):
+				value |= v << shift
+				shift += bus.width
+			return value
+		return self._word_operation( list(buses), o, self.bus_adapter_delay, concat )
+
+	def WiresToBus(self, wires, o):
+		""" o = the bits carried by an array of wires (the first one carries the LSB) """
+		def pack(*bits):
+			value = 0
+			for pos, bit in enumerate(bits):
+				value |= bit << pos
+			return value
+		return self._word_operation( list(wires), o, self.bus_adapter_delay, pack )
+
+	def BusToWires(self, bus, wires, start=0):
+		""" Drive an array of wires with the bits of a bus, from bit `start` on (the first wire
+		    receives the lowest bit)
+
+		:param bus: the bus
+		:param wires: the wires
+		:param start: first bit
+		:type bus: Bus
+		:type wires: list
+		:type start: int
+		"""
+		def unpack():
+			value = bus.get_signal() >> start
+			def apply_value():
+				v = value
+				for w in wires:
+					w.set_signal(v & 1)
+					v >>= 1
+			self._after_delay( self.bus_adapter_delay, Action( apply_value, bus.name, value ))
+		bus._add_action(unpack)
+		return 'ok'
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+#
+# digital_circuit_bus_test.py: unit tests for the word-level simulation
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_bus import *
+
+
+class BusLibrary( BusSimulator, CircuitLibrary ):
+	""" Buses and gate-level circuits on the same simulator """
+
+
+class BusUnitTest( unittest.TestCase ):
+
+	def testAdder(self):
+		sim = BusSimulator()
+		a, b, s = sim.Bus(64), sim.Bus(64), sim.Bus(65)
+		sim.BusAdder(a, b, s)
+		rng = random.Random(2)
+		for i in range(20):
+			x, y = rng.getrandbits(64), rng.getrandbits(64)
+			a.set_signal(x)
+			b.set_signal(y)
+			start = sim.agenda.current_time
+			sim.propagate()
+			self.assertEqual( s.get_signal(), x + y )
+			self.assertEqual( sim.agenda.current_time, start + sim.bus_add_delay )
+
+	def testOperations(self):
+		sim = BusSimulator()
+		a, b = sim.Bus(8), sim.Bus(8)
+		sel = sim.Wire()
+		o_and, o_or, o_xor, o_not, o_mux, o_shl, o_shr, o_var = [ sim.Bus(8) for i in range(8) ]
+		amount = sim.Bus(3)
+		sim.BusAnd(a, b, o_and)
+		sim.BusOr(a, b, o_or)
+		sim.BusXor(a, b, o_xor)
+		sim.BusNot(a, o_not)
+		sim.BusMux(sel, a, b, o_mux)
+		sim.BusShift(a, 2, o_shl)
+		sim.BusShift(a, 3, o_shr, left=False)
+		sim.BusShift(a, amount, o_var)
+		a.set_signal(0b10110110)
+		b.set_signal(0b01100011)
+		amount.set_signal(5)
+		sim.propagate()
+		self.assertEqual( [ o.get_signal() for o in (o_and, o_or, o_xor, o_not, o_mux, o_shl, o_shr, o_var) ],
+				[ 0b00100010, 0b11110111, 0b11010101, 0b01001001, 0b10110110, 0b11011000, 0b00010110, 0b11000000 ] )
+		sel.set_signal(1)
+		sim.propagate()
+		self.assertEqual( o_mux.get_signal(), 0b01100011 )
+
+	def testSliceConcat(self):
+		sim = BusSimulator()
+		word, low, high, swapped = sim.Bus(16), sim.Bus(8), sim.Bus(8), sim.Bus(16)
+		sim.BusSlice(word, 0, 8, low)
+		sim.BusSlice(word, 8, 16, high)
+		sim.BusConcat([high, low], swapped)
+		word.set_signal(0x12ab)
+		sim.propagate()
+		self.assertEqual( (low.get_signal(), high.get_signal(), swapped.get_signal()), (0xab, 0x12, 0xab12) )
+
+	def testMixed(self):
+		""" A gate-level ripple-carry adder between buses """
+		sim = BusLibrary()
+		a, b, s, reference = sim.Bus(8), sim.Bus(8), sim.Bus(9), sim.Bus(9)
+		x, y, z = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+		sim.BusToWires(a, x)
+		sim.BusToWires(b, y)
+		sim.RippleCarryAdder(x, y, z)
+		sim.WiresToBus(z, s)
+		sim.BusAdder(a, b, reference)
+		rng = random.Random(4)
+		for i in range(20):
+			a.set_signal(rng.getrandbits(8))
+			b.set_signal(rng.getrandbits(8))
+			sim.propagate()
+			self.assertEqual( s.get_signal(), a.get_signal() + b.get_signal() )
+			self.assertEqual( s.get_signal(), reference.get_signal() )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+#
+# digital_circuit_codegen.py: compilation of a netlist into Python code
+#
+# The netlist captured by a simulator becomes the straight-line source of a Python function, one
+# statement per gate, in level order, over local variables: evaluating a vector runs no loop, no
+# dispatch on the gate type, and no list indexing but for the inputs and outputs:
+#
+#	def evaluate(v, mask=1):
+#		w0 = v[0]
+#		w1 = v[1]
+#		w4 = w0 & w1
+#		w5 = w4 ^ mask
+#		...
+#		v[4] = w4
+#		...
+#
+# The source, and the code object compile() makes of it, are saved in a private, per-user cache
+# directory, under a hash of the netlist: a later run on the same circuit skips both the generation
+# and the compilation. Operators are bitwise, so that the function evaluates packed vectors as well
+# (mask: one bit per lane).
+#
+#	ev = CompiledEvaluator(sim)
+#	ev.set_wires(x, 23)
+#	ev.evaluate()
+#	ev.wires_to_integer(s)
+
+import hashlib
+import marshal
+import os
+import stat
+import sys
+import tempfile
+import types
+
+from digital_circuit_core import *
+from digital_circuit_core import _AND, _OR, _NOT, _NAND, _NOR, _XOR, _XNOR
+from digital_circuit_levelized import LevelizedEvaluator, levelize
+
+
+# changes whenever the generated code changes: part of the hash
+CODEGEN_VERSION = 1
+
+_OPERATORS = { _AND: ' & ', _OR: ' | ', _NAND: ' & ', _NOR: ' | ', _XOR: ' ^ ', _XNOR: ' ^ ' }
+
+
+def default_cache_dir():
+	""" The directory of the generated modules: $DIGITAL_CIRCUIT_CACHE, or a per-user directory,
+	    $XDG_CACHE_HOME/digital_circuit (~/.cache/digital_circuit)
+
+	:rtype: str
+	"""
+	path = os.environ.get('DIGITAL_CIRCUIT_CACHE')
+	if path:
+		return path
+	cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join( os.path.expanduser('~'), '.cache' )
+	return os.path.join( cache_home, 'digital_circuit' )
+
+
+def _check_owner(path, directory=False):
+	""" Refuse a cache directory or file that another user could have written: the code it holds
+	    is executed. A directory must be a real directory (not a link), owned by the current user,
+	    and writable by no one else; a file must be a regular file, owned by the current user.
+
+	:raises PermissionError: if the path fails the checks
+	"""
+	st = os.lstat(path)
+	kind_ok = stat.S_ISDIR(st.st_mode) if directory else stat.S_ISREG(st.st_mode)
+	if not kind_ok:
+		raise PermissionError('{}: not a {}'.format(path, 'directory' if directory else 'regular file'))
+	if hasattr(os, 'getuid'):
+		if st.st_uid != os.getuid():
+			raise PermissionError('{}: not owned by the current user'.format(path))
+		if directory and st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+			raise PermissionError('{}: writable by other users'.format(path))
+
+
+def netlist_hash(net):
+	""" A digest of the structure of a netlist (wires and gates, not the values)
+
+	:param net: a netlist
+	:type net: Netlist
+	:rtype: str
+	"""
+	h = hashlib.sha256()
+	h.update( 'v{} {} {}'.format(CODEGEN_VERSION, net.wire_count, net.gate_count).encode() )
+	for a in (net.gate_type, net.gate_input_start, net.gate_inputs, net.gate_output):
+		h.update( a.tobytes() )
+	return h.hexdigest()
+
+
+def generate_source(sim):
+	""" The source of a module that defines evaluate(v, mask=1): the zero-delay evaluation of the
+	    netlist of a simulator, over a list of wire values v (updated in place)
+
+	:param sim: the simulator the circuit was built on
+	:type sim: Simulator
+	:rtype: str
+	:raises CombinationalLoopException: if the netlist contains a loop
+	"""
+	net = sim.netlist
+	gates = net.gates()
+	driven = set( net.gate_output )
+	read = sorted( set( net.gate_inputs ) - driven )
+	lines = [ '# generated by digital_circuit_codegen: {} wires, {} gates'.format(net.wire_count, net.gate_count), '',
+		'def evaluate(v, mask=1):' ]
+	lines.extend( '\tw{0} = v[{0}]'.format(w) for w in read )
+	outputs = []
+	for level in levelize( net.wire_count, gates ):
+		for g in level:
+			gate_type = net.gate_type[g]
+			operands = [ 'w{}'.format(w) for w in gates[g].inputs ]
+			if gate_type == _NOT:
+				expression = '{} ^ mask'.format(operands[0])
+			elif gate_type in (_NAND, _NOR):
+				expression = '({}) ^ mask'.format( _OPERATORS[gate_type].join(operands) )
+			elif gate_type == _XNOR:
+				expression = '{} ^ mask'.format( _OPERATORS[gate_type].join(operands) )
+			else:
+				expression = _OPERATORS[gate_type].join(operands)
+			lines.append( '\tw{} = {}'.format(gates[g].output, expression) )
+			outputs.append( gates[g].output )
+	lines.extend( '\tv[{0}] = w{0}'.format(w) for w in outputs )
+	if not outputs and not read:
+		lines.append( '\tpass' )
+	return '\n'.join(lines) + '\n'
+
+
+def _write(path, data, mode='w'):
+	""" Write a file aside, then rename it: concurrent processes never read a partial file """
+	fd, temporary = tempfile.mkstemp( suffix='.tmp', dir=os.path.dirname(path) )
+	with os.fdopen(fd, mode) as f:
+		f.write(data)
+	os.replace( temporary, path )
+
+
+def load_module(sim, cache_dir=None):
+	""" The compiled module of the netlist of a simulator. The cache directory keeps, for each
+	    netlist hash, the generated source, and its code object (marshalled, for the running version
+	    of Python): what is missing is generated, or compiled, and saved. The directory is created
+	    private (mode 0o700); a directory or a file that another user could have written is refused.
+
+	:param sim: the simulator the circuit was built on
+	:param cache_dir: the cache directory (default: default_cache_dir())
+	:type sim: Simulator
+	:type cache_dir: str
+	:returns: the module, and whether its code was found in the cache
+	:rtype: tuple
+	:raises PermissionError: if the cache directory, or a file in it, is not private to the current user
+	"""
+	if cache_dir is None:
+		cache_dir = default_cache_dir()
+	os.makedirs( cache_dir, mode=0o700, exist_ok=True )
+	_check_owner( cache_dir, directory=True )
+	name = 'dc_' + netlist_hash(sim.netlist)
+	source_path = os.path.join( cache_dir, name + '.py' )
+	code_path = os.path.join( cache_dir, '{}.{}.code'.format(name, sys.implementation.cache_tag) )
+	cached = os.path.lexists(code_path)
+	if cached:
+		_check_owner(code_path)
+		with open(code_path, 'rb') as f:
+			code = marshal.load(f)
+	else:
+		if os.path.lexists(source_path):
+			_check_owner(source_path)
+			with open(source_path) as f:
+				source = f.read()
+		else:
+			source = generate_source(sim)
+			_write( source_path, source )
+		code = compile( source, source_path, 'exec' )
+		_write( code_path, marshal.dumps(code), 'wb' )
+	module = types.ModuleType(name)
+	module.__file__ = source_path
+	exec( code, module.__dict__ )
+	return module, cached
+
+
+class CompiledEvaluator( LevelizedEvaluator ):
+	""" Zero-delay evaluator running the generated code of the netlist built on a simulator. As
+	    with the LevelizedEvaluator, it starts from the current signals of the simulator. """
+
+	def __init__(self, sim, cache_dir=None):
+		"""
+		:param sim: the simulator the circuit was built on
+		:param cache_dir: the directory of the generated modules (default: default_cache_dir())
+		:type sim: Simulator
+		:type cache_dir: str
+		"""
+		module, self.cached = load_module( sim, cache_dir )
+		self.function = module.evaluate
+		self.values = list( sim.netlist.values )
+
+	def evaluate(self):
+		""" Compute the steady state of all wires from the current input values """
+		self.function( self.values )
+
+
+def verify(sim, inputs, vectors, evaluator=None):
+	""" Check an evaluator against the simulator, bit for bit: every input vector is applied to both,
+	    the simulator propagates, and every wire the gates drive is compared.
+
+	:param sim: the simulator the circuit was built on (its state changes)
+	:param inputs: input wire groups
+	:param vectors: stimulus vectors (tuples of integers, one per input group)
+	:param evaluator: the evaluator to check (default: a CompiledEvaluator of the simulator)
+	:type sim: Simulator
+	:type inputs: list
+	:type vectors: iterable
+	:type evaluator: LevelizedEvaluator
+	:returns: the mismatches, as (vector, wire index) pairs
+	:rtype: list
+	"""
+	sim.propagate()
+	if evaluator is None:
+		evaluator = CompiledEvaluator(sim)
+	net = sim.netlist
+	driven = sorted( set(net.gate_output) )
+	mismatches = []
+	for vector in vectors:
+		for wires, value in zip(inputs, vector):
+			sim.set_wires(wires, value)
+			evaluator.set_wires(wires, value)
+		sim.propagate()
+		evaluator.evaluate()
+		mismatches.extend( (vector, w) for w in driven if net.values[w] != evaluator.values[w] )
+	return mismatches
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+#
+# digital_circuit_codegen_test.py: unit tests for the netlist compiler
+
+import os
+import random
+import tempfile
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_levelized import LevelizedEvaluator, CombinationalLoopException
+from digital_circuit_codegen import *
+
+
+def _adder(library, n, build='RippleCarryAdder'):
+	sim = library()
+	x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+	getattr(sim, build)(x, y, s)
+	sim.propagate()
+	return sim, x, y, s
+
+
+class CodegenUnitTest( unittest.TestCase ):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.cache_dir = self.directory.name
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def testAdders(self):
+		""" The generated code agrees with the simulator on every driven wire """
+		for library in (CircuitLibrary, NativeCircuitLibrary):
+			for build in ('RippleCarryAdder', 'KoggeStoneAdder'):
+				sim, x, y, s = _adder(library, 4, build)
+				ev = CompiledEvaluator(sim, self.cache_dir)
+				vectors = [ (a, b) for a in range(16) for b in range(16) ]
+				self.assertEqual( verify(sim, [x, y], vectors, ev), [], (library.__name__, build) )
+				self.assertEqual( ev.simulate([x, y], [s], vectors), [ (a+b,) for a, b in vectors ] )
+
+	def testAllGateTypes(self):
+		sim = Simulator()
+		a, b, c = sim.WireArray(3)
+		outputs = sim.WireArray(7)
+		sim.AndGate(a, b, outputs[0])
+		sim.OrGate(a, b, outputs[1])
+		sim.Inverter(a, outputs[2])
+		sim.NandGate(a, c, outputs[3])
+		sim.NorGate(b, c, outputs[4])
+		sim.XorGate(outputs[0], c, outputs[5])
+		sim.XnorGate(outputs[3], outputs[4], outputs[6])
+		ev = CompiledEvaluator(sim, self.cache_dir)
+		self.assertEqual( verify(sim, [[a, b, c]], [ (v,) for v in range(8) ], ev), [] )
+
+	def testMatchesLevelized(self):
+		sim, x, y, s = _adder(CircuitLibrary, 32)
+		compiled = CompiledEvaluator(sim, self.cache_dir)
+		levelized = LevelizedEvaluator(sim)
+		rng = random.Random(3)
+		vectors = [ (rng.getrandbits(32), rng.getrandbits(32)) for i in range(50) ]
+		self.assertEqual( compiled.simulate([x, y], [s], vectors), levelized.simulate([x, y], [s], vectors) )
+
+	def testCache(self):
+		""" A second load of the same netlist finds its code in the cache """
+		sim, x, y, s = _adder(CircuitLibrary, 8)
+		self.assertFalse( CompiledEvaluator(sim, self.cache_dir).cached )
+		self.assertTrue( CompiledEvaluator(sim, self.cache_dir).cached )
+		other, x, y, s = _adder(CircuitLibrary, 8)
+		ev = CompiledEvaluator(other, self.cache_dir)
+		self.assertTrue( ev.cached )
+		ev.set_wires(x, 200)
+		ev.set_wires(y, 100)
+		ev.evaluate()
+		self.assertEqual( ev.wires_to_integer(s), 300 )
+		# the source is kept next to the code
+		name = 'dc_' + netlist_hash(sim.netlist)
+		self.assertIn( name + '.py', os.listdir(self.cache_dir) )
+
+	def testHash(self):
+		""" The hash depends on the structure, not on the values """
+		sim, x, y, s = _adder(CircuitLibrary, 8)
+		same, x2, y2, s2 = _adder(CircuitLibrary, 8)
+		same.set_wires(x2, 17)
+		same.propagate()
+		self.assertEqual( netlist_hash(sim.netlist), netlist_hash(same.netlist) )
+		self.assertNotEqual( netlist_hash(sim.netlist), netlist_hash( _adder(CircuitLibrary, 9)[0].netlist ))
+		self.assertNotEqual( netlist_hash(sim.netlist), netlist_hash( _adder(NativeCircuitLibrary, 8)[0].netlist ))
+
+	def testDefaultCacheDir(self):
+		""" The default cache is per-user """
+		saved = dict( (k, os.environ.pop(k, None)) for k in ('DIGITAL_CIRCUIT_CACHE', 'XDG_CACHE_HOME') )
+		try:
+			self.assertEqual( default_cache_dir(), os.path.join( os.path.expanduser('~'), '.cache', 'digital_circuit' ))
+			os.environ['XDG_CACHE_HOME'] = self.cache_dir
+			self.assertEqual( default_cache_dir(), os.path.join( self.cache_dir, 'digital_circuit' ))
+		finally:
+			for k, v in saved.items():
+				if v is None:
+					os.environ.pop(k, None)
+				else:
+					os.environ[k] = v
+
+	def testPrivateCache(self):
+		""" The cache directory is created private; shared directories and foreign files are refused """
+		sim, x, y, s = _adder(CircuitLibrary, 4)
+		cache_dir = os.path.join(self.cache_dir, 'a', 'cache')
+		load_module(sim, cache_dir)
+		self.assertEqual( os.stat(cache_dir).st_mode & 0o777, 0o700 )
+		os.chmod(cache_dir, 0o777)
+		self.assertRaises( PermissionError, load_module, sim, cache_dir )
+		os.chmod(cache_dir, 0o700)
+		# a code file planted as a link
+		code_path = [ os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.code') ][0]
+		os.rename( code_path, code_path + '.planted' )
+		os.symlink( code_path + '.planted', code_path )
+		self.assertRaises( PermissionError, load_module, sim, cache_dir )
+		if hasattr(os, 'getuid') and os.getuid() == 0:
+			# a code file owned by another user
+			os.remove(code_path)
+			os.rename( code_path + '.planted', code_path )
+			os.chown( code_path, 1, 1 )
+			self.assertRaises( PermissionError, load_module, sim, cache_dir )
+
+	def testPackedVectors(self):
+		""" With packed values and a lane mask, one call evaluates many vectors """
+		n, lanes = 8, 16
+		sim, x, y, s = _adder(CircuitLibrary, n)
+		module, cached = load_module(sim, self.cache_dir)
+		rng = random.Random(5)
+		pairs = [ (rng.getrandbits(n), rng.getrandbits(n)) for i in range(lanes) ]
+		v = [0]*sim.netlist.wire_count
+		for lane, (a, b) in enumerate(pairs):
+			for i in range(n):
+				v[ x[i].index ] |= ((a >> i) & 1) << lane
+				v[ y[i].index ] |= ((b >> i) & 1) << lane
+		module.evaluate( v, (1 << lanes) - 1 )
+		for lane, (a, b) in enumerate(pairs):
+			self.assertEqual( sum( ((v[ s[i].index ] >> lane) & 1) << i for i in range(n+1) ), a+b )
+
+	def testLoop(self):
+		sim = Simulator()
+		a, b = sim.WireArray(2)
+		sim.Inverter(a, b)
+		sim.Inverter(b, a)
+		self.assertRaises( CombinationalLoopException, generate_source, sim )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
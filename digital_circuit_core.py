@@ -11,48 +11,78 @@
 # easy to stay close to the original program's pattern, where logic gates are just
 # functions to be applied to the wires: these maintain an internal state, mostly a list of
 # delayed procedures that run when the signal changes.
+#
+# To scale to large circuits, the wires and gates now live in a compact netlist (arrays of
+# values, gate types, inputs, outputs and fan-out, see Netlist) that the simulation loop walks
+# directly; the wire objects and gate functions are a thin layer over it.
 
 import unittest
 import collections
+import heapq
+import itertools
+import operator
+import json
+import struct
+import time
+from array import array
 
 
 class OverflowException( Exception): pass
 class UnderflowException( Exception): pass
 
 class Queue():
+	""" A FIFO queue, stored in a circular array.
+
+	 The array doubles when it is full, and shrinks back to its initial size once the queue
+	 is emptied: enqueue() and dequeue() run in amortized constant time, and a queue never
+	 overflows.""" 
 
 	def __init__(self,size=None):
 		if size is None:
-			size=100	
+			size=16
 		self.tail=0
 		self.head=0
+		self.size=size
 		self.array=[None]*size
 
 
 	def is_empty(self):
 		return self.head==self.tail
+
+	def __len__(self):
+		return (self.tail - self.head) % len(self.array)
 		
 
 	def enqueue(self, x):
-		if (self.head==0 and self.tail==len(self.array)-1) or (self.tail+1==self.head):
-			raise OverflowException()
-			
 		self.array[self.tail] = x
 		if self.tail == len(self.array)-1:
 			self.tail = 0
 		else:
 			self.tail = self.tail + 1
+		if self.tail == self.head:
+			self._grow()
+
+	def _grow(self):
+		""" The array is full (head meets tail): double it, by opening a gap in front of the head """
+		n = len(self.array)
+		self.array[self.head:self.head] = [None]*n
+		self.head += n
 
 	def dequeue(self):
 		if (self.head==self.tail):
 			raise UnderflowException()
 		x = self.array[self.head]
+		# release the reference, so that the action can be garbage-collected
+		self.array[self.head] = None
 		# just for clarity
 		if self.head == len( self.array)-1:
 			self.head=0
 		else:
 			self.head = self.head+1
 
+		if self.head == self.tail and len(self.array) > self.size:
+			self.array = [None]*self.size
+			self.head = self.tail = 0
 		return x
 
 	def peek(self):
@@ -60,6 +90,15 @@ class Queue():
 			return None
 		return self.array[ self.head ]
 
+	def items(self):
+		""" The elements of the queue, in FIFO order
+
+		:rtype: list
+		"""
+		if self.head <= self.tail:
+			return self.array[self.head:self.tail]
+		return self.array[self.head:] + self.array[:self.tail]
+
 	def __str__(self):
 		output = ''
 		# no wrap-around
@@ -82,18 +121,455 @@ class Queue():
 
 TimeSegment = collections.namedtuple( "TimeSegment", "time queue" )
 Action = collections.namedtuple("Action","function object value") 
+# a gate of the netlist: type ('AND', 'OR', 'NOT'), tuple of input wire indices, output wire index
+Gate = collections.namedtuple("Gate", "type inputs output")
+# the state of an agenda: its clock, and the pending items, as (time, items) pairs in chronological order
+AgendaState = collections.namedtuple("AgendaState", "current_time segments")
+# the state of a simulation (see Simulator.snapshot())
+SimulationState = collections.namedtuple("SimulationState", "values pending_value pending_count pending_time agenda counters")
 
 VERBOSE = False
 
-def trace(s):
-	global VERBOSE
-	if VERBOSE: print(s)
+def trace(s, *args):
+	""" Print a trace message, if VERBOSE is set. The message is a format string, that is
+	    formatted with the remaining arguments only when it is printed: in the simulation
+	    loop, calls are further guarded by 'if VERBOSE:', so that a disabled trace costs nothing."""
+	if VERBOSE:
+		print(s.format(*args) if args else s)
+
+# the structured trace sink, if any: see set_trace_sink()
+TRACE_SINK = None
+
+def set_trace_sink(sink):
+	""" Install a structured trace sink, that records every signal transition (or remove it, with None).
+
+	While a sink is installed, the simulators run their instrumented loop: without a sink, tracing costs nothing.
+
+	:param sink: a trace sink, or None
+	:type sink: TraceSink
+	"""
+	global TRACE_SINK
+	TRACE_SINK = sink
+
+
+class TraceSink(object):
+	""" Base class of the structured trace sinks: each transition is recorded as (time, wire, old
+	 value, new value, gate driving the wire). Records are buffered, and written in chunks.
+
+	 A sink can be used as a context manager, that installs it, then removes and closes it::
+
+		with JSONLTraceSink('run.jsonl'):
+			sim.propagate()
+	"""
+
+	binary = False
+
+	def __init__(self, out, buffer_size=4096):
+		""" 
+		:param out: a path or a file object
+		:param buffer_size: number of records kept in memory before writing them out
+		:type buffer_size: int
+		"""
+		if isinstance(out, str):
+			self.out = open(out, 'wb' if self.binary else 'w')
+			self.owns_file = True
+		else:
+			self.out = out
+			self.owns_file = False
+		self.buffer_size = buffer_size
+		self.buffer = []
+		self.wire_ids = {}
+
+	def _wire_id(self, wire):
+		""" Number the wires in order of appearance; a wire is declared (with its name) the first time it is seen """
+		wire_id = self.wire_ids.get(wire)
+		if wire_id is None:
+			wire_id = len(self.wire_ids)
+			self.wire_ids[wire] = wire_id
+			self.buffer.append( self._declaration(wire_id, wire.name) )
+		return wire_id
+
+	def record(self, time, wire, old, new):
+		""" Record a signal transition
+
+		:param time: simulated time
+		:param wire: the wire whose signal changes
+		:param old: previous value
+		:param new: new value
+		:type time: int
+		:type wire: _WireObject
+		:type old: int
+		:type new: int
+		"""
+		self.buffer.append( self._transition(time, self._wire_id(wire), old, new, wire.driver) )
+		if len(self.buffer) >= self.buffer_size:
+			self.flush()
+
+	def flush(self):
+		if self.buffer:
+			self.out.write( (b'' if self.binary else '').join(self.buffer) )
+			self.buffer = []
+		self.out.flush()
+
+	def close(self):
+		self.flush()
+		if self.owns_file:
+			self.out.close()
+
+	def __enter__(self):
+		set_trace_sink(self)
+		return self
+
+	def __exit__(self, *exc):
+		if TRACE_SINK is self:
+			set_trace_sink(None)
+		self.close()
+
+
+class JSONLTraceSink(TraceSink):
+	""" Trace sink writing JSON lines::
+
+		{"wire": 0, "name": "wire-3"}
+		{"time": 5, "wire": 0, "old": 0, "new": 1, "gate": "OR"}
+	"""
+
+	def _declaration(self, wire_id, name):
+		return json.dumps({ 'wire': wire_id, 'name': name }) + '\n'
+
+	def _transition(self, time, wire_id, old, new, gate):
+		return '{{"time": {}, "wire": {}, "old": {}, "new": {}, "gate": {}}}\n'.format(time, wire_id, old, new, json.dumps(gate))
+
+
+# gate types, as coded in the binary traces
+GATE_CODES = { None: 0, 'NOT': 1, 'AND': 2, 'OR': 3, 'NAND': 4, 'NOR': 5, 'XOR': 6, 'XNOR': 7 }
+
+_DECLARATION = struct.Struct('<BIH')
+_TRANSITION = struct.Struct('<BqIBBB')
+
+class BinaryTraceSink(TraceSink):
+	""" Trace sink writing fixed-size little-endian records:
+
+	- declaration: type 0 (byte), wire (uint32), name length (uint16), name (utf-8)
+	- transition: type 1 (byte), time (int64), wire (uint32), old (byte), new (byte), gate code (byte, see GATE_CODES)
+
+	See read_binary_trace().
+	"""
+
+	binary = True
+
+	def _declaration(self, wire_id, name):
+		name = name.encode('utf-8')
+		return _DECLARATION.pack(0, wire_id, len(name)) + name
+
+	def _transition(self, time, wire_id, old, new, gate):
+		return _TRANSITION.pack(1, time, wire_id, old, new, GATE_CODES.get(gate, 0))
+
+
+def read_binary_trace(f):
+	""" Decode a binary trace: yield the transitions as (time, wire name, old, new, gate) tuples
+
+	:param f: a binary file object
+	:rtype: generator
+	"""
+	gates = dict( (code, gate) for gate, code in GATE_CODES.items() )
+	names = {}
+	data = f.read()
+	pos = 0
+	while pos < len(data):
+		if data[pos] == 0:
+			_, wire_id, length = _DECLARATION.unpack_from(data, pos)
+			pos += _DECLARATION.size
+			names[wire_id] = data[pos:pos+length].decode('utf-8')
+			pos += length
+		else:
+			_, time, wire_id, old, new, gate = _TRANSITION.unpack_from(data, pos)
+			pos += _TRANSITION.size
+			yield (time, names[wire_id], old, new, gates[gate])
+
+
+def _action_function(simulator, item):
+	""" The procedure to run for an agenda item: the function of an Action, or, for a gate output
+	    transition coded as an integer (gate << 1) | value, a procedure that applies it to the simulator """
+	if item.__class__ is int:
+		return lambda: simulator._apply_event(item)
+	return item.function
+
 
 class Agenda(object):
 	""" The agenda: store the delayed procedures.
 
-	 Actions stored on the wire populate the agenda, when the signal changes.""" 
+	 Actions stored on the wire populate the agenda, when the signal changes.
+
+	 The time segments are kept in a dictionary (time -> queue), and their times in a binary heap:
+	 inserting an action or removing the earliest one costs O(log n) in the number of pending
+	 time segments, and actions sharing the same time run in FIFO order.""" 
 	
+	# capacity of the queue of a time segment (None: Queue default)
+	queue_size = None
+
+	def __init__(self, simul=None):
+		self.current_time=0
+		self.times = []
+		self.queues = {}
+		self.simulator=simul
+
+	@property
+	def segments(self):
+		""" The pending time segments, in chronological order
+
+		:rtype: list
+		"""
+		return [ TimeSegment(t, self.queues[t]) for t in sorted(self.times) ]
+
+	def is_empty(self):
+		return not self.times
+
+	def segment_count(self):
+		""" Number of pending time segments """
+		return len(self.times)
+
+	def add( self, time, action ):
+		""" Insert an action into the agenda, in the proper time segment
+		    (and create the segment, if needed)
+
+		:param	time: time
+		:param  action: an Action tuple (function, <name of the wire on which it is called>, value), or a gate output transition coded as an integer: (gate << 1) | value
+		:type time: int
+		:type action: Action or int
+		 """
+
+		if VERBOSE: trace('Agenda.add({}, {})', time, action)
+
+		q = self.queues.get(time)
+		if q is None:
+			q = Queue(self.queue_size)
+			self.queues[time] = q
+			heapq.heappush(self.times, time)
+		q.enqueue(action)
+
+	def remove_first( self ):
+		""" Suppress an action from agenda, and, if needed, the containing time segment """
+
+		if not self.times:
+			return
+		time = self.times[0]
+		q = self.queues[time]
+		if q.is_empty():
+			return
+		q.dequeue()
+		if VERBOSE: trace('Agenda.remove_first() ')
+		if q.is_empty():
+			if VERBOSE: trace("Agenda.remove_first(): deleting empty segment (time {})", time)
+			heapq.heappop(self.times)
+			del self.queues[time]
+
+	def get_first( self ):
+		""" Return the first function to be executed in the agenda """
+
+		if not self.times:
+			raise UnderflowException
+		self.current_time = self.times[0]
+		first = self.queues[self.current_time].peek()
+
+		if VERBOSE: trace('Agenda.get_first() --> {}', first)
+		if VERBOSE: trace('Agenda.current_time <-- {}', self.current_time)
+
+		return _action_function(self.simulator, first)
+
+	def first_time( self ):
+		""" Return the time of the earliest pending action, or None if the agenda is empty
+
+		:rtype: int
+		"""
+		if not self.times:
+			return None
+		return self.times[0]
+
+	def pop_first( self ):
+		""" Remove the first item from the agenda and return it (an Action, or a transition coded as
+		    an integer): get_first() and remove_first() in one step, for the simulation loop """
+
+		time = self.times[0]
+		self.current_time = time
+		q = self.queues[time]
+		first = q.dequeue()
+		if q.is_empty():
+			heapq.heappop(self.times)
+			del self.queues[time]
+		return first
+
+	def clear(self):
+		""" Remove all pending items """
+		self.times = []
+		self.queues = {}
+
+	def snapshot(self):
+		""" The clock and the pending items: the items are copied, the agenda is left untouched
+
+		:rtype: AgendaState
+		"""
+		return AgendaState( self.current_time, tuple( (s.time, tuple(s.queue.items())) for s in self.segments ))
+
+	def restore(self, state):
+		""" Replace the clock and the pending items with those of a snapshot
+
+		:param state: a snapshot of an agenda (of any class)
+		:type state: AgendaState
+		"""
+		self.clear()
+		self.current_time = state.current_time
+		for time, items in state.segments:
+			for item in items:
+				self.add(time, item)
+
+	def __str__(self):
+		""" Agenda in printable form """
+
+		str_arr=['']*5
+		str_arr[0]='current: '+str(self.current_time)
+		str_arr[1]= '-----------------------------'
+		str_arr[2]= ' TIME |     PROCEDURES'
+		str_arr[3]= '-----------------------------'
+		for ts in self.segments:
+			str_arr.insert(len(str_arr), '|  ' + str(ts.time) + '  | '+ str(ts.queue))
+			str_arr.insert(len(str_arr),'-----------------------------')
+		return '\n'.join(str_arr)
+
+
+class CalendarAgenda(Agenda):
+	""" A calendar queue (timing wheel): the agenda for circuits whose gate delays are bounded.
+
+	 Time segments that fall within ``size`` time units of the current time live in a circular array
+	 of buckets, indexed by ``time % size``: insertion is O(1), and finding the next segment costs
+	 at most one scan over the buckets between two successive event times (i.e. the largest gate delay).
+	 Segments beyond the horizon fall back on the binary heap of the parent class."""
+
+	def __init__(self, simul=None, size=64):
+		Agenda.__init__(self, simul)
+		# round up to a power of 2, so that the bucket index is a mere mask
+		wheel_size = 1
+		while wheel_size < size:
+			wheel_size *= 2
+		self.size = wheel_size
+		self.mask = wheel_size-1
+		self.wheel = [None]*wheel_size
+		self.wheel_count = 0
+
+	@property
+	def segments(self):
+		""" The pending time segments, in chronological order
+
+		:rtype: list
+		"""
+		wheel_segments = [ s for s in self.wheel if s is not None ]
+		return sorted( wheel_segments + Agenda.segments.fget(self), key=lambda s: s.time )
+
+	def is_empty(self):
+		return self.wheel_count==0 and not self.times
+
+	def segment_count(self):
+		""" Number of pending time segments """
+		return self.wheel_count + len(self.times)
+
+	def add( self, time, action ):
+		""" Insert an action into the agenda: in the wheel if the time lies within the horizon,
+		    in the overflow heap otherwise.
+
+		:param	time: time
+		:param  action: an Action tuple (function, <name of the wire on which it is called>, value), or a gate output transition coded as an integer: (gate << 1) | value
+		:type time: int
+		:type action: Action or int
+		 """
+		# a segment created in the heap while it was beyond the horizon keeps collecting its actions
+		if time in self.queues or time - self.current_time >= self.size:
+			Agenda.add(self, time, action)
+			return
+
+		if VERBOSE: trace('CalendarAgenda.add({}, {})', time, action)
+		s = self.wheel[ time & self.mask ]
+		if s is None:
+			s = TimeSegment(time, Queue(self.queue_size))
+			self.wheel[ time & self.mask ] = s
+			self.wheel_count += 1
+		s.queue.enqueue(action)
+
+	def clear(self):
+		""" Remove all pending items """
+		Agenda.clear(self)
+		self.wheel = [None]*self.size
+		self.wheel_count = 0
+
+	def _first_wheel_segment(self):
+		""" Scan the wheel from the current time on: since all segments in the wheel lie
+		    within [current_time, current_time+size), the first bucket found holds the earliest one."""
+		if not self.wheel_count:
+			return None
+		wheel = self.wheel
+		mask = self.mask
+		t = self.current_time
+		while wheel[t & mask] is None:
+			t += 1
+		return wheel[t & mask]
+
+	def remove_first( self ):
+		""" Suppress an action from agenda, and, if needed, the containing time segment """
+
+		s = self._first_wheel_segment()
+		if s is None or (self.times and self.times[0] < s.time):
+			Agenda.remove_first(self)
+			return
+		s.queue.dequeue()
+		if s.queue.is_empty():
+			if VERBOSE: trace("CalendarAgenda.remove_first(): deleting empty segment (time {})", s.time)
+			self.wheel[ s.time & self.mask ] = None
+			self.wheel_count -= 1
+
+	def get_first( self ):
+		""" Return the first function to be executed in the agenda """
+
+		s = self._first_wheel_segment()
+		if s is None or (self.times and self.times[0] < s.time):
+			return Agenda.get_first(self)
+		self.current_time = s.time
+		first = s.queue.peek()
+
+		if VERBOSE: trace('CalendarAgenda.get_first() --> {}', first)
+		if VERBOSE: trace('Agenda.current_time <-- {}', self.current_time)
+
+		return _action_function(self.simulator, first)
+
+	def first_time( self ):
+		""" Return the time of the earliest pending action, or None if the agenda is empty
+
+		:rtype: int
+		"""
+		s = self._first_wheel_segment()
+		if s is None or (self.times and self.times[0] < s.time):
+			return Agenda.first_time(self)
+		return s.time
+
+	def pop_first( self ):
+		""" Remove the first item from the agenda and return it (an Action, or a transition coded as
+		    an integer): get_first() and remove_first() in one step, for the simulation loop """
+
+		s = self._first_wheel_segment()
+		if s is None or (self.times and self.times[0] < s.time):
+			return Agenda.pop_first(self)
+		self.current_time = s.time
+		first = s.queue.dequeue()
+		if s.queue.is_empty():
+			self.wheel[ s.time & self.mask ] = None
+			self.wheel_count -= 1
+		return first
+
+
+class LinearAgenda(object):
+	""" The original agenda: time segments are kept in a sorted list, that is scanned from the
+	 front on every insertion. Kept for reference and benchmarking: see :class:`Agenda`.""" 
+	
+	# capacity of the queue of a time segment (None: Queue default)
+	queue_size = None
+
 	def __init__(self, simul=None):
 		self.current_time=0
 		self.segments = []
@@ -103,20 +579,24 @@ class Agenda(object):
 	def is_empty(self):
 		return len(self.segments)==0
 
+	def segment_count(self):
+		""" Number of pending time segments """
+		return len(self.segments)
+
 
 	def add( self, time, action ):
 		""" Insert an action into the agenda, in the proper time segment
 		    (and create the segment, if needed)
 		:param	time: time
-		:param  action: a tuple (function, <name of the wire on which it is called>)
+		:param  action: an Action tuple (function, <name of the wire on which it is called>, value), or a gate output transition coded as an integer: (gate << 1) | value
 		:type time: int
-		:type action: Action
+		:type action: Action or int
 		 """
 		
-		trace('Agenda.add({}, {})'.format( time, action.function ))
+		if VERBOSE: trace('Agenda.add({}, {})', time, action)
 			
 		if not self.segments :
-			q = Queue()
+			q = Queue(self.queue_size)
 			q.enqueue(action)
 			self.segments.append( TimeSegment(time, q))
 			return
@@ -133,15 +613,16 @@ class Agenda(object):
 				break
 			# found a location, new segment required
 			elif (time < s.time):
-				q = Queue()
+				q = Queue(self.queue_size)
 				q.enqueue(action)
 				self.segments.insert(insert_location, TimeSegment(time, q))
 				break
 			# end of list: append new segment
 			else:
-				q = Queue()
+				q = Queue(self.queue_size)
 				q.enqueue(action)
 				self.segments.insert(insert_location+1, TimeSegment(time, q))
+				break
 					
 	def remove_first( self ):
 		""" Suppress an action from agenda, and, if needed, the containing time segment """
@@ -149,11 +630,11 @@ class Agenda(object):
 		if self.is_empty() or self.segments[0].queue.is_empty():
 			return
 		action = self.segments[0].queue.dequeue()
-		trace('Agenda.remove_first() '.format())
+		if VERBOSE: trace('Agenda.remove_first() ')
 		if self.segments[0].queue.is_empty():
-			trace("Agenda.remove_first(): deleting empty segment (time {})".format(self.segments[0].time))
+			if VERBOSE: trace("Agenda.remove_first(): deleting empty segment (time {})", self.segments[0].time)
 			del self.segments[0]
-			trace(self)
+			if VERBOSE: trace(self)
 
 	def get_first( self ):
 		""" Return the first function to be executed in the agenda """
@@ -163,10 +644,36 @@ class Agenda(object):
 		first = self.segments[0].queue.peek()
 		self.current_time = self.segments[0].time
 
-		trace('Agenda.get_first() --> {}'.format(first.function))
-		trace('Agenda.current_time <-- {}'.format(self.current_time))
+		if VERBOSE: trace('Agenda.get_first() --> {}', first)
+		if VERBOSE: trace('Agenda.current_time <-- {}', self.current_time)
 
-		return first.function
+		return _action_function(self.simulator, first)
+
+	def first_time( self ):
+		""" Return the time of the earliest pending action, or None if the agenda is empty
+
+		:rtype: int
+		"""
+		if not self.segments:
+			return None
+		return self.segments[0].time
+
+	def pop_first( self ):
+		""" Remove the first item from the agenda and return it """
+
+		if not self.segments:
+			raise UnderflowException
+		first = self.segments[0].queue.peek()
+		self.current_time = self.segments[0].time
+		self.remove_first()
+		return first
+
+	def clear(self):
+		""" Remove all pending items """
+		self.segments = []
+
+	snapshot = Agenda.snapshot
+	restore = Agenda.restore
 
 	def __str__(self):
 		""" Agenda in printable form """
@@ -188,25 +695,250 @@ class UnknownOperationException(Exception): pass
 class InvalidSignalException(Exception): pass
 
 
+# gate types: their code in the netlist is their position in this tuple. NOT has a single input,
+# the other gates any number of inputs (2 for the gate functions: AndGate()...; see LogicGate())
+GATE_TYPES = ('AND', 'OR', 'NOT', 'NAND', 'NOR', 'XOR', 'XNOR')
+_AND, _OR, _NOT, _NAND, _NOR, _XOR, _XNOR = range(7)
+
+# truth tables of the 2-input gates, indexed by type code, then by (a << 1) | b (NOT's is never used)
+_TRUTH_TABLES = ( b'\x00\x00\x00\x01', b'\x00\x01\x01\x01', b'\x01\x01\x00\x00',
+		b'\x01\x01\x01\x00', b'\x01\x00\x00\x00', b'\x00\x01\x01\x00', b'\x01\x00\x00\x01' )
+
+
+class Netlist(object):
+	""" The compact representation of a circuit: a structure of arrays, indexed by wire and gate numbers.
+
+	- wires: their values in a bytearray, the gate driving each of them, and the number in their name,
+	  'wire-<n>' (0 for the anonymous ones)
+	- gates: parallel arrays of types and outputs; the inputs of gate g are
+	  ``gate_inputs[ gate_input_start[g] : gate_input_start[g+1] ]``
+	- fan-out: the gates reading wire w are ``fanout[ fanout_start[w] : fanout_start[w+1] ]`` (CSR layout).
+	  Gates added since the CSR arrays were built are kept aside, in ``fanout_extra`` (wire -> gates),
+	  until they are numerous enough to justify a rebuild.
+	- constants: the undriven wires tied to a value (wire -> value), which are not inputs of the circuit
+	"""
+
+	def __init__(self):
+		self.values = bytearray()
+		self.driver = array('i')
+		self.name_ids = array('i')
+
+		self.gate_type = array('B')
+		self.gate_output = array('i')
+		self.gate_input_start = array('i', [0])
+		self.gate_inputs = array('i')
+
+		# simulation state of the gates' outputs: value and number of the transitions pending in the
+		# agenda (transport delay), or time of the only pending one, -1 if none (inertial delay)
+		self.gate_pending_value = bytearray()
+		self.gate_pending_count = array('i')
+		self.gate_pending_time = array('q')
+
+		self.fanout_start = array('i', [0])
+		self.fanout = array('i')
+		self.fanout_extra = {}
+		# number of gates in the CSR arrays, and wires covered by fanout_start
+		self.fanout_gates = 0
+		self.fanout_wires = 0
+
+		self.constants = {}
+
+	@property
+	def wire_count(self):
+		return len(self.values)
+
+	@property
+	def gate_count(self):
+		return len(self.gate_type)
+
+	def new_wires(self, n):
+		""" Create n wires, carrying 0
+
+		:returns: the range of the new wire indices
+		:rtype: range
+		"""
+		start = len(self.values)
+		self.values.extend( bytes(n) )
+		self.driver.extend( array('i', [-1])*n )
+		self.name_ids.extend( array('i', bytes(4*n)) )
+		return range(start, start+n)
+
+	def add_gate(self, gate_type, inputs, output):
+		""" Add a gate.
+
+		:param gate_type: type code (position in GATE_TYPES)
+		:param inputs: input wire indices
+		:param output: output wire index
+		:type gate_type: int
+		:type inputs: sequence
+		:type output: int
+		:returns: the gate index
+		:rtype: int
+		"""
+		g = len(self.gate_type)
+		self.gate_type.append(gate_type)
+		self.gate_output.append(output)
+		self.gate_inputs.extend(inputs)
+		self.gate_input_start.append( len(self.gate_inputs) )
+		self.gate_pending_value.append(0)
+		self.gate_pending_count.append(0)
+		self.gate_pending_time.append(-1)
+		self.driver[output] = g
+		for w in inputs:
+			extra = self.fanout_extra.get(w)
+			if extra is None:
+				self.fanout_extra[w] = [g]
+			else:
+				extra.append(g)
+		return g
+
+	def extend_gates(self, gate_types, input_start, inputs, outputs):
+		""" Add gates in bulk, from arrays in the netlist layout: the inputs of the i-th new gate are
+		    ``inputs[ input_start[i] : input_start[i+1] ]``. The fan-out arrays are rebuilt once.
+
+		:param gate_types: type codes
+		:param input_start: n+1 offsets into inputs
+		:param inputs: input wire indices
+		:param outputs: output wire indices
+		:type gate_types: array
+		:type input_start: sequence
+		:type inputs: sequence
+		:type outputs: sequence
+		:returns: the index of the first new gate
+		:rtype: int
+		"""
+		first = len(self.gate_type)
+		n = len(gate_types)
+		base = len(self.gate_inputs) - input_start[0]
+		self.gate_type.extend(gate_types)
+		self.gate_output.extend(outputs)
+		self.gate_inputs.extend(inputs)
+		self.gate_input_start.extend( array('i', [ base + k for k in input_start[1:] ]) )
+		self.gate_pending_value.extend( bytes(n) )
+		self.gate_pending_count.extend( array('i', bytes(4*n)) )
+		self.gate_pending_time.extend( array('q', [-1])*n )
+		driver = self.driver
+		for g, w in enumerate(outputs, first):
+			driver[w] = g
+		self.update_fanout(force=True)
+		return first
+
+	def update_fanout(self, force=False):
+		""" Fold the gates added since the last build into the CSR fan-out arrays. The arrays are
+		    rebuilt only once the pending gates amount to a fraction of the netlist (or when forced),
+		    which keeps the rebuild cost amortized-constant per gate. """
+		pending = len(self.gate_type) - self.fanout_gates
+		if pending == 0 or not (force or pending*4 >= len(self.gate_type)):
+			return
+		n_wires = len(self.values)
+		gate_inputs = self.gate_inputs
+		start = self.gate_input_start
+		# the gate of each input slot, then the slots sorted by wire (a stable sort: the gates
+		# reading a wire stay in increasing order); the loops run in C
+		slot_gate = array('i', itertools.chain.from_iterable( map( itertools.repeat, range(len(self.gate_type)),
+			map( operator.sub, itertools.islice(start, 1, None), start ))))
+		slots = sorted( range(len(gate_inputs)), key=gate_inputs.__getitem__ )
+		counts = collections.Counter(gate_inputs)
+		self.fanout_start = array('i', itertools.accumulate( map( counts.get, range(n_wires), itertools.repeat(0) ), initial=0 ))
+		self.fanout = array('i', map( slot_gate.__getitem__, slots ))
+		self.fanout_extra = {}
+		self.fanout_gates = len(self.gate_type)
+		self.fanout_wires = n_wires
+
+	def fanout_of(self, w):
+		""" The gates reading a wire
+
+		:rtype: list
+		"""
+		gates = []
+		if w < self.fanout_wires:
+			gates.extend( self.fanout[ self.fanout_start[w]:self.fanout_start[w+1] ] )
+		gates.extend( self.fanout_extra.get(w, ()) )
+		return gates
+
+	def evaluate_gate(self, g):
+		""" The output value of a gate, from the current values of its inputs
+
+		:rtype: int
+		"""
+		values = self.values
+		inputs = self.gate_inputs[ self.gate_input_start[g]:self.gate_input_start[g+1] ]
+		t = self.gate_type[g]
+		if t == _NOT:
+			return values[inputs[0]] ^ 1
+		ones = sum( values[w] for w in inputs )
+		if t == _AND:
+			return int( ones == len(inputs) )
+		if t == _OR:
+			return int( ones > 0 )
+		if t == _NAND:
+			return int( ones != len(inputs) )
+		if t == _NOR:
+			return int( ones == 0 )
+		if t == _XOR:
+			return ones & 1
+		if t == _XNOR:
+			return (ones & 1) ^ 1
+		raise UnknownOperationException(t)
+
+	def gates(self):
+		""" The gates, as Gate tuples (type name, input indices, output index)
+
+		:rtype: list
+		"""
+		start = self.gate_input_start
+		return [ Gate( GATE_TYPES[t], tuple(self.gate_inputs[start[g]:start[g+1]]), self.gate_output[g] )
+				for g, t in enumerate(self.gate_type) ]
+
+
 class _WireObject(object):
 	""" This class implements a wire: a wire can be assigned an value, and be 
-    	used as an input to, or an output from a logical gate """
+    	used as an input to, or an output from a logical gate.
+
+	A wire object is a light handle on a wire of the simulator's netlist (the wire number
+	and the simulator): two handles on the same wire are equal, and any number of them can be
+	created and dropped without affecting the circuit."""
 	
+	__slots__ = ('simulator', 'index')
+
 	wire_id=0
 
-	def __init__(self, agenda=None, name=''):
-		self.signal_value = 0
-		self.action_procedures = []
+	def __init__(self, simulator, index):
+		self.simulator = simulator
+		self.index = index
 
-		# the name is useful for the log trace
-		self.name = name
-		if name != '':
-			_WireObject.wire_id+=1
-			self.name = 'wire-'+str(_WireObject.wire_id)
-			#print("_WireObject.name={}".format(self.name))
-		self.agenda = agenda
-			
+	def __eq__(self, other):
+		return isinstance(other, _WireObject) and other.simulator is self.simulator and other.index == self.index
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __hash__(self):
+		return hash( (id(self.simulator), self.index) )
 
+	@property
+	def name(self):
+		name_id = self.simulator.netlist.name_ids[self.index]
+		return 'wire-'+str(name_id) if name_id else ''
+
+	@property
+	def signal_value(self):
+		return self.simulator.netlist.values[self.index]
+
+	@property
+	def agenda(self):
+		return self.simulator.agenda
+
+	@property
+	def driver(self):
+		""" type of the gate whose output is the wire, if any: 'AND', 'OR', 'NOT' """
+		net = self.simulator.netlist
+		g = net.driver[self.index]
+		return GATE_TYPES[ net.gate_type[g] ] if g >= 0 else None
+
+	@property
+	def action_procedures(self):
+		return self.simulator.actions.get(self.index, [])
 
 	def set_signal(self, value):
 		""" Test whether the new signal value changes the signal on the wire
@@ -215,12 +947,7 @@ class _WireObject(object):
 		:param value: a Boolean value (0 or 1)
 		:type value: int
 		"""
-
-		if value != self.signal_value:
-			self.signal_value = value
-			for proc in self.action_procedures:
-				trace('{}.set_signal({}): running {} (computing new output value,  and insert corresponding output setting function into the agenda)'.format(self.name,value, proc))
-				proc()
+		if self.simulator._set_value(self.index, value):
 			return 'done'
 	
 	def get_signal(self):
@@ -229,17 +956,20 @@ class _WireObject(object):
 		:returns: 0 or 1
 		:rtype: int
 		"""
-		trace('{}.get_signal() --> {}'.format(self.name, self.signal_value))
-		return self.signal_value
+		value = self.simulator.netlist.values[self.index]
+		if VERBOSE: trace('{}.get_signal() --> {}', self.name, value)
+		return value
 
 	def _add_action(self, proc):
 		""" Add the given procedure to the list of procedures and then then run the new procedure once """
 
-		self.action_procedures.insert(0, proc)
-		trace('{}._add_action({}): running {} once (computing new output value, and insert corresponding output setting function into the agenda)'.format(self.name,proc, proc))
+		self.simulator.actions.setdefault(self.index, []).insert(0, proc)
+		if VERBOSE: trace('{}._add_action({}): running {} once', self.name, proc, proc)
 		proc()
 
 	def probe(self, name):
+		""" Print every change of the signal (for interactive sessions: to record long runs, see
+		    the waveform writers in digital_circuit_waveform) """
 		def display():
 			print('')
 			print('{} {} new_value={}'.format(name, self.agenda.current_time,self.get_signal()))
@@ -249,30 +979,149 @@ class _WireObject(object):
 
 class Simulator(object):
 	""" The simulation framework: this class contains the functions that create wires and apply operations on them (logic gates)
+
+	The circuit itself lives in a compact Netlist; Wire() returns handles on its wires, and the gate
+	functions append gates to it. Pending gate outputs are stored in the agenda as plain integers,
+	(gate << 1) | value, while procedures scheduled with _after_delay() are stored as Action tuples.
+
+	The simulator keeps track of the transitions pending on each gate's output, and never schedules
+	one that would not change anything (the value is already the one the output will carry). With the
+	default, transport delay model, every other transition is kept, glitches included; with the inertial
+	model, a new transition supersedes the pending ones, and a pulse shorter than the gate delay is
+	swallowed. The counters events_scheduled, events_suppressed and events_cancelled tell how many
+	transitions were scheduled, dropped as redundant, and cancelled.
 	"""
 
-	class _Simulator(object):
-		""" Singleton """
-		def __init__(self):
-			self.agenda = Agenda( self )
-			self.inverter_delay = 2
-			self.and_gate_delay = 3
-			self.or_gate_delay = 5
-	instance = None
+	# the agenda backend: a subclass may pick another one (LinearAgenda, CalendarAgenda)
+	agenda_class = Agenda
 
-	def __init__(self):
-		if not Simulator.instance:
-			Simulator.instance = Simulator._Simulator()
-	
-	def __getattr__(self, name):
-		return getattr( self.instance, name)
+	# delay model: transport (False) or inertial (True)
+	inertial = False
+
+	def __init__(self, agenda_class=None):
+		""" Each simulator is an independent context, with its own agenda (and clock), gate delays
+		    and wires: circuits built on different simulators never interact.
+
+		:param agenda_class: agenda backend (optional, default: the class attribute agenda_class)
+		:type agenda_class: type
+		"""
+		if agenda_class is None:
+			agenda_class = self.agenda_class
+		self.agenda = agenda_class( self )
+		self.inverter_delay = 2
+		self.and_gate_delay = 3
+		self.or_gate_delay = 5
+		self.nand_gate_delay = 3
+		self.nor_gate_delay = 5
+		self.xor_gate_delay = 5
+		self.xnor_gate_delay = 5
+		self.netlist = Netlist()
+		# action procedures attached to wires (probes...): wire index -> list of procedures
+		self.actions = {}
+		self.events_scheduled = 0
+		self.events_suppressed = 0
+		self.events_cancelled = 0
+		# the waveform recorder, if any (see digital_circuit_waveform)
+		self.waveform = None
+		# the profiler, if any (see digital_circuit_profile)
+		self.profiler = None
+
+	@property
+	def wire_count(self):
+		return self.netlist.wire_count
+
+	@property
+	def gates(self):
+		""" The gates connected so far, in order of creation, as Gate tuples (type, input indices, output index)
+
+		:rtype: list
+		"""
+		return self.netlist.gates()
+
+	def _delays(self):
+		""" Gate delays, indexed by gate type code """
+		return (self.and_gate_delay, self.or_gate_delay, self.inverter_delay, self.nand_gate_delay,
+			self.nor_gate_delay, self.xor_gate_delay, self.xnor_gate_delay)
 
-	
 	def _after_delay(self,  delay, action ):
-		trace('Simulator._after_delay({}, {})'.format(delay, action))
-		trace('Simulator._after_delay: calling Agenda.add({}+{}, {})'.format(delay,self.agenda.current_time, action))
+		if VERBOSE: trace('Simulator._after_delay({}, {})', delay, action)
+		if VERBOSE: trace('Simulator._after_delay: calling Agenda.add({}+{}, {})', delay,self.agenda.current_time, action)
 		self.agenda.add( delay + self.agenda.current_time, action )
-		
+
+	def _schedule(self, g, new_value):
+		""" Schedule a new value for the output of a gate, after the gate delay, unless it is redundant
+
+		:returns: True if the transition was scheduled
+		:rtype: bool
+		"""
+		net = self.netlist
+		if self.inertial:
+			if net.gate_pending_time[g] >= 0:
+				if net.gate_pending_value[g] == new_value:
+					self.events_suppressed += 1
+					return False
+				# the pending transition is superseded
+				net.gate_pending_time[g] = -1
+				self.events_cancelled += 1
+			if net.values[ net.gate_output[g] ] == new_value:
+				self.events_suppressed += 1
+				return False
+		else:
+			if net.gate_pending_count[g]:
+				last_value = net.gate_pending_value[g]
+			else:
+				last_value = net.values[ net.gate_output[g] ]
+			if last_value == new_value:
+				self.events_suppressed += 1
+				return False
+			net.gate_pending_count[g] += 1
+		time = self.agenda.current_time + self._delays()[ net.gate_type[g] ]
+		net.gate_pending_value[g] = new_value
+		if self.inertial:
+			net.gate_pending_time[g] = time
+		self.agenda.add( time, (g << 1) | new_value )
+		self.events_scheduled += 1
+		return True
+
+	def _set_value(self, w, value):
+		""" Set the value of a wire: if it changes, evaluate the gates it feeds, schedule their
+		    outputs, and run the wire's action procedures.
+
+		:returns: True if the value changed
+		:rtype: bool
+		"""
+		net = self.netlist
+		old = net.values[w]
+		if value == old:
+			return False
+		if TRACE_SINK is not None:
+			TRACE_SINK.record( self.agenda.current_time, _WireObject(self, w), old, value )
+		net.values[w] = value
+		if self.waveform is not None:
+			self.waveform.record( self.agenda.current_time, w, value )
+		if self.profiler is not None:
+			self.profiler.toggle(w)
+		net.update_fanout()
+		for g in net.fanout_of(w):
+			new_value = net.evaluate_gate(g)
+			if VERBOSE: trace('{}.set_signal({}): gate {} ({}) --> {}', w, value, g, GATE_TYPES[net.gate_type[g]], new_value)
+			self._schedule(g, new_value)
+		for proc in self.actions.get(w, ()):
+			proc()
+		return True
+
+	def _apply_event(self, event):
+		""" Execute a gate transition (gate << 1) | value from the agenda (unless it was cancelled) """
+		net = self.netlist
+		g = event >> 1
+		if self.inertial:
+			if net.gate_pending_time[g] != self.agenda.current_time or net.gate_pending_value[g] != event & 1:
+				return
+			net.gate_pending_time[g] = -1
+		else:
+			net.gate_pending_count[g] -= 1
+		self._set_value( net.gate_output[g], event & 1 )
+
 	def Wire(self, name=''):
 		""" Creates a Wire object.
 
@@ -280,7 +1129,11 @@ class Simulator(object):
 		:type name: string
 		:rtype: _WireObject
 		"""
-		return _WireObject(self.agenda, name)
+		index = self.netlist.new_wires(1)[0]
+		if name != '':
+			_WireObject.wire_id+=1
+			self.netlist.name_ids[index] = _WireObject.wire_id
+		return _WireObject(self, index)
 
 	def WireArray(self, n):
 		""" Create an array of n _WireObjects.
@@ -289,10 +1142,52 @@ class Simulator(object):
 		:type n: int
 		:rtype: list
 		"""
-		wire_arr=[]
-		for i in range(0,n):
-			wire_arr.append( self.Wire() )
-		return wire_arr
+		return [ _WireObject(self, i) for i in self.netlist.new_wires(n) ]
+
+	def _add_gate(self, gate_type, inputs, output):
+		""" Add a gate to the netlist, and schedule its output, computed from the current inputs
+
+		:param gate_type: type code (position in GATE_TYPES)
+		:param inputs: input wire indices
+		:param output: output wire index
+		:returns: the gate index
+		:rtype: int
+		"""
+		net = self.netlist
+		g = net.add_gate(gate_type, inputs, output)
+		self._schedule( g, net.evaluate_gate(g) )
+		return g
+
+	def _add_gates(self, gate_types, input_start, inputs, outputs):
+		""" Bulk version of _add_gate(), with the same arrays as Netlist.extend_gates(): the new gates'
+		    outputs are scheduled once all of them are connected.
+
+		:returns: the range of the new gate indices
+		:rtype: range
+		"""
+		net = self.netlist
+		first = net.extend_gates(gate_types, input_start, inputs, outputs)
+		values, gate_type, gate_output = net.values, net.gate_type, net.gate_output
+		start, gate_inputs = net.gate_input_start, net.gate_inputs
+		evaluate_gate = net.evaluate_gate
+		schedule = self._schedule
+		suppressed = 0
+		for g in range(first, net.gate_count):
+			t = gate_type[g]
+			k = start[g]
+			if t == _NOT:
+				new_value = values[ gate_inputs[k] ] ^ 1
+			elif start[g+1] - k == 2:
+				new_value = _TRUTH_TABLES[t][ (values[ gate_inputs[k] ] << 1) | values[ gate_inputs[k+1] ] ]
+			else:
+				new_value = evaluate_gate(g)
+			# a new gate has no pending transition: nothing to schedule if its output carries the value already
+			if values[ gate_output[g] ] == new_value:
+				suppressed += 1
+			else:
+				schedule( g, new_value )
+		self.events_suppressed += suppressed
+		return range(first, net.gate_count)
 
 	def OrGate(self, o1_wire, o2_wire, output_wire):
 		"""  Connects 2 input wires and 1 output wire through an OR gate.
@@ -303,27 +1198,9 @@ class Simulator(object):
 		:type o1_wire: _WireObject
 		:type o2_wire: _WireObject
 		:type output_wire: _WireObject
-
-		.. note:: Use a functional style: an OR gate is not an object, with an internal state (where input and output wires would be typically represented as instance properties), but a *procedure*, that itself generates a procedure from the parameters passed in, and stores it on the wires
 		"""
-		
-		def or_action_procedure():
-			trace('In or_action_procedure(): {}.get_signal()'.format(o1_wire.name))
-			trace('In or_action_procedure(): {}.get_signal()'.format(o2_wire.name))
-			new_value = self._logical_or( o1_wire.get_signal(), o2_wire.get_signal())
-			def set_or_output():
-				trace('In set_or_output(): {}.set_signal( {} )'.format(output_wire.name,  new_value))
-				output_wire.set_signal( new_value)
-
-			self._after_delay(
-				self.or_gate_delay,
-				#(lambda : output_wire.set_signal( new_value )))
-				Action (set_or_output, output_wire.name, new_value))
-		trace('In OrGate(): {}._add_action( <delayed action on {}> )'.format(o1_wire.name, output_wire.name))
-		o1_wire._add_action( or_action_procedure )
-
-		trace('In OrGate(): {}._add_action( <delayed action on {}> )'.format(o2_wire.name, output_wire.name))
-		o2_wire._add_action( or_action_procedure )
+		if VERBOSE: trace('In OrGate(): {}, {} --> {}', o1_wire.name, o2_wire.name, output_wire.name)
+		self._add_gate( _OR, (o1_wire.index, o2_wire.index), output_wire.index )
 		return 'ok'
 	
 	def AndGate(self, a1_wire, a2_wire, output_wire):
@@ -335,26 +1212,9 @@ class Simulator(object):
 		:type a1_wire: _WireObject
 		:type a2_wire: _WireObject
 		:type output_wire: _WireObject
-
-		.. note:: Use a functional style: an OR gate is not an object, with an internal state (where input and output wires would be typically represented as instance properties), but a *procedure*, that itself generates a procedure from the parameters passed in, and stores it on the wires
-		"""
-		def and_action_procedure():
-			trace('In and_action_procedure(): {}.get_signal()'.format(a1_wire.name))
-			trace('In and_action_procedure(): {}.get_signal()'.format(a2_wire.name))
-			new_value = self._logical_and( a1_wire.get_signal(), a2_wire.get_signal())
-			def set_and_output():
-				trace('In set_and_output(): {}.set_signal( {} )'.format(output_wire.name,  new_value))
-				output_wire.set_signal( new_value)
-
-			self._after_delay(
-				self.and_gate_delay,
-				#(lambda : output_wire.set_signal(new_value)))
-				Action(set_and_output, output_wire.name, new_value))
-
-		trace('In AndGate(): {}._add_action( <delayed action on {}> )'.format(a1_wire.name, output_wire.name))
-		trace('In AndGate(): {}._add_action( <delayed action on {}> )'.format(a2_wire.name, output_wire.name))
-		a1_wire._add_action( and_action_procedure )
-		a2_wire._add_action( and_action_procedure )
+		"""
+		if VERBOSE: trace('In AndGate(): {}, {} --> {}', a1_wire.name, a2_wire.name, output_wire.name)
+		self._add_gate( _AND, (a1_wire.index, a2_wire.index), output_wire.index )
 		return 'ok'
 			
 	def Inverter(self, input_wire, output_wire):
@@ -365,58 +1225,347 @@ class Simulator(object):
 		:type input_wire: _WireObject
 		:type output_wire: _WireObject
 		"""
+		if VERBOSE: trace('In Inverter(): {} --> {}', input_wire.name, output_wire.name)
+		self._add_gate( _NOT, (input_wire.index,), output_wire.index )
+		return 'ok'
+
+	def NandGate(self, a1_wire, a2_wire, output_wire):
+		""" Connects 2 input wires and 1 output wire through a NAND gate.
+
+		:param a1_wire: first input wire
+		:param a2_wire: second input wire
+		:param output_wire: output wire
+		:type a1_wire: _WireObject
+		:type a2_wire: _WireObject
+		:type output_wire: _WireObject
+		"""
+		self._add_gate( _NAND, (a1_wire.index, a2_wire.index), output_wire.index )
+		return 'ok'
+
+	def NorGate(self, o1_wire, o2_wire, output_wire):
+		""" Connects 2 input wires and 1 output wire through a NOR gate.
+
+		:param o1_wire: first input wire
+		:param o2_wire: second input wire
+		:param output_wire: output wire
+		:type o1_wire: _WireObject
+		:type o2_wire: _WireObject
+		:type output_wire: _WireObject
+		"""
+		self._add_gate( _NOR, (o1_wire.index, o2_wire.index), output_wire.index )
+		return 'ok'
+
+	def XorGate(self, x1_wire, x2_wire, output_wire):
+		""" Connects 2 input wires and 1 output wire through a XOR gate.
+
+		:param x1_wire: first input wire
+		:param x2_wire: second input wire
+		:param output_wire: output wire
+		:type x1_wire: _WireObject
+		:type x2_wire: _WireObject
+		:type output_wire: _WireObject
+		"""
+		self._add_gate( _XOR, (x1_wire.index, x2_wire.index), output_wire.index )
+		return 'ok'
+
+	def XnorGate(self, x1_wire, x2_wire, output_wire):
+		""" Connects 2 input wires and 1 output wire through a XNOR gate.
+
+		:param x1_wire: first input wire
+		:param x2_wire: second input wire
+		:param output_wire: output wire
+		:type x1_wire: _WireObject
+		:type x2_wire: _WireObject
+		:type output_wire: _WireObject
+		"""
+		self._add_gate( _XNOR, (x1_wire.index, x2_wire.index), output_wire.index )
+		return 'ok'
 
-		def invert_input():
-			trace('In invert_input(): {}.get_signal()'.format(input_wire.name))
-			new_value = self._logical_not( input_wire.get_signal())
-			def set_inverter_output():
-				trace('In set_inverter_output(): {}.set_signal( {} )'.format(output_wire.name, new_value))
-				output_wire.set_signal( new_value )
+	def LogicGate(self, gate_type, input_wires, output_wire):
+		""" Connects any number of input wires and 1 output wire through a gate: an N-input AND,
+		    OR, NAND, NOR, XOR (odd parity) or XNOR (even parity), or an inverter.
 
-			self._after_delay(
-				self.inverter_delay,
-				#(lambda : output_wire.set_signal( new_value )))
-				Action(set_inverter_output, output_wire.name, new_value))
-		trace('In Inverter(): {}._add_action( <delayed action on {}> )'.format(input_wire.name, output_wire.name))
-		input_wire._add_action( invert_input )
+		:param gate_type: 'AND', 'OR', 'NOT', 'NAND', 'NOR', 'XOR' or 'XNOR'
+		:param input_wires: input wires (a single one for 'NOT')
+		:param output_wire: output wire
+		:type gate_type: str
+		:type input_wires: list
+		:type output_wire: _WireObject
+		"""
+		if gate_type not in GATE_TYPES:
+			raise UnknownOperationException(gate_type)
+		t = GATE_TYPES.index(gate_type)
+		if not input_wires or (t == _NOT and len(input_wires) != 1):
+			raise ValueError('{}: wrong number of inputs ({})'.format(gate_type, len(input_wires)))
+		self._add_gate( t, [ w.index for w in input_wires ], output_wire.index )
 		return 'ok'
 
 	def _logical_not(self, s):
-		trace('_logical_not({})'.format(s))
+		if VERBOSE: trace('_logical_not({})', s)
 		if (s==0): return 1
 		elif (s==1): return 0
 		else: raise InvalidSignalException
 
 
 	def _logical_and(self, s1, s2):
-		trace('_logical_and({}, {})'.format(s1, s2))
+		if VERBOSE: trace('_logical_and({}, {})', s1, s2)
 		if (s1==1 and s2==1): return 1
 		return 0
 		
 		
 	def _logical_or(self, s1, s2):
-		trace('_logical_or({}, {})'.format(s1, s2))
+		if VERBOSE: trace('_logical_or({}, {})', s1, s2)
 		if (s1==1 or s2==1): return 1
 		return 0
 
 	
-	def propagate(self, interactive=False):
+	def propagate(self, interactive=False, max_events=None):
 		""" Propagate a signal along a circuit.
 
 		:param interactive: if True, prompt user before computing the next cycle (optional)
+		:param max_events: maximum number of actions to run (optional)
 		:type interactive: bool
+		:type max_events: int
+		:returns: 'done' if the agenda is empty, 'pending' if the budget ran out first
+		:rtype: str
 		 """
+		if interactive or VERBOSE:
+			self._run_traced(interactive, max_events)
+		else:
+			self.run( max_events=max_events )
+		return 'done' if self.agenda.is_empty() else 'pending'
+
+	def _run_traced(self, interactive, max_events):
+		""" The step-by-step version of the simulation loop, with trace and prompts """
+		events = 0
+		while not self.agenda.is_empty():
+			if max_events is not None and events >= max_events:
+				break
+			first_item = self.agenda.get_first()
+			if VERBOSE: trace('propagate(): running first item = {}()', first_item)
+			first_item()
+			self.agenda.remove_first()
+			events += 1
+			if interactive:
+				go = input("Validate for next step.")
+		return events
+
+	def _run_instrumented(self, until, max_events):
+		""" The simulation loop, with every transition going through _set_value() (and its hooks) """
+		agenda = self.agenda
+		profiler = self.profiler
+		events = 0
+		while events != max_events:
+			t = agenda.first_time()
+			if t is None or (until is not None and t > until):
+				break
+			item = agenda.pop_first()
+			events += 1
+			if profiler is not None:
+				profiler.event(agenda, item)
+			if item.__class__ is int:
+				self._apply_event(item)
+			else:
+				item.function()
+		return events
 
-		if self.agenda.is_empty():
-			return 'done'
-		first_item = self.agenda.get_first()
-		trace('propagate(): running first item = {}()'.format(first_item))
-		first_item()	
-		self.agenda.remove_first()
-		if interactive:
-			go = input("Validate for next step.")
-		return (self.propagate())
-	
+	def run(self, until=None, max_events=None):
+		""" The simulation loop: run the actions of the agenda, in chronological order.
+
+		:param until: run the actions scheduled up to that time (included), then move the clock to it (optional)
+		:param max_events: maximum number of actions to run (optional)
+		:type until: int
+		:type max_events: int
+		:returns: the number of actions run
+		:rtype: int
+		"""
+		if max_events is None:
+			max_events = -1
+		if self.profiler is not None:
+			start = time.perf_counter()
+			events = self._run_instrumented(until, max_events)
+			self.profiler.run(events, time.perf_counter() - start)
+		elif TRACE_SINK is not None:
+			events = self._run_instrumented(until, max_events)
+		else:
+			events = self._run(until, max_events)
+		if until is not None and events != max_events and self.agenda.current_time < until:
+			# nothing left before the deadline: the clock moves forward
+			self.agenda.current_time = until
+		return events
+
+	def _run(self, until, max_events):
+		""" The fast simulation loop: transitions are applied directly on the netlist arrays """
+		agenda = self.agenda
+		pop_first = agenda.pop_first
+		is_empty = agenda.is_empty
+		first_time = agenda.first_time
+		add = agenda.add
+
+		net = self.netlist
+		values = net.values
+		gate_type = net.gate_type
+		gate_output = net.gate_output
+		input_start = net.gate_input_start
+		inputs = net.gate_inputs
+		pending_value = net.gate_pending_value
+		pending_count = net.gate_pending_count
+		pending_time = net.gate_pending_time
+		fanout_start, fanout, extra, csr_wires = net.fanout_start, net.fanout, net.fanout_extra, net.fanout_wires
+		actions = self.actions
+		delays = self._delays()
+		inertial = self.inertial
+		truth_tables = _TRUTH_TABLES
+		evaluate_gate = net.evaluate_gate
+		waveform = self.waveform
+		if waveform is not None:
+			watched, wave_times, wave_codes = waveform.watched(net.wire_count)
+			wave_limit = waveform.buffer_size
+
+		events = scheduled = suppressed = cancelled = 0
+		while events != max_events:
+			if until is None:
+				if is_empty():
+					break
+			else:
+				t = first_time()
+				if t is None or t > until:
+					break
+			item = pop_first()
+			events += 1
+
+			if item.__class__ is not int:
+				item.function()
+				# the procedure may have changed the netlist
+				fanout_start, fanout, extra, csr_wires = net.fanout_start, net.fanout, net.fanout_extra, net.fanout_wires
+				if waveform is not None:
+					watched = waveform.watched(net.wire_count)[0]
+				continue
+
+			g = item >> 1
+			value = item & 1
+			now = agenda.current_time
+			if inertial:
+				if pending_time[g] != now or pending_value[g] != value:
+					# superseded
+					continue
+				pending_time[g] = -1
+			else:
+				pending_count[g] -= 1
+			w = gate_output[g]
+			if values[w] == value:
+				continue
+			values[w] = value
+			if waveform is not None and watched[w]:
+				wave_times.append(now)
+				wave_codes.append( (w << 1) | value )
+				if len(wave_codes) >= wave_limit:
+					waveform.flush()
+
+			if w < csr_wires:
+				for k in range(fanout_start[w], fanout_start[w+1]):
+					g = fanout[k]
+					t = gate_type[g]
+					s = input_start[g]
+					if t == _NOT:
+						new_value = values[inputs[s]] ^ 1
+					elif input_start[g+1] - s == 2:
+						new_value = truth_tables[t][ (values[inputs[s]] << 1) | values[inputs[s+1]] ]
+					else:
+						new_value = evaluate_gate(g)
+
+					if inertial:
+						if pending_time[g] >= 0:
+							if pending_value[g] == new_value:
+								suppressed += 1
+								continue
+							pending_time[g] = -1
+							cancelled += 1
+						if values[ gate_output[g] ] == new_value:
+							suppressed += 1
+							continue
+						pending_time[g] = now + delays[t]
+					else:
+						if (pending_value[g] if pending_count[g] else values[ gate_output[g] ]) == new_value:
+							suppressed += 1
+							continue
+						pending_count[g] += 1
+					pending_value[g] = new_value
+					add( now + delays[t], (g << 1) | new_value )
+					scheduled += 1
+			if extra and w in extra:
+				# gates added since the fan-out arrays were built
+				for g in extra[w]:
+					self._schedule( g, net.evaluate_gate(g) )
+			if actions and w in actions:
+				for proc in actions[w]:
+					proc()
+				fanout_start, fanout, extra, csr_wires = net.fanout_start, net.fanout, net.fanout_extra, net.fanout_wires
+				if waveform is not None:
+					watched = waveform.watched(net.wire_count)[0]
+
+		self.events_scheduled += scheduled
+		self.events_suppressed += suppressed
+		self.events_cancelled += cancelled
+		return events
+
+	def run_until(self, time, max_events=None):
+		""" Run the simulation up to the given time (included).
+
+		:param time: an absolute simulated time
+		:param max_events: maximum number of actions to run (optional)
+		:type time: int
+		:type max_events: int
+		:returns: the number of actions run
+		:rtype: int
+		"""
+		return self.run( until=time, max_events=max_events )
+
+	def run_for(self, duration, max_events=None):
+		""" Run the simulation for the given duration, from the current time.
+
+		:param duration: a simulated time interval
+		:param max_events: maximum number of actions to run (optional)
+		:type duration: int
+		:type max_events: int
+		:returns: the number of actions run
+		:rtype: int
+		"""
+		return self.run( until=self.agenda.current_time + duration, max_events=max_events )
+
+	def snapshot(self):
+		""" Capture the state of the simulation: wire values, pending gate transitions, agenda and
+		    clock, and event counters. The copies are flat array copies (and, for the agenda, a tuple
+		    of its pending items), so that a settled circuit is cheap to capture: a regression can
+		    settle a circuit once, then restore() the state before each stimulus.
+
+		The procedures attached to the wires (probes, word-level operations...) are not part of the
+		snapshot: those that keep a state of their own are not rolled back.
+
+		:rtype: SimulationState
+		"""
+		net = self.netlist
+		return SimulationState( bytes(net.values), bytes(net.gate_pending_value), array('i', net.gate_pending_count),
+			array('q', net.gate_pending_time), self.agenda.snapshot(),
+			(self.events_scheduled, self.events_suppressed, self.events_cancelled) )
+
+	def restore(self, state):
+		""" Return to a state captured by snapshot(), on the same circuit. The arrays of the netlist
+		    are overwritten in place.
+
+		:param state: a snapshot of this simulator
+		:type state: SimulationState
+		:raises ValueError: if wires or gates were added since the snapshot
+		"""
+		net = self.netlist
+		if len(state.values) != net.wire_count or len(state.pending_value) != net.gate_count:
+			raise ValueError('the circuit changed since the snapshot')
+		net.values[:] = state.values
+		net.gate_pending_value[:] = state.pending_value
+		net.gate_pending_count[:] = state.pending_count
+		net.gate_pending_time[:] = state.pending_time
+		self.agenda.restore(state.agenda)
+		self.events_scheduled, self.events_suppressed, self.events_cancelled = state.counters
 
 	def set_wires(self, wire_array, value):
 		""" Utility function initializes an array of wires from an integer : first index in the wire array carries the LSB
@@ -0,0 +1,384 @@
+#!/usr/bin/python3
+#
+# digital_circuit_core_test.py: unit tests for the simulator core
+
+import unittest
+import io
+import json
+import digital_circuit_core
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+
+
+class QueueUnitTest( unittest.TestCase ):
+	""" The time segment queue grows and shrinks as needed """
+
+	def testGrowth(self):
+		q = Queue(4)
+		for i in range(1000):
+			q.enqueue(i)
+		self.assertEqual( len(q), 1000 )
+		self.assertEqual( [ q.dequeue() for i in range(1000) ], list(range(1000)) )
+		self.assertTrue( q.is_empty() )
+		self.assertEqual( len(q.array), 4 )
+
+	def testWrapAround(self):
+		""" Interleaved operations: the array is full while the head is in the middle """
+		q = Queue(4)
+		for i in range(3):
+			q.enqueue(i)
+		self.assertEqual( q.dequeue(), 0 )
+		self.assertEqual( q.dequeue(), 1 )
+		for i in range(3, 20):
+			q.enqueue(i)
+		self.assertEqual( q.peek(), 2 )
+		self.assertEqual( [ q.dequeue() for i in range(18) ], list(range(2, 20)) )
+		self.assertRaises( UnderflowException, q.dequeue )
+
+
+class AgendaUnitTest( unittest.TestCase ):
+	""" The agenda backends must behave like the original, linear agenda """
+
+	agenda_classes = [ LinearAgenda, Agenda, CalendarAgenda ]
+
+	def _run(self, agenda, schedule):
+		""" Schedule (time, label) pairs, then drain the agenda: return the labels and times in execution order """
+		executed = []
+		for t, label in schedule:
+			agenda.add( t, Action( (lambda label=label: executed.append( (agenda.current_time, label) )), label, 0))
+		while not agenda.is_empty():
+			agenda.get_first()()
+			agenda.remove_first()
+		return executed
+
+	def testChronologicalOrder(self):
+		schedule = [ (5, 'a'), (3, 'b'), (9, 'c'), (3, 'd'), (1, 'e'), (5, 'f') ]
+		expected = [ (1, 'e'), (3, 'b'), (3, 'd'), (5, 'a'), (5, 'f'), (9, 'c') ]
+		for agenda_class in self.agenda_classes:
+			self.assertEqual( self._run( agenda_class(), schedule ), expected )
+
+	def testEmpty(self):
+		for agenda_class in self.agenda_classes:
+			agenda = agenda_class()
+			self.assertTrue( agenda.is_empty() )
+			self.assertRaises( UnderflowException, agenda.get_first )
+
+	def testCalendarBeyondHorizon(self):
+		""" Times beyond the wheel go to the overflow heap, and keep their FIFO order once the horizon reaches them """
+		agenda = CalendarAgenda( size=4 )
+		schedule = [ (10, 'far'), (2, 'near'), (10, 'far-too'), (6, 'mid') ]
+		self.assertEqual( self._run( agenda, schedule ), [ (2, 'near'), (6, 'mid'), (10, 'far'), (10, 'far-too') ])
+		self.assertEqual( agenda.current_time, 10 )
+
+	def testSegments(self):
+		for agenda_class in self.agenda_classes:
+			agenda = agenda_class()
+			for t in (7, 2, 4, 2):
+				agenda.add( t, Action( None, 'w', 0 ))
+			self.assertEqual( [ s.time for s in agenda.segments ], [2, 4, 7] )
+
+
+class SimulatorUnitTest( unittest.TestCase ):
+	""" The simulation loop """
+
+	def _inverter_chain(self, sim, n):
+		wires = [ sim.Wire() for i in range(n+1) ]
+		# settle each inverter before adding the next one: built in one go, the chain
+		# would ripple O(n^2) transitions before settling
+		for i in range(n):
+			sim.Inverter( wires[i], wires[i+1] )
+			sim.propagate()
+		return wires
+
+	def testLongChain(self):
+		""" Far more events than the recursion limit """
+		sim = Simulator()
+		wires = self._inverter_chain( sim, 3000 )
+		wires[0].set_signal(1)
+		self.assertEqual( sim.propagate(), 'done' )
+		self.assertEqual( wires[-1].get_signal(), 1 )
+		self.assertEqual( wires[-2].get_signal(), 0 )
+
+	def testRunUntil(self):
+		sim = Simulator()
+		wires = self._inverter_chain( sim, 10 )
+		start = sim.agenda.current_time
+		wires[0].set_signal(1)
+		# inverter delay: 2
+		self.assertEqual( sim.run_until( start + 5 ), 2 )
+		self.assertEqual( sim.agenda.current_time, start + 5 )
+		self.assertEqual( [ w.get_signal() for w in wires[:4] ], [1, 0, 1, 1] )
+		self.assertEqual( sim.run_for( 4 ), 2 )
+		self.assertEqual( sim.agenda.current_time, start + 9 )
+		sim.propagate()
+		self.assertEqual( sim.agenda.current_time, start + 20 )
+
+	def testIndependentSimulators(self):
+		""" Each simulator has its own agenda and clock """
+		sim1, sim2 = Simulator(), Simulator( CalendarAgenda )
+		self.assertIsNot( sim1.agenda, sim2.agenda )
+		self.assertIsInstance( sim2.agenda, CalendarAgenda )
+		w1 = self._inverter_chain( sim1, 3 )
+		w2 = self._inverter_chain( sim2, 2 )
+		w1[0].set_signal(1)
+		sim2.propagate()
+		self.assertEqual( w1[1].get_signal(), 1 )
+		# the second inverter's output is already 0: nothing to schedule
+		self.assertEqual( sim2.agenda.current_time, 2 )
+		sim1.propagate()
+		self.assertEqual( w1[1].get_signal(), 0 )
+		self.assertEqual( [ w.index for w in w1 ], [0, 1, 2, 3] )
+		self.assertEqual( sim1.wire_count, 4 )
+
+	def testMaxEvents(self):
+		sim = Simulator()
+		wires = self._inverter_chain( sim, 10 )
+		wires[0].set_signal(1)
+		self.assertEqual( sim.propagate( max_events=3 ), 'pending' )
+		self.assertEqual( wires[4].get_signal(), 0 )
+		self.assertEqual( sim.run( max_events=100 ), 7 )
+		self.assertTrue( sim.agenda.is_empty() )
+		self.assertEqual( wires[10].get_signal(), 1 )
+
+
+class SnapshotUnitTest( unittest.TestCase ):
+	""" Capture and restore the state of a simulation """
+
+	def _glitch(self, sim):
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		return x, y, o
+
+	def testRestorePending(self):
+		""" A snapshot taken in the middle of a transition replays the same events """
+		for agenda_class in (LinearAgenda, Agenda, CalendarAgenda):
+			for inertial in (False, True):
+				sim = Simulator(agenda_class)
+				sim.inertial = inertial
+				x, y, o = self._glitch(sim)
+				x.set_signal(1)
+				sim.run_for(1)
+				state = sim.snapshot()
+				runs = []
+				for i in range(2):
+					sim.restore(state)
+					events = sim.run()
+					runs.append( (events, sim.agenda.current_time, y.get_signal(), o.get_signal(), sim.events_scheduled) )
+				self.assertEqual( runs[0], runs[1], (agenda_class.__name__, inertial) )
+				self.assertEqual( runs[0][2:4], (0, 0) )
+
+	def testFork(self):
+		""" Independent stimuli, each applied to the same settled state """
+		sim = Simulator()
+		x, y, o = self._glitch(sim)
+		state = sim.snapshot()
+		start = sim.agenda.current_time
+		# x = 1: y falls at +2, o glitches at +3 and +5
+		for value, events, duration in [ (1, 3, 5), (0, 0, 0), (1, 3, 5) ]:
+			sim.restore(state)
+			x.set_signal(value)
+			self.assertEqual( sim.run(), events )
+			self.assertEqual( sim.agenda.current_time, start + duration )
+			self.assertEqual( y.get_signal(), 1 - value )
+
+	def testChangedCircuit(self):
+		sim = Simulator()
+		x, y, o = self._glitch(sim)
+		state = sim.snapshot()
+		sim.Inverter(o, sim.Wire())
+		self.assertRaises( ValueError, sim.restore, state )
+
+	def testQueueItems(self):
+		q = Queue(4)
+		for i in range(3):
+			q.enqueue(i)
+		q.dequeue()
+		q.dequeue()
+		for i in range(3, 6):
+			q.enqueue(i)
+		self.assertEqual( q.items(), [2, 3, 4, 5] )
+
+
+class TraceUnitTest( unittest.TestCase ):
+	""" Structured traces of the signal transitions """
+
+	def _circuit(self, sim):
+		x = sim.Wire('x')
+		y = sim.Wire('y')
+		o = sim.Wire('o')
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		return x, y, o
+
+	def testJSONL(self):
+		sim = Simulator()
+		x, y, o = self._circuit(sim)
+		start = sim.agenda.current_time
+		out = io.StringIO()
+		with JSONLTraceSink(out, buffer_size=2) as sink:
+			self.assertIs( digital_circuit_core.TRACE_SINK, sink )
+			x.set_signal(1)
+			sim.propagate()
+		self.assertIsNone( digital_circuit_core.TRACE_SINK )
+		records = [ json.loads(line) for line in out.getvalue().splitlines() ]
+		names = dict( (r['wire'], r['name']) for r in records if 'name' in r )
+		transitions = [ (r['time'] - start, names[r['wire']], r['old'], r['new'], r['gate']) for r in records if 'time' in r ]
+		# the AND gate sees x=1 before y falls: a glitch on o
+		self.assertEqual( transitions, [ (0, x.name, 0, 1, None), (2, y.name, 1, 0, 'NOT'), (3, o.name, 0, 1, 'AND'), (5, o.name, 1, 0, 'AND') ])
+
+	def testBinary(self):
+		sim = Simulator()
+		x, y, o = self._circuit(sim)
+		out = io.BytesIO()
+		sink = BinaryTraceSink(out)
+		set_trace_sink(sink)
+		x.set_signal(1)
+		sim.propagate()
+		set_trace_sink(None)
+		sink.flush()
+		out.seek(0)
+		transitions = list( read_binary_trace(out) )
+		self.assertEqual( [ t[1:] for t in transitions ], [ (x.name, 0, 1, None), (y.name, 1, 0, 'NOT'), (o.name, 0, 1, 'AND'), (o.name, 1, 0, 'AND') ])
+
+
+class NetlistUnitTest( unittest.TestCase ):
+	""" The compact netlist behind the Wire()/gate API """
+
+	def testFanout(self):
+		net = Netlist()
+		a, b, c, d = net.new_wires(4)
+		g0 = net.add_gate( 0, (a, b), c )
+		g1 = net.add_gate( 2, (a,), d )
+		self.assertEqual( net.fanout_of(a), [g0, g1] )
+		net.update_fanout(force=True)
+		self.assertEqual( net.fanout_extra, {} )
+		g2 = net.add_gate( 1, (c, a), b )
+		self.assertEqual( net.fanout_of(a), [g0, g1, g2] )
+		self.assertEqual( net.fanout_of(c), [g2] )
+		self.assertEqual( net.fanout_of(d), [] )
+		self.assertEqual( net.driver[b], g2 )
+
+	def testGates(self):
+		sim = Simulator()
+		x, y, o = sim.Wire('x'), sim.Wire(), sim.Wire()
+		sim.AndGate(x, y, o)
+		sim.Inverter(o, y)
+		self.assertEqual( sim.gates, [ Gate('AND', (x.index, y.index), o.index), Gate('NOT', (o.index,), y.index) ])
+		self.assertEqual( o.driver, 'AND' )
+		self.assertIsNone( x.driver )
+		self.assertTrue( x.name.startswith('wire-') )
+		self.assertEqual( y.name, '' )
+
+	def testWireHandles(self):
+		sim = Simulator()
+		w = sim.Wire()
+		handle = _WireObject(sim, w.index)
+		self.assertEqual( handle, w )
+		self.assertEqual( len({ handle, w }), 1 )
+		self.assertNotEqual( w, _WireObject(Simulator(), w.index) )
+		handle.set_signal(1)
+		self.assertEqual( w.get_signal(), 1 )
+
+
+class DelayModelUnitTest( unittest.TestCase ):
+	""" Redundant transitions are never scheduled; the inertial model also swallows short pulses """
+
+	def _glitch(self, sim):
+		""" x=1 reaches the AND gate before !x falls: a 2-time-unit pulse on o, with transport delays """
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		transitions = []
+		o._add_action( lambda: transitions.append( (sim.agenda.current_time, o.get_signal()) ))
+		x.set_signal(1)
+		sim.propagate()
+		return transitions[1:]
+
+	def testTransport(self):
+		sim = Simulator()
+		self.assertEqual( self._glitch(sim), [ (5, 1), (7, 0) ] )
+		self.assertEqual( sim.events_cancelled, 0 )
+
+	def testInertial(self):
+		sim = Simulator()
+		sim.inertial = True
+		self.assertEqual( self._glitch(sim), [] )
+		self.assertEqual( sim.events_cancelled, 1 )
+
+	def testSuppressed(self):
+		""" Setting an OR gate's second input while the first is already 1 changes nothing downstream """
+		for inertial in (False, True):
+			sim = Simulator()
+			sim.inertial = inertial
+			a, b, o = sim.Wire(), sim.Wire(), sim.Wire()
+			sim.OrGate(a, b, o)
+			sim.propagate()
+			a.set_signal(1)
+			sim.propagate()
+			scheduled = sim.events_scheduled
+			b.set_signal(1)
+			sim.propagate()
+			self.assertEqual( sim.events_scheduled, scheduled )
+			a.set_signal(0)
+			b.set_signal(0)
+			# a falls while b still holds the output: only the fall of b gets through
+			sim.propagate()
+			self.assertEqual( o.get_signal(), 0 )
+
+
+class GateUnitTest( unittest.TestCase ):
+	""" The compound and N-input gates """
+
+	def testTruthTables(self):
+		functions = { 'AND': lambda bits: int(all(bits)), 'OR': lambda bits: int(any(bits)),
+			'NAND': lambda bits: 1-int(all(bits)), 'NOR': lambda bits: 1-int(any(bits)),
+			'XOR': lambda bits: sum(bits) % 2, 'XNOR': lambda bits: 1 - sum(bits) % 2 }
+		for n in (2, 3, 4):
+			sim = Simulator()
+			inputs = sim.WireArray(n)
+			outputs = {}
+			for gate_type in sorted(functions):
+				outputs[gate_type] = sim.Wire()
+				sim.LogicGate(gate_type, inputs, outputs[gate_type])
+			for v in range(2**n):
+				sim.set_wires(inputs, v)
+				sim.propagate()
+				bits = [ (v >> i) & 1 for i in range(n) ]
+				for gate_type, f in functions.items():
+					self.assertEqual( outputs[gate_type].get_signal(), f(bits), (gate_type, bits) )
+
+	def testDelays(self):
+		sim = Simulator()
+		sim.xor_gate_delay = 4
+		a, b, x, nx = sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire()
+		sim.XorGate(a, b, x)
+		sim.NandGate(x, x, nx)
+		sim.propagate()
+		start = sim.agenda.current_time
+		a.set_signal(1)
+		sim.run_until( start + 3 )
+		self.assertEqual( x.get_signal(), 0 )
+		sim.run_until( start + 4 )
+		self.assertEqual( x.get_signal(), 1 )
+		sim.propagate()
+		self.assertEqual( sim.agenda.current_time, start + 4 + sim.nand_gate_delay )
+		self.assertEqual( nx.get_signal(), 0 )
+		self.assertEqual( x.driver, 'XOR' )
+
+	def testInvalid(self):
+		sim = Simulator()
+		a, b, o = sim.Wire(), sim.Wire(), sim.Wire()
+		self.assertRaises( UnknownOperationException, sim.LogicGate, 'MUX', [a, b], o )
+		self.assertRaises( ValueError, sim.LogicGate, 'NOT', [a, b], o )
+		self.assertRaises( ValueError, sim.LogicGate, 'AND', [], o )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+#
+# digital_circuit_history.py: in-memory signal history
+#
+# A SignalHistory records the transitions of the selected wires, like the waveform writers, but
+# keeps them in memory, in two columns per wire: the times of the transitions (array of int64),
+# and the values (bytearray). Only actual changes are stored (run-length encoding: a value holds
+# until the next entry), and an optional window keeps the most recent transitions only. Queries
+# are binary searches over the time column:
+#
+#	with SignalHistory(sim, wires=s) as history:
+#		...
+#	history.value_at(s[7], 143)
+#	history.transitions(s[7], 100, 200)
+
+import bisect
+from array import array
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+from digital_circuit_waveform import WaveformRecorder
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+class SignalHistory( WaveformRecorder ):
+	""" Per-wire, time-indexed transition history of a simulation """
+
+	def __init__(self, sim, wires=None, buffer_size=65536, window=None):
+		"""
+		:param sim: the simulator to record
+		:param wires: the wires to record (default: all the wires of the simulator)
+		:param buffer_size: number of transitions buffered before they are sorted into the wire columns
+		:param window: if set, maximum number of transitions kept per wire (the oldest ones are dropped)
+		:type sim: Simulator
+		:type wires: list
+		:type buffer_size: int
+		:type window: int
+		"""
+		WaveformRecorder.__init__(self, sim, None, wires, None, buffer_size)
+		self.window = window
+		self.columns = dict( (w, (array('q'), bytearray())) for w in self.indices )
+
+	def _write_header(self):
+		pass
+
+	def _write_chunk(self, times, codes):
+		columns = self.columns
+		window = self.window
+		for time, code in zip(times, codes):
+			column_times, column_values = columns[code >> 1]
+			value = code & 1
+			if column_values and column_values[-1] == value:
+				continue
+			column_times.append(time)
+			column_values.append(value)
+			if window is not None and len(column_values) >= 2*window:
+				# drop the oldest transitions, by blocks of `window`: amortized constant time
+				del column_times[:-window]
+				del column_values[:-window]
+
+	def _column(self, wire):
+		self.flush()
+		w = wire.index if isinstance(wire, _WireObject) else wire
+		times, values = self.columns[w]
+		if self.window is not None and len(values) > self.window:
+			del times[:-self.window]
+			del values[:-self.window]
+		return times, values
+
+	def value_at(self, wire, time):
+		""" The value a wire carried at a given time (after the transitions of that time)
+
+		:param wire: a recorded wire (or its index)
+		:param time: simulated time
+		:type wire: _WireObject
+		:type time: int
+		:returns: the value, or None if the time precedes the recorded history
+		:rtype: int
+		"""
+		times, values = self._column(wire)
+		k = bisect.bisect_right(times, time)
+		return values[k-1] if k else None
+
+	def transitions(self, wire, start=None, end=None):
+		""" The transitions of a wire within a time interval (bounds included)
+
+		:param wire: a recorded wire (or its index)
+		:param start: start of the interval (optional)
+		:param end: end of the interval (optional)
+		:type wire: _WireObject
+		:type start: int
+		:type end: int
+		:returns: (time, value) pairs, in chronological order
+		:rtype: list
+		"""
+		times, values = self._column(wire)
+		first = 0 if start is None else bisect.bisect_left(times, start)
+		last = len(times) if end is None else bisect.bisect_right(times, end)
+		return list( zip(times[first:last], values[first:last]) )
+
+	def to_numpy(self, wire):
+		""" The history of a wire, as NumPy arrays (requires NumPy)
+
+		:returns: times (int64) and values (uint8)
+		:rtype: tuple
+		"""
+		if numpy is None:
+			raise ImportError('to_numpy() requires NumPy')
+		times, values = self._column(wire)
+		return numpy.frombuffer(times, dtype=numpy.int64).copy(), numpy.frombuffer(values, dtype=numpy.uint8).copy()
+
+	def memory(self):
+		""" Bytes used by the wire columns
+
+		:rtype: int
+		"""
+		return sum( len(times)*times.itemsize + len(values) for times, values in self.columns.values() )
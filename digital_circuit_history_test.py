@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+#
+# digital_circuit_history_test.py: unit tests for the signal history store
+
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_history import *
+
+
+class SignalHistoryUnitTest( unittest.TestCase ):
+
+	def _glitch(self, sim):
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		return x, y, o
+
+	def testQueries(self):
+		sim = Simulator()
+		x, y, o = self._glitch(sim)
+		start = sim.agenda.current_time
+		with SignalHistory(sim) as history:
+			x.set_signal(1)
+			sim.propagate()
+			x.set_signal(1)
+			sim.run_for(10)
+			x.set_signal(0)
+			sim.propagate()
+		self.assertIsNone( history.value_at(o, start-1) )
+		self.assertEqual( [ history.value_at(o, start+t) for t in range(8) ], [0, 0, 0, 1, 1, 0, 0, 0] )
+		self.assertEqual( history.transitions(o, start+1, start+5), [ (start+3, 1), (start+5, 0) ])
+		# setting x to its current value is no transition
+		self.assertEqual( [ v for t, v in history.transitions(x) ], [0, 1, 0] )
+		self.assertEqual( history.transitions(y, start+8), [ (start+17, 1) ])
+
+	def testWindow(self):
+		sim = Simulator()
+		x, y = sim.Wire(), sim.Wire()
+		sim.Inverter(x, y)
+		sim.propagate()
+		with SignalHistory(sim, wires=[y], window=4, buffer_size=3) as history:
+			for i in range(20):
+				x.set_signal(1 - x.get_signal())
+				sim.propagate()
+		transitions = history.transitions(y)
+		self.assertEqual( len(transitions), 4 )
+		self.assertEqual( transitions[-1], (sim.agenda.current_time, y.get_signal()) )
+		self.assertIsNone( history.value_at(y, transitions[0][0]-1) )
+		self.assertRaises( KeyError, history.transitions, x )
+
+	def testAdder(self):
+		""" The history of the sum wires gives the settled sums """
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		settled = []
+		with SignalHistory(sim, wires=s) as history:
+			for a, b in [ (3, 4), (200, 100), (255, 255) ]:
+				sim.set_wires(x, a)
+				sim.set_wires(y, b)
+				sim.propagate()
+				settled.append( sim.agenda.current_time )
+		for t, total in zip(settled, [7, 300, 510]):
+			self.assertEqual( sum( history.value_at(w, t) << i for i, w in enumerate(s) ), total )
+		self.assertGreater( history.memory(), 0 )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+#
+# digital_circuit_levelized.py: zero-delay, cycle-based evaluation of combinational circuits
+#
+# When only the settled outputs of a combinational circuit matter (functional checks of adders,
+# voting circuits...), gate delays and the agenda are pure overhead: once the netlist captured
+# by the simulator is sorted in topological order ("levelized"), a single pass over the gates
+# computes the same steady state as the event-driven propagate().
+
+from digital_circuit_core import *
+
+
+class CombinationalLoopException(Exception): pass
+
+
+def levelize(n_wires, gates):
+	""" Sort the gates of a netlist by level: a gate's level is 1 + the highest level among the
+	    gates that drive its inputs (gates fed only by primary inputs are on level 0).
+
+	:param n_wires: number of wires in the netlist
+	:param gates: the gates (Gate tuples: type, input wire indices, output wire index)
+	:type n_wires: int
+	:type gates: list
+	:returns: a list of levels, each a list of gate indices
+	:rtype: list
+	:raises CombinationalLoopException: if the netlist contains a loop
+	"""
+	fanout = [ [] for w in range(n_wires) ]
+	driven = [ 0 ]*n_wires
+	for g, gate in enumerate(gates):
+		for w in gate.inputs:
+			fanout[w].append(g)
+		driven[gate.output] += 1
+
+	# number of driving gates not evaluated yet, for each gate: a gate becomes ready in the wave
+	# that follows the last of its drivers, hence the wave number is its level
+	pending = [ sum( driven[w] for w in gate.inputs ) for gate in gates ]
+	levels = []
+	ready = [ g for g in range(len(gates)) if pending[g] == 0 ]
+	done = 0
+	while ready:
+		levels.append(ready)
+		done += len(ready)
+		next_ready = []
+		for g in ready:
+			for h in fanout[ gates[g].output ]:
+				pending[h] -= 1
+				if pending[h] == 0:
+					next_ready.append(h)
+		ready = next_ready
+	if done != len(gates):
+		raise CombinationalLoopException('{} gates are part of, or depend on, a loop'.format(len(gates)-done))
+	return levels
+
+
+class LevelizedEvaluator(object):
+	""" Zero-delay evaluator for the combinational netlist built on a simulator.
+
+	The gates are flattened, in level order, into a list of (operation, input, input, output)
+	instructions over a flat array of wire values: evaluating an input vector is one pass over
+	that list, with no closure, no agenda, and no intermediate transition. Gates with more than
+	2 inputs become a chain of 2-input instructions, through temporary slots appended to the array.
+
+	The evaluator starts from the current signals of the simulator, and then lives its own life:
+	wires are still designated by the simulator's wire objects::
+
+		ev = LevelizedEvaluator(sim)
+		ev.set_wires(x_wires, 23)
+		ev.set_wires(y_wires, 19)
+		ev.evaluate()
+		ev.wires_to_integer(s_wires)	# 42
+	"""
+
+	AND, OR, NOT, NAND, NOR, XOR, XNOR = range(7)
+	OPERATIONS = { 'AND': AND, 'OR': OR, 'NOT': NOT, 'NAND': NAND, 'NOR': NOR, 'XOR': XOR, 'XNOR': XNOR }
+	# the operation accumulating the first inputs of a N-input gate
+	CHAINS = { AND: AND, OR: OR, NAND: AND, NOR: OR, XOR: XOR, XNOR: XOR }
+	# a 1-input gate: a buffer (a 2-input AND of its input with itself), or an inverter
+	SINGLE = { AND: AND, OR: AND, XOR: AND, NOT: NOT, NAND: NOT, NOR: NOT, XNOR: NOT }
+
+	def __init__(self, sim):
+		"""
+		:param sim: the simulator the circuit was built on
+		:type sim: Simulator
+		"""
+		gates = sim.gates
+		self.levels = levelize( sim.wire_count, gates )
+		self.program = []
+		temporary = sim.wire_count
+		for level in self.levels:
+			for g in level:
+				gate = gates[g]
+				op = self.OPERATIONS[gate.type]
+				a = gate.inputs[0]
+				if len(gate.inputs) == 1:
+					self.program.append( (self.SINGLE[op], a, a, gate.output) )
+					continue
+				for b in gate.inputs[1:-1]:
+					self.program.append( (self.CHAINS[op], a, b, temporary) )
+					a = temporary
+					temporary += 1
+				self.program.append( (op, a, gate.inputs[-1], gate.output) )
+		self.values = list( sim.netlist.values ) + [ 0 ]*(temporary - sim.wire_count)
+
+	def evaluate(self):
+		""" Compute the steady state of all wires from the current input values """
+		v = self.values
+		AND, OR, NOT, NAND, NOR, XOR = self.AND, self.OR, self.NOT, self.NAND, self.NOR, self.XOR
+		for op, a, b, o in self.program:
+			if op == AND:
+				v[o] = v[a] & v[b]
+			elif op == OR:
+				v[o] = v[a] | v[b]
+			elif op == NOT:
+				v[o] = 1 - v[a]
+			elif op == NAND:
+				v[o] = 1 - (v[a] & v[b])
+			elif op == NOR:
+				v[o] = 1 - (v[a] | v[b])
+			elif op == XOR:
+				v[o] = v[a] ^ v[b]
+			else:
+				v[o] = 1 - (v[a] ^ v[b])
+
+	def get_signal(self, wire):
+		""" The value carried by a wire
+
+		:rtype: int
+		"""
+		return self.values[ wire.index ]
+
+	def set_signal(self, wire, value):
+		""" Set the value of a (primary input) wire """
+		self.values[ wire.index ] = value
+
+	def set_wires(self, wire_array, value):
+		""" Set an array of wires from an integer (first wire carries the LSB)
+
+		:param wire_array: an array of _WireObject objects
+		:param value: an integer
+		:type wire_array: list
+		:type value: int
+		"""
+		v = self.values
+		for w in wire_array:
+			v[ w.index ] = value & 1
+			value >>= 1
+
+	def wires_to_integer(self, wire_arr):
+		""" Read the signals carried by an array of wires as an integer (first wire carries the LSB)
+
+		:rtype: int
+		"""
+		v = self.values
+		out_value = 0
+		for pos, w in enumerate(wire_arr):
+			out_value |= v[ w.index ] << pos
+		return out_value
+
+	def simulate(self, inputs, outputs, vectors):
+		""" Evaluate a sequence of input vectors.
+
+		:param inputs: input wire groups
+		:param outputs: output wire groups
+		:param vectors: stimulus vectors (tuples of integers, one per input group)
+		:type inputs: list
+		:type outputs: list
+		:type vectors: iterable
+		:returns: the output vectors (tuples of integers, one per output group)
+		:rtype: list
+		"""
+		results = []
+		for vector in vectors:
+			for wires, value in zip(inputs, vector):
+				self.set_wires(wires, value)
+			self.evaluate()
+			results.append( tuple( self.wires_to_integer(wires) for wires in outputs ))
+		return results
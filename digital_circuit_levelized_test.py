@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+#
+# digital_circuit_levelized_test.py: unit tests for the zero-delay evaluator
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_levelized import *
+
+
+class LevelizedEvaluatorUnitTest( unittest.TestCase ):
+
+	def testRippleCarryAdder(self):
+		""" Same results as the event-driven simulation """
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(10), sim.WireArray(10), sim.WireArray(11)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		ev = LevelizedEvaluator(sim)
+
+		rng = random.Random(5)
+		vectors = [ (rng.getrandbits(10), rng.getrandbits(10)) for i in range(50) ]
+		results = ev.simulate([x, y], [s], vectors)
+		for (a, b), (total,) in zip(vectors, results):
+			sim.set_wires(x, a)
+			sim.set_wires(y, b)
+			sim.propagate()
+			self.assertEqual( total, sim.wires_to_integer(s) )
+			self.assertEqual( total, a+b )
+
+	def testLevels(self):
+		sim = CircuitLibrary()
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.TwoSwitches(x, y, o)
+		ev = LevelizedEvaluator(sim)
+		# xy, !x, !y | !x.!y | xy + !x.!y
+		self.assertEqual( [ len(level) for level in ev.levels ], [3, 1, 1] )
+		for vx, vy in [ (0, 0), (0, 1), (1, 0), (1, 1) ]:
+			ev.set_signal(x, vx)
+			ev.set_signal(y, vy)
+			ev.evaluate()
+			self.assertEqual( ev.get_signal(o), int(vx == vy) )
+
+	def testNativeGates(self):
+		""" N-input and compound gates: the majority voting circuit has a 3-input OR gate """
+		sim = NativeCircuitLibrary()
+		x, y, z, m, t = sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire()
+		sim.MajorityVoting(x, y, z, m)
+		sim.TwoSwitches(x, y, t)
+		ev = LevelizedEvaluator(sim)
+		for v in range(8):
+			ev.set_wires([x, y, z], v)
+			ev.evaluate()
+			self.assertEqual( ev.get_signal(m), int(bin(v).count('1') >= 2) )
+			self.assertEqual( ev.get_signal(t), int((v & 1) == (v >> 1) & 1) )
+
+	def testSingleInputGates(self):
+		""" A 1-input AND, OR or XOR gate is a buffer, a 1-input NAND, NOR or XNOR gate an inverter """
+		sim = Simulator()
+		a = sim.Wire()
+		outputs = {}
+		for gate_type in ('AND', 'OR', 'XOR', 'NAND', 'NOR', 'XNOR'):
+			outputs[gate_type] = sim.Wire()
+			sim.LogicGate( gate_type, [a], outputs[gate_type] )
+		ev = LevelizedEvaluator(sim)
+		for v in (0, 1):
+			a.set_signal(v)
+			sim.propagate()
+			ev.set_signal(a, v)
+			ev.evaluate()
+			for gate_type, o in outputs.items():
+				expected = v if gate_type in ('AND', 'OR', 'XOR') else 1-v
+				self.assertEqual( (o.get_signal(), ev.get_signal(o)), (expected, expected), (gate_type, v) )
+
+	def testLoop(self):
+		sim = CircuitLibrary()
+		a, b = sim.Wire(), sim.Wire()
+		sim.Inverter(a, b)
+		sim.Inverter(b, a)
+		self.assertRaises( CombinationalLoopException, LevelizedEvaluator, sim )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+#
+# digital_circuit_library.py: reference implementations of the classic circuits
+#
+# The circuits built in the assignments (majority voting, two switches, half-adder, full-adder,
+# ripple-carry adder), written once against the Simulator API, so that the benchmarks and the
+# other tools of the simulator have a known-good set of circuits to work with.
+#
+# Besides the ripple-carry adder, the log-depth adders: carry-lookahead (by blocks), and the
+# Kogge-Stone and Brent-Kung parallel prefix adders, all from the same AND/OR/NOT gates.
+
+from digital_circuit_core import *
+
+
+class CircuitLibrary( Simulator ):
+	""" A simulator that knows how to build the classic circuits (see Rosen, 12.3).
+
+		All methods follow the same convention as the gates: the wires that enter/exit the
+		circuit are created by the caller and passed as parameters; internal wires are created
+		inside the method.
+	"""
+
+	def MajorityVoting(self, x, y, z, o):
+		""" Majority voting (Rosen, 12.3, Example 2): F(x, y, z) = (xy + xz) + yz """
+		xy = self.Wire('xy')
+		xz = self.Wire('xz')
+		yz = self.Wire('yz')
+		xy_or_xz = self.Wire('xy_or_xz')
+
+		self.AndGate(x, y, xy)
+		self.AndGate(x, z, xz)
+		self.AndGate(y, z, yz)
+		self.OrGate(xy, xz, xy_or_xz)
+		self.OrGate(xy_or_xz, yz, o)
+
+		return 'ok'
+
+	def TwoSwitches(self, x, y, o):
+		""" Light controlled by 2 switches (Rosen, 12.3, Example 3): F(x, y) = xy + !x.!y """
+		xy = self.Wire('xy')
+		not_x = self.Wire('not_x')
+		not_y = self.Wire('not_y')
+		notx_noty = self.Wire('notx_noty')
+
+		self.AndGate(x, y, xy)
+		self.Inverter(x, not_x)
+		self.Inverter(y, not_y)
+		self.AndGate(not_x, not_y, notx_noty)
+		self.OrGate(xy, notx_noty, o)
+
+		return 'ok'
+
+	def HalfAdder(self, a, b, s, c):
+		""" The half-adder (Rosen, figure 8, p. 827): s = (a+b).!(ab), c = ab """
+		d = self.Wire('d-wire')
+		e = self.Wire('e-wire')
+
+		self.OrGate(a, b, d)
+		self.AndGate(a, b, c)
+		self.Inverter(c, e)
+		self.AndGate(d, e, s)
+
+		return 'ok'
+
+	def FullAdder(self, a, b, c_in, s, c_out):
+		""" The full-adder (Rosen, figure 9, p. 827): two half-adders and an OR gate """
+		d = self.Wire()
+		c1 = self.Wire()
+		c2 = self.Wire()
+
+		self.HalfAdder(b, c_in, d, c1)
+		self.HalfAdder(a, d, s, c2)
+		self.OrGate(c1, c2, c_out)
+
+		return 'ok'
+
+	def RippleCarryAdder(self, x_arr, y_arr, s_arr):
+		""" The n-bit ripple carry adder: a half-adder followed by a chain of n-1 full-adders
+
+		:param x_arr: first operand, a n-wire array (LSB on the left)
+		:param y_arr: second operand, a n-wire array (LSB on the left)
+		:param s_arr: sum, a n+1-wire array (LSB on the left)
+		:type x_arr: list
+		:type y_arr: list
+		:type s_arr: list
+		"""
+		n = len(x_arr)
+		# carry i is the output carry of the i-th adder; the last one is the MSB of the sum
+		c_arr = self.WireArray(n-1) + [ s_arr[n] ]
+
+		self.HalfAdder(x_arr[0], y_arr[0], s_arr[0], c_arr[0])
+		for i in range(1, n):
+			self.FullAdder(x_arr[i], y_arr[i], c_arr[i-1], s_arr[i], c_arr[i])
+
+		return 'ok'
+
+	def Xor(self, a, b, o):
+		""" o = a ^ b, as in the half-adder: (a+b).!(ab) """
+		d = self.Wire()
+		c = self.Wire()
+		e = self.Wire()
+
+		self.OrGate(a, b, d)
+		self.AndGate(a, b, c)
+		self.Inverter(c, e)
+		self.AndGate(d, e, o)
+
+		return 'ok'
+
+	def _or_tree(self, wires, o=None):
+		""" OR of a list of wires, as a balanced tree of 2-input gates (the root drives o, if given) """
+		while len(wires) > 2:
+			level = []
+			for i in range(0, len(wires)-1, 2):
+				w = self.Wire()
+				self.OrGate(wires[i], wires[i+1], w)
+				level.append(w)
+			if len(wires) % 2:
+				level.append(wires[-1])
+			wires = level
+		if o is None:
+			o = self.Wire()
+		self.OrGate(wires[0], wires[-1], o)
+		return o
+
+	def _and_tree(self, wires):
+		""" AND of a list of wires, as a balanced tree of 2-input gates (a single wire is returned as is) """
+		while len(wires) > 1:
+			level = []
+			for i in range(0, len(wires)-1, 2):
+				w = self.Wire()
+				self.AndGate(wires[i], wires[i+1], w)
+				level.append(w)
+			if len(wires) % 2:
+				level.append(wires[-1])
+			wires = level
+		return wires[0]
+
+	def _generate_propagate(self, x_arr, y_arr, s_arr):
+		""" Bit generate (g_i = x_i.y_i) and propagate (p_i = x_i ^ y_i) signals: p_0 is the LSB of the sum """
+		n = len(x_arr)
+		g = self.WireArray(n)
+		p = [ s_arr[0] ] + self.WireArray(n-1)
+		for i in range(n):
+			self.AndGate(x_arr[i], y_arr[i], g[i])
+			self.Xor(x_arr[i], y_arr[i], p[i])
+		return g, p
+
+	def _PrefixAdder(self, x_arr, y_arr, s_arr, combinations):
+		""" An adder whose carries are computed by a parallel prefix network.
+
+		Each node i starts as the bit's (generate, propagate) pair; a combination (i, j), with j < i,
+		replaces node i with (G_i + P_i.G_j, P_i.P_j). Once all combinations are applied, G_i is the
+		carry out of bit i. The group propagate signals that no later combination reads are not built.
+
+		:param combinations: (i, j) pairs, in application order
+		:type combinations: list
+		"""
+		n = len(x_arr)
+		if n == 1:
+			return self.HalfAdder(x_arr[0], y_arr[0], s_arr[0], s_arr[1])
+		g, p = self._generate_propagate(x_arr, y_arr, s_arr)
+		G, P = list(g), list(p)
+
+		# backward pass: which combinations must produce their group propagate signal
+		needed = set()
+		build_p = []
+		for i, j in reversed(combinations):
+			build_p.append( i in needed )
+			if i in needed:
+				needed.add(j)
+			needed.add(i)
+		build_p.reverse()
+		last = max( k for k, (i, j) in enumerate(combinations) if i == n-1 )
+
+		for k, (i, j) in enumerate(combinations):
+			t = self.Wire()
+			group_g = s_arr[n] if k == last else self.Wire()
+			self.AndGate(P[i], G[j], t)
+			self.OrGate(G[i], t, group_g)
+			if build_p[k]:
+				group_p = self.Wire()
+				self.AndGate(P[i], P[j], group_p)
+				P[i] = group_p
+			G[i] = group_g
+
+		# s_i = p_i ^ c_i, where the carry into bit i is G_{i-1}
+		for i in range(1, n):
+			self.Xor(p[i], G[i-1], s_arr[i])
+		return 'ok'
+
+	def KoggeStoneAdder(self, x_arr, y_arr, s_arr):
+		""" The Kogge-Stone adder: log2(n) levels of prefix combinations, where every node combines
+		    with the node 2**level positions below it (minimal depth, O(n log n) cells).
+
+		:param x_arr: first operand, a n-wire array (LSB on the left)
+		:param y_arr: second operand, a n-wire array (LSB on the left)
+		:param s_arr: sum, a n+1-wire array (LSB on the left)
+		:type x_arr: list
+		:type y_arr: list
+		:type s_arr: list
+		"""
+		n = len(x_arr)
+		combinations = []
+		d = 1
+		while d < n:
+			# from the top: within a level, every node reads the previous level's values
+			combinations.extend( (i, i-d) for i in range(n-1, d-1, -1) )
+			d *= 2
+		return self._PrefixAdder(x_arr, y_arr, s_arr, combinations)
+
+	def BrentKungAdder(self, x_arr, y_arr, s_arr):
+		""" The Brent-Kung adder: a binary tree of prefix combinations (up-sweep), then a reverse
+		    tree that completes the intermediate carries (2.log2(n) levels, O(n) cells).
+
+		:param x_arr: first operand, a n-wire array (LSB on the left)
+		:param y_arr: second operand, a n-wire array (LSB on the left)
+		:param s_arr: sum, a n+1-wire array (LSB on the left)
+		:type x_arr: list
+		:type y_arr: list
+		:type s_arr: list
+		"""
+		n = len(x_arr)
+		combinations = []
+		d = 1
+		while d < n:
+			combinations.extend( (i, i-d) for i in range(2*d-1, n, 2*d) )
+			d *= 2
+		d = (1 << ((n-1).bit_length() - 1)) // 2 if n > 1 else 0
+		while d >= 1:
+			combinations.extend( (i, i-d) for i in range(3*d-1, n, 2*d) )
+			d //= 2
+		return self._PrefixAdder(x_arr, y_arr, s_arr, combinations)
+
+	def CarryLookaheadAdder(self, x_arr, y_arr, s_arr, block_size=4):
+		""" The carry-lookahead adder: within each block of bits, every carry is computed directly
+		    from the generate and propagate signals and the block's carry in, as a sum of products
+		    (c_i+1 = g_i + p_i.g_i-1 + ... + p_i...p_s.c_s); the carries ripple from block to block.
+
+		:param x_arr: first operand, a n-wire array (LSB on the left)
+		:param y_arr: second operand, a n-wire array (LSB on the left)
+		:param s_arr: sum, a n+1-wire array (LSB on the left)
+		:param block_size: number of bits per lookahead block
+		:type x_arr: list
+		:type y_arr: list
+		:type s_arr: list
+		:type block_size: int
+		"""
+		n = len(x_arr)
+		if n == 1:
+			return self.HalfAdder(x_arr[0], y_arr[0], s_arr[0], s_arr[1])
+		g, p = self._generate_propagate(x_arr, y_arr, s_arr)
+		# c[i]: carry into bit i
+		c = [ None ]*(n+1)
+		for start in range(0, n, block_size):
+			c_in = c[start]
+			for i in range(start, min(start+block_size, n)):
+				terms = []
+				for k in range(i, start-1, -1):
+					terms.append( self._and_tree( p[k+1:i+1] + [ g[k] ] ))
+				if c_in is not None:
+					terms.append( self._and_tree( p[start:i+1] + [ c_in ] ))
+				if len(terms) == 1:
+					c[i+1] = terms[0]
+				else:
+					c[i+1] = self._or_tree( terms, s_arr[n] if i == n-1 else None )
+
+		for i in range(1, n):
+			self.Xor(p[i], c[i], s_arr[i])
+		return 'ok'
+
+
+class NativeCircuitLibrary( CircuitLibrary ):
+	""" The same circuits, built with the compound and N-input gates: fewer gates, wires and events
+	    (the ripple-carry adder is inherited, and picks up the native adders).
+	"""
+
+	def MajorityVoting(self, x, y, z, o):
+		""" Majority voting: F(x, y, z) = xy + xz + yz, with a 3-input OR gate """
+		xy = self.Wire('xy')
+		xz = self.Wire('xz')
+		yz = self.Wire('yz')
+
+		self.AndGate(x, y, xy)
+		self.AndGate(x, z, xz)
+		self.AndGate(y, z, yz)
+		self.LogicGate('OR', [xy, xz, yz], o)
+
+		return 'ok'
+
+	def TwoSwitches(self, x, y, o):
+		""" Light controlled by 2 switches: F(x, y) = !(x ^ y) """
+		self.XnorGate(x, y, o)
+
+		return 'ok'
+
+	def Xor(self, a, b, o):
+		""" o = a ^ b, a XOR gate """
+		self.XorGate(a, b, o)
+
+		return 'ok'
+
+	def HalfAdder(self, a, b, s, c):
+		""" The half-adder: s = a ^ b, c = ab """
+		self.XorGate(a, b, s)
+		self.AndGate(a, b, c)
+
+		return 'ok'
+
+	def FullAdder(self, a, b, c_in, s, c_out):
+		""" The full-adder: s = a ^ b ^ c_in (3-input XOR), c_out = ab + c_in.(a ^ b) """
+		d = self.Wire()
+		c1 = self.Wire()
+		c2 = self.Wire()
+
+		self.XorGate(a, b, d)
+		self.LogicGate('XOR', [a, b, c_in], s)
+		self.AndGate(a, b, c1)
+		self.AndGate(c_in, d, c2)
+		self.OrGate(c1, c2, c_out)
+
+		return 'ok'
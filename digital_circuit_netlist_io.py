@@ -0,0 +1,485 @@
+#!/usr/bin/python3
+#
+# digital_circuit_netlist_io.py: structural netlist import/export
+#
+# Two textual formats are supported, both read as a stream of lines (the whole text is never
+# held in memory) and written gate by gate:
+#
+# - BLIF (Berkeley Logic Interchange Format): combinational subset, i.e. .model, .inputs,
+#   .outputs, .names (any single-output cover) and .end
+# - structural Verilog: a module made of input/output/wire declarations (scalars or vectors)
+#   and gate primitive instances: and, or, not, buf, nand, nor, xor, xnor; constant assigns
+#   (assign w = 1'b0)
+#
+# Verilog primitives map onto the simulator's gates, BLIF covers are decomposed into AND/OR/NOT
+# gates; the imported gates are connected in bulk. Constants are tied wires (Netlist.constants),
+# written back as constant covers or assigns.
+
+import re
+from array import array
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject, _AND, _OR, _NOT, _NAND, _NOR, _XOR, _XNOR
+
+
+class NetlistFormatException(Exception): pass
+
+
+class ImportedCircuit(object):
+	""" The result of an import: the module name, the names of its ports, and a name -> wire index
+	    mapping, that gives access to the wires of the simulator.
+	"""
+
+	def __init__(self, simulator, name, inputs, outputs, indices):
+		self.simulator = simulator
+		self.name = name
+		self.inputs = inputs
+		self.outputs = outputs
+		self.indices = indices
+
+	def wire(self, name):
+		""" The wire with the given name
+
+		:rtype: _WireObject
+		"""
+		return _WireObject(self.simulator, self.indices[name])
+
+	def wires(self, names):
+		""" The wires with the given names, e.g. a port vector's bits, LSB first
+
+		:rtype: list
+		"""
+		return [ self.wire(name) for name in names ]
+
+	def names(self):
+		""" Wire index -> name mapping, e.g. for exporting the circuit back
+
+		:rtype: dict
+		"""
+		return dict( (index, name) for name, index in self.indices.items() )
+
+
+class _NetlistBuilder(object):
+	""" Accumulate the gates of an imported netlist in arrays, then connect them in one go """
+
+	def __init__(self, simulator):
+		self.simulator = simulator
+		self.netlist = simulator.netlist
+		self.indices = {}
+		self.gate_types = array('B')
+		self.input_start = array('i', [0])
+		self.inputs = array('i')
+		self.outputs = array('i')
+		self.inverted = {}
+		self.constants = {}
+
+	def wire(self, name):
+		""" Index of the wire with the given name (created on first use) """
+		index = self.indices.get(name)
+		if index is None:
+			index = self.netlist.new_wires(1)[0]
+			self.indices[name] = index
+		return index
+
+	def new_wire(self):
+		return self.netlist.new_wires(1)[0]
+
+	def gate(self, gate_type, inputs, output):
+		self.gate_types.append(gate_type)
+		self.inputs.extend(inputs)
+		self.input_start.append( len(self.inputs) )
+		self.outputs.append(output)
+		return output
+
+	def inverter(self, w):
+		""" The complement of a wire: one shared inverter per wire """
+		n = self.inverted.get(w)
+		if n is None:
+			n = self.gate( _NOT, (w,), self.new_wire() )
+			self.inverted[w] = n
+		return n
+
+	def tie(self, w, value):
+		""" Tie a wire to a constant value """
+		self.netlist.values[w] = value
+		self.netlist.constants[w] = value
+		return w
+
+	def constant(self, value):
+		""" A wire tied to a constant value """
+		w = self.constants.get(value)
+		if w is None:
+			w = self.tie( self.new_wire(), value )
+			self.constants[value] = w
+		return w
+
+	def tree(self, gate_type, inputs, output=None):
+		""" A N-input gate (driving `output`, if given, a new wire otherwise); a single input is
+		    buffered (AND, OR, XOR) or inverted (NAND, NOR, XNOR) """
+		if output is None:
+			output = self.new_wire()
+		if len(inputs) == 1:
+			if gate_type in (_NAND, _NOR, _XNOR):
+				return self.gate( _NOT, (inputs[0],), output )
+			return self.buffer( inputs[0], output )
+		return self.gate( gate_type, inputs, output )
+
+	def buffer(self, w, output):
+		return self.gate( _AND, (w, w), output )
+
+	def primitive(self, kind, output, inputs):
+		""" A Verilog gate primitive """
+		if kind == 'buf':
+			return self.buffer( inputs[0], output )
+		if kind == 'not':
+			return self.gate( _NOT, (inputs[0],), output )
+		if kind.upper() in GATE_TYPES:
+			return self.tree( GATE_TYPES.index(kind.upper()), inputs, output )
+		raise NetlistFormatException('unsupported primitive: {}'.format(kind))
+
+	def cover(self, names, rows):
+		""" A BLIF single-output cover: a sum of products over the input wires """
+		output = self.wire( names[-1] )
+		inputs = [ self.wire(name) for name in names[:-1] ]
+		on_set = [ cube for cube, value in rows if value == '1' ]
+		off_set = [ cube for cube, value in rows if value == '0' ]
+		if on_set and off_set:
+			raise NetlistFormatException('.names {}: mixed on-set and off-set cover'.format(' '.join(names)))
+		cubes = on_set or off_set
+		if not cubes:
+			# empty cover: constant 0
+			return self.buffer( self.constant(0), output )
+
+		if off_set and len(cubes) == 1 and cubes[0].count('-') == len(cubes[0]) - 1:
+			# off-set of a single literal: '1 0' is an inverter, '0 0' a buffer
+			cube = cubes[0]
+			if '1' in cube:
+				return self.gate( _NOT, (inputs[ cube.index('1') ],), output )
+			return self.buffer( inputs[ cube.index('0') ], output )
+		# a single on-set product drives the output directly
+		direct = output if (on_set and len(cubes) == 1) else None
+		products = []
+		for cube in cubes:
+			if direct is not None and cube.count('-') == len(cube) - 1 and '0' in cube:
+				# a single negated literal: an inverter
+				return self.gate( _NOT, (inputs[ cube.index('0') ],), output )
+			literals = []
+			for w, c in zip(inputs, cube):
+				if c == '1':
+					literals.append(w)
+				elif c == '0':
+					literals.append( self.inverter(w) )
+			if not literals:
+				literals = [ self.constant(1) ]
+			if len(literals) == 1 and direct is None:
+				# no need for a buffer inside the sum
+				products.append( literals[0] )
+			else:
+				products.append( self.tree( _AND, literals, direct ) )
+		if direct is not None:
+			return direct
+		if off_set:
+			return self.gate( _NOT, (self.tree( _OR, products ),), output )
+		return self.tree( _OR, products, output )
+
+	def finish(self, name, inputs, outputs):
+		for port in inputs + outputs:
+			self.wire(port)
+		if self.gate_types:
+			self.simulator._add_gates( self.gate_types, self.input_start, self.inputs, self.outputs )
+		return ImportedCircuit( self.simulator, name, inputs, outputs, self.indices )
+
+
+def _lines(f):
+	""" Iterate over the lines of a path or file object """
+	if isinstance(f, str):
+		with open(f) as text:
+			for line in text:
+				yield line
+	else:
+		for line in f:
+			yield line
+
+
+def read_blif(sim, f):
+	""" Load a combinational BLIF model into a simulator.
+
+	:param sim: the simulator to build the circuit on
+	:param f: a path or a text file object
+	:type sim: Simulator
+	:returns: the imported circuit
+	:rtype: ImportedCircuit
+	:raises NetlistFormatException: on unsupported constructs (.latch, .subckt...)
+	"""
+	builder = _NetlistBuilder(sim)
+	name = ''
+	inputs, outputs = [], []
+	names, rows = None, []
+	pending = ''
+	for line in _lines(f):
+		line = line.split('#', 1)[0].rstrip()
+		if line.endswith('\\'):
+			pending += line[:-1] + ' '
+			continue
+		tokens = (pending + line).split()
+		pending = ''
+		if not tokens:
+			continue
+		if not tokens[0].startswith('.'):
+			if names is None:
+				raise NetlistFormatException('cover row outside of .names: {}'.format(line))
+			# a cover row: input plane and output value (no input plane for constants)
+			rows.append( (tokens[0], tokens[1]) if len(tokens) == 2 else ('', tokens[0]) )
+			continue
+
+		if names is not None:
+			builder.cover(names, rows)
+			names, rows = None, []
+		directive = tokens[0]
+		if directive == '.model':
+			name = tokens[1] if len(tokens) > 1 else ''
+		elif directive == '.inputs':
+			inputs.extend(tokens[1:])
+		elif directive == '.outputs':
+			outputs.extend(tokens[1:])
+		elif directive == '.names':
+			names = tokens[1:]
+		elif directive == '.end':
+			break
+		else:
+			raise NetlistFormatException('unsupported BLIF construct: {}'.format(directive))
+	if names is not None:
+		builder.cover(names, rows)
+	return builder.finish(name, inputs, outputs)
+
+
+# escaped identifiers run up to the next white space
+_VERILOG_TOKEN = re.compile(r'\s*(?:(//.*)|\\(\S+)|([A-Za-z_][\w$.]*(?:\s*\[\s*\d+\s*\])?)|(\[\s*\d+\s*:\s*\d+\s*\])|(\S))')
+
+def _verilog_statements(f):
+	""" Split the text into statements (lists of tokens), ';'-terminated, comments removed """
+	tokens = []
+	in_comment = False
+	for line in _lines(f):
+		if in_comment:
+			end = line.find('*/')
+			if end < 0:
+				continue
+			line = line[end+2:]
+			in_comment = False
+		while '/*' in line:
+			start = line.index('/*')
+			end = line.find('*/', start+2)
+			if end < 0:
+				line = line[:start]
+				in_comment = True
+			else:
+				line = line[:start] + ' ' + line[end+2:]
+		for m in _VERILOG_TOKEN.finditer(line):
+			comment, escaped, word, vector_range, char = m.groups()
+			if comment:
+				break
+			if escaped:
+				# an escaped identifier (written for names like 'a[0]' or 'wire-3'), without its backslash
+				tokens.append(escaped)
+				continue
+			token = word or vector_range or char
+			if token is None:
+				continue
+			if vector_range or '[' in token:
+				token = re.sub(r'\s+', '', token)
+			if token == ';':
+				yield tokens
+				tokens = []
+			elif token == 'endmodule':
+				if tokens:
+					yield tokens
+				yield [ token ]
+				tokens = []
+			else:
+				tokens.append(token)
+	if tokens:
+		yield tokens
+
+
+_PRIMITIVES = ('and', 'or', 'not', 'buf', 'nand', 'nor', 'xor', 'xnor')
+
+def read_verilog(sim, f):
+	""" Load a structural Verilog module (gate primitives only) into a simulator. Vector ports
+	    and wires are expanded into their bits, named 'a[0]', 'a[1]'...
+
+	:param sim: the simulator to build the circuit on
+	:param f: a path or a text file object
+	:type sim: Simulator
+	:returns: the imported circuit
+	:rtype: ImportedCircuit
+	:raises NetlistFormatException: on unsupported constructs
+	"""
+	builder = _NetlistBuilder(sim)
+	name = ''
+	inputs, outputs = [], []
+	for tokens in _verilog_statements(f):
+		if not tokens:
+			continue
+		keyword = tokens[0]
+		if keyword == 'module':
+			name = tokens[1]
+		elif keyword == 'endmodule':
+			break
+		elif keyword in ('input', 'output', 'wire'):
+			declared = []
+			bits = None
+			for token in tokens[1:]:
+				if token.startswith('['):
+					msb, lsb = [ int(x) for x in token[1:-1].split(':') ]
+					bits = range(min(msb, lsb), max(msb, lsb)+1)
+				elif token != ',':
+					declared.extend( [ '{}[{}]'.format(token, b) for b in bits ] if bits is not None else [ token ] )
+			if keyword == 'input':
+				inputs.extend(declared)
+			elif keyword == 'output':
+				outputs.extend(declared)
+			for wire_name in declared:
+				builder.wire(wire_name)
+		elif keyword == 'assign':
+			# constants only: assign w = 1'b0;
+			if len(tokens) != 6 or tokens[2:5] != ['=', '1', "'"] or tokens[5] not in ('b0', 'b1'):
+				raise NetlistFormatException('unsupported Verilog construct: {}'.format(' '.join(tokens)))
+			builder.tie( builder.wire(tokens[1]), int(tokens[5][1]) )
+		elif keyword in _PRIMITIVES:
+			# a list of instances: optional instance name, then (output, inputs...)
+			terminals = None
+			for token in tokens[1:]:
+				if token == '(':
+					if terminals is not None:
+						raise NetlistFormatException('malformed instance: {}'.format(' '.join(tokens)))
+					terminals = []
+				elif token == ')':
+					if not terminals:
+						raise NetlistFormatException('malformed instance: {}'.format(' '.join(tokens)))
+					builder.primitive( keyword, terminals[0], terminals[1:] )
+					terminals = None
+				elif terminals is not None and token != ',':
+					terminals.append( builder.wire(token) )
+		else:
+			raise NetlistFormatException('unsupported Verilog construct: {}'.format(keyword))
+	return builder.finish(name, inputs, outputs)
+
+
+def _ports(sim, inputs, outputs):
+	""" Default ports: undriven wires read by gates (but the constants), and driven wires read by no gate """
+	net = sim.netlist
+	net.update_fanout(force=True)
+	if inputs is None:
+		read = bytearray(net.wire_count)
+		for w in net.gate_inputs:
+			read[w] = 1
+		inputs = [ w for w in range(net.wire_count) if read[w] and net.driver[w] < 0 and w not in net.constants ]
+	if outputs is None:
+		outputs = [ w for w in range(net.wire_count) if net.driver[w] >= 0 and net.fanout_start[w] == net.fanout_start[w+1] ]
+	return inputs, outputs
+
+
+def _index(w):
+	return w.index if isinstance(w, _WireObject) else w
+
+
+def _constants(net, inputs, outputs):
+	""" The constants to export: those read by gates, or outputs, that are not inputs """
+	read = set(net.gate_inputs) | set(outputs)
+	inputs = set(inputs)
+	return [ (w, value) for w, value in sorted(net.constants.items()) if w in read and w not in inputs ]
+
+
+def _cover(t, n):
+	""" The BLIF cover of a n-input gate of type t """
+	if t == _NOT:
+		return '0 1\n'
+	if t in (_AND, _NOR):
+		return '{} 1\n'.format( ('1' if t == _AND else '0')*n )
+	if t in (_OR, _NAND):
+		# one cube per input
+		literal = '1' if t == _OR else '0'
+		return ''.join( '{}{}{} 1\n'.format('-'*k, literal, '-'*(n-k-1)) for k in range(n) )
+	# XOR, XNOR: the minterms of odd (even) parity
+	parity = 1 if t == _XOR else 0
+	return ''.join( '{} 1\n'.format( format(m, '0{}b'.format(n)) ) for m in range(2**n) if bin(m).count('1') % 2 == parity )
+
+
+def write_blif(sim, f, inputs=None, outputs=None, names=None, model='circuit'):
+	""" Export the netlist of a simulator as BLIF.
+
+	:param sim: the simulator
+	:param f: a text file object
+	:param inputs: input wires (default: the undriven wires that feed gates, but the constants)
+	:param outputs: output wires (default: the driven wires that feed no gate)
+	:param names: wire index -> name (default: 'n<index>')
+	:param model: model name
+	:type sim: Simulator
+	:type inputs: list
+	:type outputs: list
+	:type names: dict
+	:type model: str
+	"""
+	inputs, outputs = _ports(sim, inputs, outputs)
+	names = names or {}
+	name = lambda w: names.get(w) or 'n{}'.format(w)
+	net = sim.netlist
+	f.write('.model {}\n'.format(model))
+	f.write('.inputs {}\n'.format(' '.join( name(_index(w)) for w in inputs )))
+	f.write('.outputs {}\n'.format(' '.join( name(_index(w)) for w in outputs )))
+	for w, value in _constants( net, [ _index(w) for w in inputs ], [ _index(w) for w in outputs ] ):
+		f.write('.names {}\n{}'.format(name(w), '1\n' if value else ''))
+	covers = {}
+	start, gate_inputs = net.gate_input_start, net.gate_inputs
+	for g, t in enumerate(net.gate_type):
+		terminals = [ name(w) for w in gate_inputs[start[g]:start[g+1]] ] + [ name(net.gate_output[g]) ]
+		n = len(terminals) - 1
+		if (t, n) not in covers:
+			covers[t, n] = _cover(t, n)
+		f.write('.names {}\n{}'.format(' '.join(terminals), covers[t, n]))
+	f.write('.end\n')
+
+
+def write_verilog(sim, f, inputs=None, outputs=None, names=None, module='circuit'):
+	""" Export the netlist of a simulator as a structural Verilog module.
+
+	:param sim: the simulator
+	:param f: a text file object
+	:param inputs: input wires (default: the undriven wires that feed gates, but the constants)
+	:param outputs: output wires (default: the driven wires that feed no gate)
+	:param names: wire index -> name (default: 'n<index>'); names that are not Verilog identifiers are escaped
+	:param module: module name
+	:type sim: Simulator
+	:type inputs: list
+	:type outputs: list
+	:type names: dict
+	:type module: str
+	"""
+	inputs, outputs = [ [ _index(w) for w in ws ] for ws in _ports(sim, inputs, outputs) ]
+	names = names or {}
+	def name(w):
+		n = names.get(w) or 'n{}'.format(w)
+		return n if re.match(r'^[A-Za-z_][\w$]*$', n) else '\\{} '.format(n)
+	net = sim.netlist
+	ports = set(inputs) | set(outputs)
+	f.write('module {} ({});\n'.format(module, ', '.join( name(w) for w in inputs + outputs )))
+	for w in inputs:
+		f.write('  input {};\n'.format(name(w)))
+	for w in outputs:
+		f.write('  output {};\n'.format(name(w)))
+	used = bytearray(net.wire_count)
+	for w in net.gate_inputs:
+		used[w] = 1
+	for w in net.gate_output:
+		used[w] = 1
+	for w in range(net.wire_count):
+		if used[w] and w not in ports:
+			f.write('  wire {};\n'.format(name(w)))
+	for w, value in _constants(net, inputs, outputs):
+		f.write("  assign {} = 1'b{};\n".format(name(w), value))
+	start, gate_inputs = net.gate_input_start, net.gate_inputs
+	for g, t in enumerate(net.gate_type):
+		terminals = [ name(net.gate_output[g]) ] + [ name(w) for w in gate_inputs[start[g]:start[g+1]] ]
+		f.write('  {} g{} ({});\n'.format(GATE_TYPES[t].lower(), g, ', '.join(terminals)))
+	f.write('endmodule\n')
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+#
+# digital_circuit_netlist_io_test.py: unit tests for the BLIF/Verilog import and export
+
+import io
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_netlist_io import *
+
+
+FULL_ADDER_BLIF = """\
+# full adder, one cover per output
+.model full_adder
+.inputs a b \\
+  cin
+.outputs s cout
+.names a b cin s
+100 1
+010 1
+001 1
+111 1
+.names a b cin cout
+11- 1
+1-1 1
+-11 1
+.end
+"""
+
+MUX_VERILOG = """\
+// 2-to-1 multiplexer, 2 bits wide
+module mux2 (a, b, sel, y);
+  input [1:0] a, b;
+  input sel;
+  output [1:0] y;
+  wire nsel, t0, t1, t2, t3;
+  not (nsel, sel);
+  and g0 (t0, a[0], nsel), g1_ (t1, b[0], sel);
+  /* bit 1 */
+  and (t2, a[1], nsel);
+  and (t3, b[1], sel);
+  or (y[0], t0, t1);
+  or (y[1], t2,
+      t3);
+endmodule
+"""
+
+
+class NetlistImportUnitTest( unittest.TestCase ):
+
+	def testBLIF(self):
+		sim = Simulator()
+		circuit = read_blif( sim, io.StringIO(FULL_ADDER_BLIF) )
+		self.assertEqual( circuit.name, 'full_adder' )
+		self.assertEqual( circuit.inputs, ['a', 'b', 'cin'] )
+		self.assertEqual( circuit.outputs, ['s', 'cout'] )
+		for v in range(8):
+			sim.set_wires( circuit.wires(circuit.inputs), v )
+			sim.propagate()
+			self.assertEqual( sim.wires_to_integer( circuit.wires(circuit.outputs) ), bin(v).count('1') )
+
+	def testBLIFCovers(self):
+		""" Constants, inverters, buffers and off-set covers """
+		text = ".model m\n.inputs a b\n.outputs one zero na buf nand\n.names one\n1\n.names zero\n.names a na\n0 1\n" \
+			".names b buf\n1 1\n.names a b nand\n11 0\n.end\n"
+		sim = Simulator()
+		circuit = read_blif( sim, io.StringIO(text) )
+		for a in (0, 1):
+			for b in (0, 1):
+				circuit.wire('a').set_signal(a)
+				circuit.wire('b').set_signal(b)
+				sim.propagate()
+				self.assertEqual( [ w.get_signal() for w in circuit.wires(circuit.outputs) ], [1, 0, 1-a, b, 1-(a&b)] )
+
+	def testBLIFOffSetLiteral(self):
+		""" A single-literal off-set: '1 0' is one inverter, '0 0' one buffer """
+		text = ".model m\n.inputs a b\n.outputs na buf\n.names a na\n1 0\n.names b buf\n0 0\n.end\n"
+		sim = Simulator()
+		circuit = read_blif( sim, io.StringIO(text) )
+		self.assertEqual( sorted( g.type for g in sim.gates ), ['AND', 'NOT'] )
+		for v in range(4):
+			sim.set_wires( circuit.wires(['a', 'b']), v )
+			sim.propagate()
+			self.assertEqual( [ w.get_signal() for w in circuit.wires(circuit.outputs) ], [1-(v & 1), v >> 1] )
+
+	def testUnsupported(self):
+		sim = Simulator()
+		self.assertRaises( NetlistFormatException, read_blif, sim, io.StringIO('.model m\n.latch a b 0\n') )
+		self.assertRaises( NetlistFormatException, read_verilog, sim, io.StringIO('module m (a); assign a = 1; endmodule\n') )
+
+	def testVerilog(self):
+		sim = Simulator()
+		circuit = read_verilog( sim, io.StringIO(MUX_VERILOG) )
+		self.assertEqual( circuit.inputs, ['a[0]', 'a[1]', 'b[0]', 'b[1]', 'sel'] )
+		a, b, y = circuit.wires(['a[0]', 'a[1]']), circuit.wires(['b[0]', 'b[1]']), circuit.wires(['y[0]', 'y[1]'])
+		sim.set_wires(a, 2)
+		sim.set_wires(b, 1)
+		for sel, expected in [ (0, 2), (1, 1) ]:
+			circuit.wire('sel').set_signal(sel)
+			sim.propagate()
+			self.assertEqual( sim.wires_to_integer(y), expected )
+
+	def testVerilogPrimitives(self):
+		text = "module p (a, b, c, o1, o2, o3, o4);\ninput a, b, c;\noutput o1, o2, o3, o4;\n" \
+			"xor (o1, a, b, c);\nxnor (o2, a, b);\nnand (o3, a, b, c);\nnor (o4, a, b);\nendmodule\n"
+		sim = Simulator()
+		circuit = read_verilog( sim, io.StringIO(text) )
+		for v in range(8):
+			a, b, c = v & 1, (v >> 1) & 1, v >> 2
+			sim.set_wires( circuit.wires(['a', 'b', 'c']), v )
+			sim.propagate()
+			self.assertEqual( [ w.get_signal() for w in circuit.wires(circuit.outputs) ], [ a^b^c, 1-(a^b), 1-(a&b&c), 1-(a|b) ] )
+
+	def testVerilogSingleInputGates(self):
+		""" A 1-input xor is a buffer, a 1-input xnor an inverter, and they survive a round trip """
+		text = "module m (a, o, p);\ninput a;\noutput o, p;\nxor g (o, a);\nxnor h (p, a);\nendmodule\n"
+		sim = Simulator()
+		circuit = read_verilog( sim, io.StringIO(text) )
+		out = io.StringIO()
+		write_verilog( sim, out, inputs=circuit.wires(['a']), outputs=circuit.wires(['o', 'p']),
+			names=dict( (circuit.wire(name).index, name) for name in ('a', 'o', 'p') ))
+		copy = Simulator()
+		copied = read_verilog( copy, io.StringIO(out.getvalue()) )
+		for v in (0, 1):
+			for s, c in ((sim, circuit), (copy, copied)):
+				c.wire('a').set_signal(v)
+				s.propagate()
+				self.assertEqual( [ w.get_signal() for w in c.wires(['o', 'p']) ], [v, 1-v] )
+
+
+class NetlistRoundTripUnitTest( unittest.TestCase ):
+	""" A circuit exported, then imported on a fresh simulator, computes the same function """
+
+	def _round_trip(self, write, read, library=CircuitLibrary):
+		n = 8
+		sim = library()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		names = {}
+		for prefix, wires in (('x', x), ('y', y), ('s', s)):
+			for i, w in enumerate(wires):
+				names[w.index] = '{}[{}]'.format(prefix, i)
+		out = io.StringIO()
+		write( sim, out, inputs=x+y, outputs=s, names=names )
+
+		copy = Simulator()
+		circuit = read( copy, io.StringIO(out.getvalue()) )
+		if library is CircuitLibrary or read is read_verilog:
+			self.assertEqual( len(copy.gates), len(sim.gates) )
+		x2, y2, s2 = [ circuit.wires([ '{}[{}]'.format(prefix, i) for i in range(width) ]) for prefix, width in (('x', n), ('y', n), ('s', n+1)) ]
+		rng = random.Random(3)
+		for i in range(20):
+			a, b = rng.getrandbits(n), rng.getrandbits(n)
+			copy.set_wires(x2, a)
+			copy.set_wires(y2, b)
+			copy.propagate()
+			self.assertEqual( copy.wires_to_integer(s2), a+b )
+
+	def testBLIF(self):
+		self._round_trip( write_blif, read_blif )
+
+	def testVerilog(self):
+		self._round_trip( write_verilog, read_verilog )
+
+	def testNativeGates(self):
+		""" XOR gates become BLIF covers, and Verilog primitives """
+		self._round_trip( write_blif, read_blif, NativeCircuitLibrary )
+		self._round_trip( write_verilog, read_verilog, NativeCircuitLibrary )
+
+	def testVerilogEscapedNames(self):
+		""" Names that are not Verilog identifiers are escaped on export, and read back whole """
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(3), sim.WireArray(3), sim.WireArray(4)
+		sim.RippleCarryAdder(x, y, s)
+		names = {}
+		for prefix, wires in (('x-', x), ('y[', y), ('s/', s)):
+			for i, w in enumerate(wires):
+				names[w.index] = '{}{}{}'.format(prefix, i, ']' if prefix == 'y[' else '')
+		for w in range(sim.netlist.wire_count):
+			names.setdefault( w, 'wire-{}'.format(w) )
+		out = io.StringIO()
+		write_verilog( sim, out, inputs=x+y, outputs=s, names=names )
+		self.assertIn( '\\x-0 ', out.getvalue() )
+		copy = Simulator()
+		circuit = read_verilog( copy, io.StringIO(out.getvalue()) )
+		self.assertEqual( circuit.inputs, [ names[w.index] for w in x+y ] )
+		self.assertEqual( len(copy.gates), len(sim.gates) )
+		x2, y2, s2 = [ circuit.wires([ names[w.index] for w in wires ]) for wires in (x, y, s) ]
+		for a in range(8):
+			for b in range(8):
+				copy.set_wires(x2, a)
+				copy.set_wires(y2, b)
+				copy.propagate()
+				self.assertEqual( copy.wires_to_integer(s2), a+b )
+
+	def testConstants(self):
+		""" Constants are not exported as inputs, and survive a round trip """
+		text = ".model m\n.inputs a\n.outputs o z\n.names c\n1\n.names a c o\n11 1\n.names z\n.end\n"
+		for write, read in ((write_blif, read_blif), (write_verilog, read_verilog)):
+			sim = Simulator()
+			read_blif( sim, io.StringIO(text) )
+			for step in range(2):
+				out = io.StringIO()
+				write( sim, out )
+				sim = Simulator()
+				circuit = read( sim, io.StringIO(out.getvalue()) )
+				self.assertEqual( len(circuit.inputs), 1 )
+				a = circuit.wire(circuit.inputs[0])
+				outputs = circuit.wires(circuit.outputs)
+				for v in (0, 1):
+					a.set_signal(v)
+					sim.propagate()
+					self.assertEqual( sorted( w.get_signal() for w in outputs ), sorted([v, 0]), (write.__name__, step) )
+
+	def testDefaultPorts(self):
+		sim = CircuitLibrary()
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.TwoSwitches(x, y, o)
+		out = io.StringIO()
+		write_blif( sim, out )
+		lines = out.getvalue().splitlines()
+		self.assertEqual( lines[1], '.inputs n{} n{}'.format(x.index, y.index) )
+		self.assertEqual( lines[2], '.outputs n{}'.format(o.index) )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+#
+# digital_circuit_optimize.py: netlist optimization
+#
+# optimize() rebuilds the netlist captured by a simulator, as a smaller, equivalent circuit on
+# another simulator. The gates are translated, in topological order, into a structurally hashed
+# graph of 2-input AND nodes and complemented edges (an AND/INV graph, with XOR nodes for the
+# circuits that use XOR gates):
+#
+# - constant propagation: constant inputs (and undriven wires that are not inputs) are folded,
+#   as well as x.x, x.!x, x^x...
+# - structural hashing: a node is created once for each (operation, operands) pair, so identical
+#   subexpressions (the terms shared by the half-adders of a full adder...) are merged
+# - dead-logic elimination: only the nodes the outputs depend on are turned back into gates
+#
+# The nodes are turned back into AND/OR gates (NAND/NOR and XOR/XNOR if the original circuit uses
+# them), picking, through De Morgan's laws, the gate that needs the fewest inverters; complemented
+# edges share one inverter per wire.
+#
+#	result = optimize(sim, inputs=x+y, outputs=s)
+#	x2, s2 = result.wires(x), result.wires(s)	# the wires of result.simulator
+#	result.savings(vectors)				# gates and events, before and after
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject, _AND, _OR, _NOT, _NAND, _NOR, _XOR, _XNOR
+from digital_circuit_levelized import levelize
+from digital_circuit_netlist_io import _NetlistBuilder
+
+
+# node kinds of the graph: node 0 is the constant 0, so that literals 0 and 1 are the constants
+_CONSTANT, _INPUT, _AND_NODE, _XOR_NODE = range(4)
+
+
+class _StructuralHasher(object):
+	""" A structurally hashed AND/XOR graph. A literal is (node << 1) | complement. """
+
+	def __init__(self):
+		self.kind = [ _CONSTANT ]
+		self.fanin0 = [ 0 ]
+		self.fanin1 = [ 0 ]
+		self.table = {}
+
+	def input(self):
+		self.kind.append(_INPUT)
+		self.fanin0.append(0)
+		self.fanin1.append(0)
+		return (len(self.kind) - 1) << 1
+
+	def _node(self, kind, a, b):
+		if a > b:
+			a, b = b, a
+		key = (kind, a, b)
+		n = self.table.get(key)
+		if n is None:
+			n = len(self.kind)
+			self.kind.append(kind)
+			self.fanin0.append(a)
+			self.fanin1.append(b)
+			self.table[key] = n
+		return n << 1
+
+	def and2(self, a, b):
+		if a == 0 or b == 0 or a == b ^ 1:
+			return 0
+		if a == 1 or a == b:
+			return b
+		if b == 1:
+			return a
+		return self._node(_AND_NODE, a, b)
+
+	def xor2(self, a, b):
+		# complements move to the output: a node has positive operands
+		complement = (a ^ b) & 1
+		a &= ~1
+		b &= ~1
+		if a == b:
+			return complement
+		if a == 0:
+			return b ^ complement
+		if b == 0:
+			return a ^ complement
+		return self._node(_XOR_NODE, a, b) ^ complement
+
+	def reduce(self, operation, literals):
+		""" A N-input operation, as a balanced tree of 2-input nodes """
+		while len(literals) > 1:
+			pairs = [ operation(literals[i], literals[i+1]) for i in range(0, len(literals)-1, 2) ]
+			if len(literals) % 2:
+				pairs.append(literals[-1])
+			literals = pairs
+		return literals[0]
+
+	def gate(self, gate_type, literals):
+		""" The literal computed by a gate of the netlist """
+		if gate_type == _NOT:
+			return literals[0] ^ 1
+		if gate_type in (_AND, _NAND):
+			return self.reduce(self.and2, literals) ^ (gate_type == _NAND)
+		if gate_type in (_OR, _NOR):
+			return self.reduce(self.and2, [ l ^ 1 for l in literals ]) ^ (gate_type == _OR)
+		if gate_type in (_XOR, _XNOR):
+			return self.reduce(self.xor2, literals) ^ (gate_type == _XNOR)
+		raise UnknownOperationException(gate_type)
+
+
+class OptimizedCircuit(object):
+	""" The result of optimize(): the simulator the optimized circuit is built on, and the mapping
+	    from the inputs and outputs of the original circuit to its wires """
+
+	def __init__(self, original, simulator, inputs, outputs, wire_map):
+		self.original = original
+		self.simulator = simulator
+		self.inputs = inputs
+		self.outputs = outputs
+		self.wire_map = wire_map
+
+	def wire(self, wire):
+		""" The wire of the optimized circuit that stands for an input or output of the original one
+		    (two outputs may share a wire)
+
+		:param wire: a wire of the original circuit (or its index)
+		:type wire: _WireObject
+		:rtype: _WireObject
+		"""
+		return _WireObject( self.simulator, self.wire_map[ wire.index if isinstance(wire, _WireObject) else wire ] )
+
+	def wires(self, wires):
+		""" The wires of the optimized circuit that stand for an array of wires of the original one
+
+		:rtype: list
+		"""
+		return [ self.wire(w) for w in wires ]
+
+	def savings(self, vectors):
+		""" Simulate the same input vectors on the original and the optimized circuits: gates, events
+		    and mismatching outputs. Both simulators are left in the state of the last vector.
+
+		:param vectors: integers, whose bits are the values of the inputs (first input: LSB)
+		:type vectors: list
+		:returns: gates_before, gates_after, gates_saved, events_before, events_after, events_saved, mismatches
+		:rtype: dict
+		"""
+		circuits = []
+		for sim, inputs, outputs in ( (self.original, [ _WireObject(self.original, w) for w in self.inputs ], [ _WireObject(self.original, w) for w in self.outputs ]),
+				(self.simulator, self.wires(self.inputs), self.wires(self.outputs)) ):
+			sim.propagate()
+			events = 0
+			results = []
+			for v in vectors:
+				sim.set_wires(inputs, v)
+				events += sim.run()
+				results.append( sim.wires_to_integer(outputs) )
+			circuits.append( (sim.netlist.gate_count, events, results) )
+		(gates_before, events_before, before), (gates_after, events_after, after) = circuits
+		return { 'gates_before': gates_before, 'gates_after': gates_after, 'gates_saved': gates_before - gates_after,
+			'events_before': events_before, 'events_after': events_after, 'events_saved': events_before - events_after,
+			'mismatches': sum( 1 for b, a in zip(before, after) if b != a ) }
+
+
+def optimize(sim, inputs=None, outputs=None, constants=None, target=None):
+	""" Build an optimized copy of the (combinational) netlist of a simulator.
+
+	:param sim: the simulator the circuit was built on
+	:param inputs: the free inputs (default: all the undriven wires); the other undriven wires are constants, with their current value
+	:param outputs: the wires to keep (default: the driven wires that no gate reads)
+	:param constants: wire -> value, for the wires tied to a constant (inputs or not)
+	:param target: the simulator to build the optimized circuit on (default: a new Simulator, with the delays of sim)
+	:type sim: Simulator
+	:type inputs: list
+	:type outputs: list
+	:type constants: dict
+	:type target: Simulator
+	:rtype: OptimizedCircuit
+	:raises CombinationalLoopException: if the netlist contains a loop
+	"""
+	index = lambda w: w.index if isinstance(w, _WireObject) else w
+	net = sim.netlist
+	net.update_fanout(force=True)
+	if inputs is None:
+		inputs = [ w for w in range(net.wire_count) if net.driver[w] < 0 ]
+	inputs = [ index(w) for w in inputs ]
+	if outputs is None:
+		fanout_start = net.fanout_start
+		outputs = [ w for w in range(net.wire_count) if net.driver[w] >= 0 and fanout_start[w] == fanout_start[w+1] ]
+	outputs = [ index(w) for w in outputs ]
+	constants = dict( (index(w), value) for w, value in (constants or {}).items() )
+
+	graph = _StructuralHasher()
+	# wire -> literal: the undriven wires keep their current value
+	literals = list(net.values)
+	for w in inputs:
+		literals[w] = graph.input()
+	for w, value in constants.items():
+		literals[w] = value
+	# the gates driving inputs and constants are cut off
+	free = set(inputs) | set(constants)
+	gates = net.gates()
+	used_types = set()
+	for level in levelize(net.wire_count, gates):
+		for g in level:
+			gate = gates[g]
+			if gate.output in free:
+				continue
+			gate_type = GATE_TYPES.index(gate.type)
+			used_types.add(gate_type)
+			literals[gate.output] = graph.gate( gate_type, [ literals[w] for w in gate.inputs ] )
+
+	if target is None:
+		target = Simulator()
+		for delay in ('inverter_delay', 'and_gate_delay', 'or_gate_delay', 'nand_gate_delay', 'nor_gate_delay', 'xor_gate_delay', 'xnor_gate_delay'):
+			setattr(target, delay, getattr(sim, delay))
+		target.inertial = sim.inertial
+	builder = _NetlistBuilder(target)
+	wire_map = dict( (w, builder.new_wire()) for w in inputs )
+	for w in inputs:
+		target.netlist.values[ wire_map[w] ] = net.values[w]
+
+	emitter = _Emitter( graph, builder, used_types )
+	for w in inputs:
+		if w not in constants:
+			emitter.natural_wire[ literals[w] >> 1 ] = wire_map[w]
+	emitter.emit( [ literals[w] for w in outputs ] )
+	for w in outputs:
+		wire_map[w] = emitter.wire(literals[w])
+	if builder.gate_types:
+		target._add_gates( builder.gate_types, builder.input_start, builder.inputs, builder.outputs )
+	return OptimizedCircuit( sim, target, inputs, outputs, wire_map )
+
+
+class _Emitter(object):
+	""" Turn the nodes of the graph the outputs depend on back into gates """
+
+	def __init__(self, graph, builder, used_types):
+		self.graph = graph
+		self.builder = builder
+		# gate type, complemented operands, polarity of the output
+		self.and_options = [ (_AND, 0, 0), (_OR, 1, 1) ]
+		if used_types & {_NAND, _NOR}:
+			self.and_options += [ (_NAND, 0, 1), (_NOR, 1, 0) ]
+		# node -> the wire its gate drives, and the polarity (complement bit) of that wire
+		self.natural_wire = {}
+		self.natural = {}
+
+	def wire(self, literal):
+		""" The wire carrying a literal """
+		n = literal >> 1
+		if n == 0:
+			return self.builder.constant(literal)
+		w = self.natural_wire[n]
+		if (literal & 1) == self.natural.get(n, 0):
+			return w
+		return self.builder.inverter(w)
+
+	def _inverter_cost(self, literal):
+		n = literal >> 1
+		if (literal & 1) == self.natural.get(n, 0) or self.natural_wire[n] in self.builder.inverted:
+			return 0
+		return 1
+
+	def emit(self, roots):
+		graph = self.graph
+		kind, fanin0, fanin1 = graph.kind, graph.fanin0, graph.fanin1
+		# the literals of the roots: a root node that does not produce them needs an inverter (the
+		# other nodes need none, their parents pick a gate that takes their natural polarity)
+		refs = set(roots)
+		# the nodes the roots depend on
+		stack = list(roots)
+		live = set()
+		while stack:
+			n = stack.pop() >> 1
+			if n in live or kind[n] in (_CONSTANT, _INPUT):
+				continue
+			live.add(n)
+			stack.append(fanin0[n])
+			stack.append(fanin1[n])
+
+		# fanins have lower numbers than their nodes: increasing order is a topological order
+		for n in sorted(live):
+			a, b = fanin0[n], fanin1[n]
+			# the polarity the roots want, if they want a single one
+			wanted = None
+			if (n << 1) in refs:
+				wanted = None if (n << 1) | 1 in refs else 0
+			elif (n << 1) | 1 in refs:
+				wanted = 1
+			if kind[n] == _XOR_NODE:
+				# the natural wires of the operands go in as they are: their complements cancel out
+				polarity = self.natural.get(a >> 1, 0) ^ self.natural.get(b >> 1, 0)
+				wanted = wanted or 0
+				gate_type = _XOR if polarity == wanted else _XNOR
+				operands = ( self.natural_wire[a >> 1], self.natural_wire[b >> 1] )
+				self.natural[n] = wanted
+			else:
+				best = None
+				for gate_type, complement, polarity in self.and_options:
+					cost = self._inverter_cost(a ^ complement) + self._inverter_cost(b ^ complement)
+					if wanted is not None and polarity != wanted:
+						cost += 1
+					if best is None or cost < best[0]:
+						best = (cost, gate_type, complement, polarity)
+				cost, gate_type, complement, polarity = best
+				operands = ( self.wire(a ^ complement), self.wire(b ^ complement) )
+				self.natural[n] = polarity
+			self.natural_wire[n] = self.builder.gate( gate_type, operands, self.builder.new_wire() )
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+#
+# digital_circuit_optimize_test.py: unit tests for the netlist optimizer
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_optimize import *
+
+
+class OptimizeUnitTest( unittest.TestCase ):
+
+	def testStructuralHashing(self):
+		""" Two half-adders over the same inputs: the second one is merged into the first one """
+		sim = CircuitLibrary()
+		a, b, s1, c1, s2, c2 = [ sim.Wire() for i in range(6) ]
+		sim.HalfAdder(a, b, s1, c1)
+		sim.HalfAdder(b, a, s2, c2)
+		result = optimize(sim, [a, b], [s1, c1, s2, c2])
+		self.assertEqual( result.simulator.netlist.gate_count, 4 )
+		self.assertEqual( result.wire(s1), result.wire(s2) )
+		savings = result.savings( list(range(4)) )
+		self.assertEqual( savings['gates_saved'], 4 )
+		self.assertGreater( savings['events_saved'], 0 )
+		self.assertEqual( savings['mismatches'], 0 )
+
+	def testConstants(self):
+		""" x + 1: the operand tied to a constant is folded """
+		n = 8
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		constants = dict( (w, int(i == 0)) for i, w in enumerate(y) )
+		result = optimize(sim, x+y, s, constants=constants)
+		self.assertLess( result.simulator.netlist.gate_count, sim.netlist.gate_count // 2 )
+		opt = result.simulator
+		x2, s2 = result.wires(x), result.wires(s)
+		opt.propagate()
+		for a in (0, 1, 100, 254, 255):
+			opt.set_wires(x2, a)
+			opt.propagate()
+			self.assertEqual( opt.wires_to_integer(s2), a+1 )
+
+		# undriven wires that are not inputs are constants too
+		sim.set_wires(y, 3)
+		sim.propagate()
+		self.assertEqual( optimize(sim, x, s).simulator.netlist.gate_count, optimize(sim, x+y, s, constants=dict( (w, int(i < 2)) for i, w in enumerate(y) )).simulator.netlist.gate_count )
+
+	def testDeadLogic(self):
+		""" The gates of an unused carry out are dropped, and the constant x.!x disappears """
+		sim = CircuitLibrary()
+		a, b, c_in, s, c_out, na, zero = [ sim.Wire() for i in range(7) ]
+		sim.FullAdder(a, b, c_in, s, c_out)
+		sim.Inverter(a, na)
+		sim.AndGate(a, na, zero)
+		full = optimize(sim, [a, b, c_in], [s, c_out])
+		sum_only = optimize(sim, [a, b, c_in], [s, zero])
+		self.assertLess( sum_only.simulator.netlist.gate_count, full.simulator.netlist.gate_count )
+		self.assertEqual( sum_only.wire(zero).get_signal(), 0 )
+		self.assertEqual( sum_only.savings( list(range(8)) )['mismatches'], 0 )
+
+	def testEquivalence(self):
+		n = 12
+		rng = random.Random(1)
+		vectors = [ rng.getrandbits(2*n) for i in range(100) ]
+		for library in (CircuitLibrary, NativeCircuitLibrary):
+			for adder in ('RippleCarryAdder', 'KoggeStoneAdder', 'BrentKungAdder', 'CarryLookaheadAdder'):
+				sim = library()
+				x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+				getattr(sim, adder)(x, y, s)
+				savings = optimize(sim, x+y, s).savings(vectors)
+				self.assertEqual( savings['mismatches'], 0, (library.__name__, adder) )
+				self.assertGreaterEqual( savings['gates_saved'], 0, (library.__name__, adder) )
+
+	def testDefaultPorts(self):
+		sim = Simulator()
+		a, b, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.NorGate(a, b, o)
+		result = optimize(sim)
+		self.assertEqual( result.inputs, [a.index, b.index] )
+		self.assertEqual( result.outputs, [o.index] )
+		self.assertEqual( result.simulator.gates[0].type, 'NOR' )
+		self.assertEqual( result.savings( list(range(4)) )['mismatches'], 0 )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
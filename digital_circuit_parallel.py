@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+#
+# digital_circuit_parallel.py: bit-parallel evaluation of combinational circuits
+#
+# Each wire carries a packed word instead of a single bit: lane k of every word belongs to the
+# k-th input vector. Python integers have arbitrary width, so a word can hold 64, 4096 or 65536
+# lanes, and the logical operations of the gates become bitwise operations over all lanes at
+# once: one pass over the levelized netlist evaluates as many vectors as there are lanes.
+
+from digital_circuit_levelized import *
+
+
+class BitParallelEvaluator( LevelizedEvaluator ):
+	""" Zero-delay evaluator, where each wire carries one bit for each of `lanes` input vectors.
+
+	Wire groups are set and read as lists of integers, one per lane::
+
+		ev = BitParallelEvaluator(sim, lanes=3)
+		ev.set_wires(x_wires, [1, 2, 3])
+		ev.set_wires(y_wires, [10, 20, 30])
+		ev.evaluate()
+		ev.wires_to_integer(s_wires)	# [11, 22, 33]
+	"""
+
+	def __init__(self, sim, lanes=64):
+		"""
+		:param sim: the simulator the circuit was built on
+		:param lanes: number of vectors evaluated at once
+		:type sim: Simulator
+		:type lanes: int
+		"""
+		LevelizedEvaluator.__init__(self, sim)
+		self.lanes = lanes
+		self.mask = (1 << lanes) - 1
+		# the current signals, copied into all lanes
+		self.values = [ (self.mask if v else 0) for v in self.values ]
+
+	def evaluate(self):
+		""" Compute the steady state of all wires, in all lanes """
+		v = self.values
+		mask = self.mask
+		AND, OR, NOT, NAND, NOR, XOR = self.AND, self.OR, self.NOT, self.NAND, self.NOR, self.XOR
+		for op, a, b, o in self.program:
+			if op == AND:
+				v[o] = v[a] & v[b]
+			elif op == OR:
+				v[o] = v[a] | v[b]
+			elif op == NOT:
+				v[o] = v[a] ^ mask
+			elif op == NAND:
+				v[o] = (v[a] & v[b]) ^ mask
+			elif op == NOR:
+				v[o] = (v[a] | v[b]) ^ mask
+			elif op == XOR:
+				v[o] = v[a] ^ v[b]
+			else:
+				v[o] = v[a] ^ v[b] ^ mask
+
+	def set_signal(self, wire, values):
+		""" Set the value of a (primary input) wire in each lane
+
+		:param values: one bit per lane
+		:type values: list
+		:raises ValueError: if there are more values than lanes
+		"""
+		if len(values) > self.lanes:
+			raise ValueError('{} values for {} lanes'.format(len(values), self.lanes))
+		word = 0
+		for k, bit in enumerate(values):
+			if bit:
+				word |= 1 << k
+		self.values[ wire.index ] = word
+
+	def get_signal(self, wire):
+		""" The bits carried by a wire, one per lane
+
+		:rtype: list
+		"""
+		word = self.values[ wire.index ]
+		return [ (word >> k) & 1 for k in range(self.lanes) ]
+
+	def set_wires(self, wire_array, values):
+		""" Set an array of wires (first wire carries the LSB) from a list of integers, one per lane:
+		    lanes beyond the end of the list are set to 0.
+
+		:param wire_array: an array of _WireObject objects
+		:param values: integers
+		:type wire_array: list
+		:type values: list
+		:raises ValueError: if there are more values than lanes
+		"""
+		if len(values) > self.lanes:
+			raise ValueError('{} values for {} lanes'.format(len(values), self.lanes))
+		# transpose: lane k of the word of wire i is the i-th bit of values[k]
+		words = [ 0 ]*len(wire_array)
+		n = len(wire_array)
+		for k, value in enumerate(values):
+			lane_bit = 1 << k
+			i = 0
+			while value and i < n:
+				if value & 1:
+					words[i] |= lane_bit
+				value >>= 1
+				i += 1
+		v = self.values
+		for w, word in zip(wire_array, words):
+			v[ w.index ] = word
+
+	def wires_to_integer(self, wire_arr):
+		""" Read the signals carried by an array of wires as integers, one per lane (first wire carries the LSB)
+
+		:rtype: list
+		"""
+		out_values = [ 0 ]*self.lanes
+		v = self.values
+		for pos, w in enumerate(wire_arr):
+			word = v[ w.index ]
+			# the binary representation, LSB (lane 0) first
+			bits = bin(word)[:1:-1]
+			bit = 1 << pos
+			k = bits.find('1')
+			while k >= 0:
+				out_values[k] |= bit
+				k = bits.find('1', k+1)
+		return out_values
+
+	def set_exhaustive(self, wire_array, batch):
+		""" Set the wires to the `batch`-th slice of an exhaustive enumeration: lane k receives the
+		    integer batch*lanes + k. No transposition is needed: the low-order wires get the classic
+		    periodic patterns (0101..., 0011..., 00001111...), and the high-order ones are constant.
+		    The number of lanes must be a power of 2.
+
+		:param wire_array: an array of _WireObject objects (typically, all primary inputs)
+		:param batch: index of the slice, from 0 to 2**len(wire_array) // lanes - 1
+		:type wire_array: list
+		:type batch: int
+		"""
+		log_lanes = self.lanes.bit_length() - 1
+		v = self.values
+		for i, w in enumerate(wire_array):
+			if i < log_lanes:
+				period = 1 << i
+				# 'period' zeros then 'period' ones, repeated over all lanes
+				block = ((1 << period) - 1) << period
+				v[ w.index ] = block * (self.mask // ((1 << 2*period) - 1))
+			else:
+				v[ w.index ] = self.mask if (batch >> (i - log_lanes)) & 1 else 0
+
+	def simulate(self, inputs, outputs, vectors):
+		""" Evaluate a sequence of input vectors, `lanes` vectors at a time.
+
+		:param inputs: input wire groups
+		:param outputs: output wire groups
+		:param vectors: stimulus vectors (tuples of integers, one per input group)
+		:type inputs: list
+		:type outputs: list
+		:type vectors: iterable
+		:returns: the output vectors (tuples of integers, one per output group)
+		:rtype: list
+		"""
+		vectors = list(vectors)
+		results = []
+		for start in range(0, len(vectors), self.lanes):
+			chunk = vectors[start:start+self.lanes]
+			for g, wires in enumerate(inputs):
+				self.set_wires(wires, [ vector[g] for vector in chunk ])
+			self.evaluate()
+			columns = [ self.wires_to_integer(wires)[:len(chunk)] for wires in outputs ]
+			results.extend( zip(*columns) )
+		return results
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+#
+# digital_circuit_parallel_test.py: unit tests for the bit-parallel evaluator
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_parallel import *
+
+
+class BitParallelEvaluatorUnitTest( unittest.TestCase ):
+
+	def _adder(self, n, library=CircuitLibrary):
+		sim = library()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		return sim, x, y, s
+
+	def testSimulate(self):
+		sim, x, y, s = self._adder(12)
+		rng = random.Random(7)
+		vectors = [ (rng.getrandbits(12), rng.getrandbits(12)) for i in range(150) ]
+		ev = BitParallelEvaluator(sim, lanes=64)
+		self.assertEqual( ev.simulate([x, y], [s], vectors), [ (a+b,) for a, b in vectors ] )
+
+	def testExhaustive(self):
+		""" All 2**10 vectors of a 5-bit adder, 256 at a time, built with either gate set """
+		for library in (CircuitLibrary, NativeCircuitLibrary):
+			sim, x, y, s = self._adder(5, library)
+			ev = BitParallelEvaluator(sim, lanes=256)
+			for batch in range(4):
+				ev.set_exhaustive(x + y, batch)
+				ev.evaluate()
+				sums = ev.wires_to_integer(s)
+				for k in range(256):
+					vector = batch*256 + k
+					self.assertEqual( sums[k], (vector & 31) + (vector >> 5) )
+
+	def testSignals(self):
+		sim = CircuitLibrary()
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.TwoSwitches(x, y, o)
+		ev = BitParallelEvaluator(sim, lanes=4)
+		ev.set_signal(x, [0, 0, 1, 1])
+		ev.set_signal(y, [0, 1, 0, 1])
+		ev.evaluate()
+		self.assertEqual( ev.get_signal(o), [1, 0, 0, 1] )
+
+	def testTooManyValues(self):
+		sim, x, y, s = self._adder(4)
+		ev = BitParallelEvaluator(sim, lanes=4)
+		ev.set_wires(x, [1, 2, 3])
+		self.assertRaises( ValueError, ev.set_wires, y, [1, 2, 3, 4, 5] )
+		self.assertRaises( ValueError, ev.set_signal, x[0], [0, 1, 0, 1, 1] )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
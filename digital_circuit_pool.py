@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+#
+# digital_circuit_pool.py: run many independent simulations on all cores
+#
+# A circuit is described by a *builder*: a module-level function (so that it can be
+# shipped to the worker processes) that wires a circuit on the simulator it is given,
+# and returns its input and output wire groups:
+#
+#	def adder_8(sim):
+#		x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+#		sim.RippleCarryAdder(x, y, s)
+#		return [x, y], [s]
+#
+#	with SimulationPool(adder_8, CircuitLibrary) as pool:
+#		sums = pool.map( [ (1, 2), (200, 100) ] )	# [ (3,), (300,) ]
+
+import os
+import multiprocessing
+
+from digital_circuit_core import *
+
+
+def simulate_batch(simulator_class, builder, batch):
+	""" Build the circuit on a fresh simulator, then apply the stimulus vectors in sequence:
+	    for each vector, set the input groups, propagate, and read the output groups.
+
+	:param simulator_class: a Simulator subclass, that provides the methods the builder calls
+	:param builder: a function sim -> (input wire groups, output wire groups)
+	:param batch: a list of stimulus vectors (a vector is a tuple of integers, one per input group)
+	:type simulator_class: type
+	:type builder: function
+	:type batch: list
+	:returns: the output vectors (a tuple of integers, one per output group)
+	:rtype: list
+	"""
+	sim = simulator_class()
+	inputs, outputs = builder(sim)
+	sim.propagate()
+
+	results = []
+	for vector in batch:
+		for wires, value in zip(inputs, vector):
+			sim.set_wires(wires, value)
+		sim.propagate()
+		results.append( tuple( sim.wires_to_integer(wires) for wires in outputs ))
+	return results
+
+
+def _simulate_batch(args):
+	return simulate_batch(*args)
+
+
+class SimulationPool(object):
+	""" A pool of worker processes, each running independent simulations of the same circuit.
+
+	Every batch of stimulus vectors is simulated on its own Simulator instance, built from
+	scratch in a worker: batches never share state, and results come back in submission order.
+	"""
+
+	def __init__(self, builder, simulator_class=Simulator, processes=None):
+		"""
+		:param builder: a module-level function sim -> (input wire groups, output wire groups)
+		:param simulator_class: the Simulator subclass the circuits are built on
+		:param processes: number of worker processes (default: one per core; 0: run in the calling process)
+		:type builder: function
+		:type simulator_class: type
+		:type processes: int
+		"""
+		self.builder = builder
+		self.simulator_class = simulator_class
+		if processes is None:
+			processes = os.cpu_count() or 1
+		self.processes = processes
+		self.pool = multiprocessing.Pool(processes) if processes > 0 else None
+
+	def run(self, batches):
+		""" Simulate each batch of stimulus vectors on its own circuit.
+
+		:param batches: an iterable of batches (lists of stimulus vectors)
+		:type batches: iterable
+		:returns: for each batch, the list of output vectors
+		:rtype: generator
+		"""
+		tasks = ( (self.simulator_class, self.builder, list(batch)) for batch in batches )
+		if self.pool is None:
+			return map(_simulate_batch, tasks)
+		return self.pool.imap(_simulate_batch, tasks)
+
+	def map(self, vectors, batch_size=256):
+		""" Simulate a flat list of stimulus vectors, split into batches of batch_size vectors.
+
+		:param vectors: stimulus vectors (tuples of integers, one per input group)
+		:param batch_size: number of vectors per circuit instance
+		:type vectors: iterable
+		:type batch_size: int
+		:returns: the output vectors, in the same order
+		:rtype: list
+		"""
+		vectors = list(vectors)
+		batches = [ vectors[i:i+batch_size] for i in range(0, len(vectors), batch_size) ]
+		results = []
+		for batch_results in self.run(batches):
+			results.extend(batch_results)
+		return results
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
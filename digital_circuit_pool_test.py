@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+#
+# digital_circuit_pool_test.py: unit tests for the simulation pool
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_pool import *
+
+
+def adder_6(sim):
+	x, y, s = sim.WireArray(6), sim.WireArray(6), sim.WireArray(7)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y], [s]
+
+def majority(sim):
+	x, y, z, o = sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire()
+	sim.MajorityVoting(x, y, z, o)
+	return [[x], [y], [z]], [[o]]
+
+
+class SimulationPoolUnitTest( unittest.TestCase ):
+
+	def testAdder(self):
+		rng = random.Random(3)
+		vectors = [ (rng.getrandbits(6), rng.getrandbits(6)) for i in range(100) ]
+		with SimulationPool(adder_6, CircuitLibrary, processes=2) as pool:
+			results = pool.map(vectors, batch_size=16)
+		self.assertEqual( results, [ (x+y,) for x, y in vectors ] )
+
+	def testInProcess(self):
+		vectors = [ (x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1) ]
+		with SimulationPool(majority, CircuitLibrary, processes=0) as pool:
+			results = list( pool.run([ vectors[:4], vectors[4:] ]) )
+		self.assertEqual( results, [ [(0,), (0,), (0,), (1,)], [(0,), (1,), (1,), (1,)] ])
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+#
+# digital_circuit_profile.py: simulation profiling
+#
+# A SimulationProfile attaches to a simulator and collects statistics on the simulation, without
+# printing anything:
+#
+# - agenda events per gate type (AND, OR, NOT, and 'action' for scheduled procedures), per
+#   output wire and per time slot
+# - signal toggles per wire, and the hottest wires
+# - for each time slot: the number of pending time segments in the agenda, and the number of
+#   events run (histograms)
+# - number of events and wall time of each run (propagate(), run_until()...)
+#
+#	with SimulationProfile(sim) as profile:
+#		sim.set_wires(x, 23)
+#		sim.propagate()
+#	print(profile.report())
+#
+# While a profile is attached, the simulator runs its instrumented loop: the figures describe the
+# simulation, but the wall times are those of the slower loop.
+
+import collections
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+
+
+class SimulationProfile(object):
+	""" Statistics of the simulation runs of a simulator, collected while the profile is attached """
+
+	def __init__(self, sim, time_slot=1):
+		"""
+		:param sim: the simulator to profile
+		:param time_slot: width of the time slots events are counted in
+		:type sim: Simulator
+		:type time_slot: int
+		"""
+		self.simulator = sim
+		self.time_slot = time_slot
+		self.events_by_type = collections.Counter()
+		self.events_by_wire = collections.Counter()
+		self.events_by_time = collections.Counter()
+		self.toggles = collections.Counter()
+		# number of pending segments -> number of time steps
+		self.segment_histogram = collections.Counter()
+		# number of events run at the same time -> number of time steps
+		self.depth_histogram = collections.Counter()
+		# (events, seconds) for each run
+		self.runs = []
+		self._time = None
+		self._depth = 0
+
+	def event(self, agenda, item):
+		""" Count an agenda item, as it is run (called by the simulation loop)
+
+		:param agenda: the agenda, with its clock set to the item's time
+		:param item: an Action, or a gate output transition (gate << 1) | value
+		"""
+		t = agenda.current_time
+		if t != self._time:
+			self._end_step()
+			self._time = t
+			# pending segments, the current one included
+			segments = agenda.segment_count()
+			if agenda.first_time() != t:
+				segments += 1
+			self.segment_histogram[segments] += 1
+		self._depth += 1
+		self.events_by_time[ t // self.time_slot ] += 1
+		if item.__class__ is int:
+			net = self.simulator.netlist
+			g = item >> 1
+			self.events_by_type[ GATE_TYPES[ net.gate_type[g] ] ] += 1
+			self.events_by_wire[ net.gate_output[g] ] += 1
+		else:
+			self.events_by_type['action'] += 1
+
+	def toggle(self, w):
+		""" Count a signal change (called by the simulator) """
+		self.toggles[w] += 1
+
+	def run(self, events, seconds):
+		""" Record a simulation run (called by the simulator) """
+		self.runs.append( (events, seconds) )
+
+	def _end_step(self):
+		if self._depth:
+			self.depth_histogram[ self._depth ] += 1
+		self._depth = 0
+
+	@property
+	def events(self):
+		return sum( self.events_by_type.values() )
+
+	@property
+	def seconds(self):
+		return sum( seconds for events, seconds in self.runs )
+
+	def hottest_wires(self, n=10):
+		""" The wires that toggled the most
+
+		:param n: number of wires
+		:type n: int
+		:returns: (wire, toggle count) pairs, most active first
+		:rtype: list
+		"""
+		return [ (_WireObject(self.simulator, w), count) for w, count in self.toggles.most_common(n) ]
+
+	def as_dict(self):
+		""" The statistics, as a JSON-serializable dictionary
+
+		:rtype: dict
+		"""
+		self._end_step()
+		return { 'events': self.events, 'seconds': self.seconds, 'runs': [ list(r) for r in self.runs ],
+			'events_by_type': dict(self.events_by_type),
+			'events_by_wire': dict( (str(w), c) for w, c in self.events_by_wire.items() ),
+			'events_by_time': dict( (str(t), c) for t, c in sorted(self.events_by_time.items()) ),
+			'toggles': dict( (str(w), c) for w, c in self.toggles.items() ),
+			'segment_histogram': dict( sorted(self.segment_histogram.items()) ),
+			'depth_histogram': dict( sorted(self.depth_histogram.items()) ) }
+
+	def report(self, n=10):
+		""" A summary of the statistics, in printable form
+
+		:param n: number of hottest wires listed
+		:type n: int
+		:rtype: str
+		"""
+		self._end_step()
+		lines = [ '{} events in {} runs, {:.4g} s'.format(self.events, len(self.runs), self.seconds) ]
+		lines.append( 'events by type: ' + ', '.join( '{} {}'.format(t, c) for t, c in self.events_by_type.most_common() ))
+		steps = sum( self.depth_histogram.values() )
+		if steps:
+			lines.append( 'time steps: {}, events per step: mean {:.3g}, max {}'.format(
+				steps, self.events / steps, max(self.depth_histogram) ))
+			lines.append( 'pending segments per step: mean {:.3g}, max {}'.format(
+				sum( k*c for k, c in self.segment_histogram.items() ) / steps, max(self.segment_histogram) ))
+		lines.append( 'hottest wires:' )
+		for wire, count in self.hottest_wires(n):
+			lines.append( '  {} ({}): {} toggles, {} events'.format( wire.index, wire.name, count, self.events_by_wire[wire.index] ))
+		return '\n'.join(lines)
+
+	def start(self):
+		self.simulator.profiler = self
+
+	def stop(self):
+		if self.simulator.profiler is self:
+			self.simulator.profiler = None
+		self._end_step()
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.stop()
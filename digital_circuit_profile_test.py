@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+#
+# digital_circuit_profile_test.py: unit tests for the simulation profiler
+
+import json
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_profile import *
+
+
+class SimulationProfileUnitTest( unittest.TestCase ):
+
+	def testGlitch(self):
+		sim = Simulator()
+		x, y, o = sim.Wire(), sim.Wire(), sim.Wire()
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		start = sim.agenda.current_time
+		with SimulationProfile(sim) as profile:
+			self.assertIs( sim.profiler, profile )
+			x.set_signal(1)
+			sim.propagate()
+		self.assertIsNone( sim.profiler )
+		# y falls at +2, o rises at +3 and falls at +5
+		self.assertEqual( profile.events_by_type, { 'NOT': 1, 'AND': 2 } )
+		self.assertEqual( profile.events_by_wire, { y.index: 1, o.index: 2 } )
+		self.assertEqual( profile.events_by_time, { start+2: 1, start+3: 1, start+5: 1 } )
+		self.assertEqual( profile.toggles, { x.index: 1, y.index: 1, o.index: 2 } )
+		self.assertEqual( profile.hottest_wires(1), [ (o, 2) ] )
+		self.assertEqual( profile.depth_histogram, { 1: 3 } )
+		# +2 and +3 are pending at +2, +3 and +5 at +3
+		self.assertEqual( profile.segment_histogram, { 2: 2, 1: 1 } )
+		self.assertEqual( len(profile.runs), 1 )
+		self.assertEqual( profile.runs[0][0], 3 )
+
+	def testAdder(self):
+		""" A profiled simulation computes the same results """
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+		sim.RippleCarryAdder(x, y, s)
+		sim.propagate()
+		with SimulationProfile(sim, time_slot=10) as profile:
+			sim.set_wires(x, 200)
+			sim.set_wires(y, 100)
+			sim.propagate()
+			sim.run_for(5)
+		self.assertEqual( sim.wires_to_integer(s), 300 )
+		self.assertEqual( profile.events, sum( profile.events_by_time.values() ))
+		self.assertEqual( set(profile.events_by_type), { 'AND', 'OR', 'NOT' } )
+		self.assertEqual( len(profile.runs), 2 )
+		self.assertIn( 'hottest wires:', profile.report() )
+		self.assertEqual( json.loads( json.dumps(profile.as_dict()) )['events'], profile.events )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+#
+# digital_circuit_stimulus.py: stimulus ordering
+#
+# The events a vector costs depend on the vector before it: every input bit that flips starts a
+# cascade through its fan-out, and counting in binary flips many bits at once (0111 -> 1000). The
+# order of a set of vectors does not change what a sweep checks, only what it costs:
+#
+# - exhaustive_vectors(widths, 'gray') enumerates all the input vectors in reflected Gray code:
+#   one input bit flips from a vector to the next
+# - minimum_toggle_order(vectors, widths) orders an arbitrary (random) set of vectors greedily,
+#   each vector being followed by the remaining vector closest to it (fewest differing bits)
+#
+# apply_vector() only sets the wires whose bit changed, and compare_orders() reports the agenda
+# events of a sweep for several orders of the same vectors:
+#
+#	vectors = exhaustive_vectors([8, 8], 'binary')
+#	compare_orders( adder_8, { 'binary': vectors, 'gray': exhaustive_vectors([8, 8], 'gray') }, CircuitLibrary )
+
+from digital_circuit_core import *
+from digital_circuit_sweep import vector_of
+
+
+def gray_code(bits):
+	""" All the integers of a number of bits, in reflected Gray code order: 0, 1, 3, 2, 6...
+
+	:param bits: number of bits
+	:type bits: int
+	:rtype: generator
+	"""
+	for i in range(1 << bits):
+		yield i ^ (i >> 1)
+
+
+def pack_vector(vector, widths):
+	""" The integer of a stimulus vector, the inverse of vector_of(): the first input group takes
+	    the low bits
+
+	:param vector: integers, one per input group
+	:param widths: the widths of the input groups
+	:type vector: tuple
+	:type widths: list
+	:rtype: int
+	"""
+	value = shift = 0
+	for v, width in zip(vector, widths):
+		value |= v << shift
+		shift += width
+	return value
+
+
+def exhaustive_vectors(widths, order='gray'):
+	""" All the stimulus vectors of input groups
+
+	:param widths: the widths of the input groups
+	:param order: 'gray' (one bit flips from a vector to the next) or 'binary'
+	:type widths: list
+	:type order: str
+	:rtype: list
+	"""
+	bits = sum(widths)
+	if order == 'gray':
+		return [ vector_of(i, widths) for i in gray_code(bits) ]
+	if order == 'binary':
+		return [ vector_of(i, widths) for i in range(1 << bits) ]
+	raise ValueError('unknown order: {}'.format(order))
+
+
+def toggles(vectors, widths, start=None):
+	""" The number of input bits that flip over a sequence of vectors
+
+	:param vectors: stimulus vectors
+	:param widths: the widths of the input groups
+	:param start: the vector the inputs carry before the first one (default: all zeros)
+	:type vectors: list
+	:type widths: list
+	:type start: tuple
+	:rtype: int
+	"""
+	previous = pack_vector(start, widths) if start is not None else 0
+	count = 0
+	for vector in vectors:
+		value = pack_vector(vector, widths)
+		count += bin(previous ^ value).count('1')
+		previous = value
+	return count
+
+
+def minimum_toggle_order(vectors, widths, start=None):
+	""" Order vectors so that few input bits flip from one to the next: starting from the inputs'
+	    state, the next vector is always the remaining one that differs by the fewest bits (a greedy
+	    nearest-neighbour tour, quadratic in the number of vectors)
+
+	:param vectors: stimulus vectors
+	:param widths: the widths of the input groups
+	:param start: the vector the inputs carry before the first one (default: all zeros)
+	:type vectors: list
+	:type widths: list
+	:type start: tuple
+	:returns: the same vectors, reordered
+	:rtype: list
+	"""
+	remaining = [ (pack_vector(v, widths), v) for v in vectors ]
+	current = pack_vector(start, widths) if start is not None else 0
+	ordered = []
+	while remaining:
+		best = min( range(len(remaining)), key=lambda k: bin(current ^ remaining[k][0]).count('1') )
+		# the last vector takes the place of the one picked
+		remaining[best], remaining[-1] = remaining[-1], remaining[best]
+		current, vector = remaining.pop()
+		ordered.append(vector)
+	return ordered
+
+
+def apply_vector(inputs, previous, vector):
+	""" Set the input wires to a vector, touching only the wires whose bit changed
+
+	:param inputs: input wire groups
+	:param previous: the vector the inputs carry
+	:param vector: the new vector
+	:type inputs: list
+	:type previous: tuple
+	:type vector: tuple
+	:returns: the number of wires set
+	:rtype: int
+	"""
+	count = 0
+	for wires, old, new in zip(inputs, previous, vector):
+		changed = old ^ new
+		pos = 0
+		while changed:
+			if changed & 1:
+				wires[pos].set_signal( (new >> pos) & 1 )
+				count += 1
+			changed >>= 1
+			pos += 1
+	return count
+
+
+def sweep_events(sim, inputs, vectors):
+	""" Apply vectors in sequence, each one after the circuit settled, and count the agenda events
+
+	:param sim: the simulator the circuit was built on
+	:param inputs: input wire groups
+	:param vectors: stimulus vectors
+	:type sim: Simulator
+	:type inputs: list
+	:type vectors: list
+	:returns: the numbers of vectors, input toggles and agenda events
+	:rtype: dict
+	"""
+	sim.propagate()
+	previous = tuple( sim.wires_to_integer(wires) for wires in inputs )
+	toggle_count = events = 0
+	for vector in vectors:
+		toggle_count += apply_vector(inputs, previous, vector)
+		events += sim.run()
+		previous = vector
+	return { 'vectors': len(vectors), 'toggles': toggle_count, 'events': events }
+
+
+def compare_orders(builder, orders, simulator_class=Simulator):
+	""" The agenda events of a sweep for several orders of the vectors, each on a fresh circuit
+
+	:param builder: a function sim -> (input wire groups, output wire groups), as for the SimulationPool
+	:param orders: order name -> stimulus vectors
+	:param simulator_class: the Simulator subclass the circuits are built on
+	:type builder: function
+	:type orders: dict
+	:type simulator_class: type
+	:returns: for each order: order, vectors, toggles, events, events_per_vector, and events_ratio (to the first order)
+	:rtype: list
+	"""
+	results = []
+	for name, vectors in orders.items():
+		sim = simulator_class()
+		inputs, outputs = builder(sim)
+		result = { 'order': name }
+		result.update( sweep_events(sim, inputs, vectors) )
+		result['events_per_vector'] = result['events']/result['vectors'] if vectors else 0.0
+		result['events_ratio'] = result['events']/results[0]['events'] if results and results[0]['events'] else 1.0
+		results.append(result)
+	return results
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+#
+# digital_circuit_stimulus_test.py: unit tests for the stimulus ordering
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_stimulus import *
+
+
+def adder_4(sim):
+	x, y, s = sim.WireArray(4), sim.WireArray(4), sim.WireArray(5)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y], [s]
+
+
+class StimulusUnitTest( unittest.TestCase ):
+
+	def testGrayCode(self):
+		self.assertEqual( list(gray_code(3)), [0, 1, 3, 2, 6, 7, 5, 4] )
+		codes = list(gray_code(6))
+		self.assertEqual( sorted(codes), list(range(64)) )
+		self.assertTrue( all( bin(a ^ b).count('1') == 1 for a, b in zip(codes, codes[1:]) ))
+
+	def testPackVector(self):
+		self.assertEqual( vector_of(0b10111, [2, 3]), (3, 5) )
+		self.assertEqual( pack_vector((3, 5), [2, 3]), 0b10111 )
+		self.assertTrue( all( pack_vector( vector_of(i, [3, 1, 4]), [3, 1, 4] ) == i for i in range(256) ))
+
+	def testExhaustive(self):
+		gray = exhaustive_vectors([2, 3])
+		binary = exhaustive_vectors([2, 3], 'binary')
+		self.assertEqual( sorted(gray), sorted(binary) )
+		self.assertEqual( binary[:3], [ (0, 0), (1, 0), (2, 0) ] )
+		self.assertEqual( toggles(gray, [2, 3]), 31 )
+		self.assertEqual( toggles(binary, [2, 3]), 57 )
+		self.assertRaises( ValueError, exhaustive_vectors, [2], 'random' )
+
+	def testMinimumToggleOrder(self):
+		rng = random.Random(2)
+		vectors = [ (rng.getrandbits(8), rng.getrandbits(8)) for i in range(200) ]
+		ordered = minimum_toggle_order(vectors, [8, 8])
+		self.assertEqual( sorted(ordered), sorted(vectors) )
+		self.assertLess( toggles(ordered, [8, 8]), toggles(vectors, [8, 8]) )
+
+	def testApplyVector(self):
+		""" Only the changed bits are set, and the circuit computes the same sums """
+		sim = CircuitLibrary()
+		inputs, outputs = adder_4(sim)
+		sim.propagate()
+		previous = (0, 0)
+		for vector in exhaustive_vectors([4, 4]):
+			self.assertEqual( apply_vector(inputs, previous, vector), toggles([vector], [4, 4], previous) )
+			sim.propagate()
+			self.assertEqual( sim.wires_to_integer(outputs[0]), sum(vector) )
+			previous = vector
+
+	def testCompareOrders(self):
+		results = compare_orders( adder_4, { 'binary': exhaustive_vectors([4, 4], 'binary'), 'gray': exhaustive_vectors([4, 4]) }, CircuitLibrary )
+		self.assertEqual( [ r['order'] for r in results ], ['binary', 'gray'] )
+		binary, gray = results
+		self.assertEqual( (binary['vectors'], gray['vectors']), (256, 256) )
+		self.assertEqual( gray['toggles'], 255 )
+		self.assertLess( gray['events'], binary['events'] )
+		self.assertEqual( binary['events_ratio'], 1.0 )
+		self.assertLess( gray['events_ratio'], 1.0 )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
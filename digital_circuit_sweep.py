@@ -0,0 +1,270 @@
+#!/usr/bin/python3
+#
+# digital_circuit_sweep.py: test-vector sweeps against a reference function
+#
+# A sweep checks a circuit against a Python reference function, over all its input vectors, or a
+# number of random ones. The circuit is described by a builder, as for the SimulationPool, and
+# the reference computes the expected output groups from the input groups:
+#
+#	def adder_8(sim):
+#		x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+#		sim.RippleCarryAdder(x, y, s)
+#		return [x, y], [s]
+#
+#	def add(x, y):
+#		return x + y
+#
+#	sweep = Sweep(adder_8, add, CircuitLibrary, checkpoint_dir='adder_8.sweep', mismatch_path='adder_8.txt')
+#	result = sweep.run()			# exhaustive: 65536 vectors
+#	result = sweep.run(count=10**6)		# random vectors
+#	result.mismatch_count, result.vectors_per_sec, result.vectors_per_sec_per_core
+#
+# The vectors are split into shards, numbered, and simulated across a process pool: a shard is
+# described by its bounds (or its random seed), so that no vector list is shipped to the workers.
+# The result of each shard is saved in the checkpoint directory as soon as it comes back: a sweep
+# that is run again (after an interruption) skips the shards already done. Mismatches are written
+# to the mismatch file as they come, one JSON object per line (vector, expected, actual).
+#
+# The builder and the reference are shipped to the worker processes: they must be module-level
+# functions (processes=0 runs the sweep in the calling process, with any function).
+
+import os
+import json
+import time
+import random
+import tempfile
+import multiprocessing
+
+from digital_circuit_core import *
+from digital_circuit_pool import simulate_batch
+
+
+def vector_of(index, widths):
+	""" The stimulus vector of a number: the first input group takes the low bits
+
+	:param index: the number of the vector
+	:param widths: the widths of the input groups
+	:type index: int
+	:type widths: list
+	:returns: integers, one per input group
+	:rtype: tuple
+	"""
+	vector = []
+	for width in widths:
+		vector.append( index & ((1 << width) - 1) )
+		index >>= width
+	return tuple(vector)
+
+
+def shard_vectors(shard, widths):
+	""" The stimulus vectors of a shard
+
+	:param shard: ('exhaustive', start, stop): vectors number start to stop-1, or ('random', seed, count)
+	:param widths: the widths of the input groups
+	:type shard: tuple
+	:type widths: list
+	:rtype: list
+	"""
+	kind = shard[0]
+	if kind == 'exhaustive':
+		return [ vector_of(i, widths) for i in range(shard[1], shard[2]) ]
+	if kind == 'random':
+		rng = random.Random(shard[1])
+		return [ tuple( rng.getrandbits(w) for w in widths ) for i in range(shard[2]) ]
+	raise ValueError('unknown shard kind: {}'.format(kind))
+
+
+def _expected(reference, vector):
+	expected = reference(*vector)
+	return tuple(expected) if isinstance(expected, (tuple, list)) else (expected,)
+
+
+def run_shard(simulator_class, builder, reference, widths, number, shard):
+	""" Simulate the vectors of a shard, and compare the outputs with the reference
+
+	:returns: the shard number, its vector count, its mismatches (vector, expected, actual), and the CPU seconds it took
+	:rtype: tuple
+	"""
+	start = time.process_time()
+	vectors = shard_vectors(shard, widths)
+	mismatches = []
+	for vector, actual in zip( vectors, simulate_batch(simulator_class, builder, vectors) ):
+		expected = _expected(reference, vector)
+		if actual != expected:
+			mismatches.append( (vector, expected, actual) )
+	return number, len(vectors), mismatches, time.process_time() - start
+
+
+def _run_shard(args):
+	return run_shard(*args)
+
+
+class SweepResult(object):
+	""" The outcome of a sweep, filled in by Sweep.run() """
+
+	def __init__(self, processes, resumed):
+		self.vectors = 0
+		# vectors simulated by this run (the others come from the checkpoints)
+		self.simulated = 0
+		self.mismatch_count = 0
+		# the first mismatches, as (vector, expected, actual) tuples (all of them are in the mismatch file)
+		self.mismatches = []
+		self.seconds = 0.0
+		self.worker_seconds = 0.0
+		self.processes = processes
+		# number of shards found in the checkpoint directory
+		self.resumed = resumed
+
+	@property
+	def passed(self):
+		return self.mismatch_count == 0
+
+	@property
+	def vectors_per_sec(self):
+		""" Vectors simulated per second of wall time """
+		return self.simulated/self.seconds if self.seconds else 0.0
+
+	@property
+	def vectors_per_sec_per_core(self):
+		""" Vectors simulated per CPU second of the workers """
+		return self.simulated/self.worker_seconds if self.worker_seconds else 0.0
+
+	def __repr__(self):
+		return '<SweepResult {} vectors, {} mismatches, {:.0f} vectors/s, {:.0f} vectors/s/core>'.format(
+			self.vectors, self.mismatch_count, self.vectors_per_sec, self.vectors_per_sec_per_core)
+
+
+class Sweep(object):
+	""" A sweep of test vectors over a circuit, checked against a reference function """
+
+	def __init__(self, builder, reference, simulator_class=Simulator, processes=None,
+			checkpoint_dir=None, mismatch_path=None, shard_size=4096, max_mismatches=100):
+		"""
+		:param builder: a module-level function sim -> (input wire groups, output wire groups)
+		:param reference: a module-level function of the input values, that returns the output value (one output group) or a tuple of them
+		:param simulator_class: the Simulator subclass the circuits are built on
+		:param processes: number of worker processes (default: one per core; 0: run in the calling process)
+		:param checkpoint_dir: the directory of the shard checkpoints (default: no checkpoints)
+		:param mismatch_path: the file the mismatches are written to (default: none)
+		:param shard_size: number of vectors per shard
+		:param max_mismatches: number of mismatches kept in the result
+		:type builder: function
+		:type reference: function
+		:type simulator_class: type
+		:type processes: int
+		:type checkpoint_dir: str
+		:type mismatch_path: str
+		:type shard_size: int
+		:type max_mismatches: int
+		"""
+		self.builder = builder
+		self.reference = reference
+		self.simulator_class = simulator_class
+		if processes is None:
+			processes = os.cpu_count() or 1
+		self.processes = processes
+		self.checkpoint_dir = checkpoint_dir
+		self.mismatch_path = mismatch_path
+		self.shard_size = shard_size
+		self.max_mismatches = max_mismatches
+		# the widths of the input groups: the circuit is built once, here
+		inputs, outputs = builder( simulator_class() )
+		self.widths = [ len(wires) for wires in inputs ]
+
+	def shards(self, count=None, seed=0):
+		""" The shards of a sweep
+
+		:param count: number of random vectors (default: all the input vectors)
+		:param seed: the seed of the random vectors
+		:type count: int
+		:type seed: int
+		:rtype: list
+		"""
+		size = self.shard_size
+		if count is None:
+			total = 1 << sum(self.widths)
+			return [ ('exhaustive', i, min(i+size, total)) for i in range(0, total, size) ]
+		# one seed per shard, derived from the seed of the sweep
+		return [ ('random', seed*1000003 + k, min(size, count-i)) for k, i in enumerate(range(0, count, size)) ]
+
+	def _key(self, shards):
+		""" What identifies the sweep in its checkpoints """
+		return { 'builder': getattr(self.builder, '__qualname__', repr(self.builder)),
+			'reference': getattr(self.reference, '__qualname__', repr(self.reference)),
+			'simulator_class': self.simulator_class.__name__, 'widths': self.widths,
+			'shard_size': self.shard_size, 'shards': len(shards), 'first': list(shards[0]) if shards else None }
+
+	def _checkpoint_path(self, number):
+		return os.path.join( self.checkpoint_dir, 'shard_{:06d}.json'.format(number) )
+
+	def _load_checkpoint(self, number, key):
+		""" The saved result of a shard, or None """
+		try:
+			with open( self._checkpoint_path(number) ) as f:
+				saved = json.load(f)
+		except (OSError, ValueError):
+			return None
+		if saved.get('key') != key:
+			return None
+		mismatches = [ tuple( tuple(values) for values in m ) for m in saved['mismatches'] ]
+		return number, saved['vectors'], mismatches, saved['seconds']
+
+	def _save_checkpoint(self, result, key):
+		number, vectors, mismatches, seconds = result
+		fd, temporary = tempfile.mkstemp( suffix='.tmp', dir=self.checkpoint_dir )
+		with os.fdopen(fd, 'w') as f:
+			json.dump( { 'key': key, 'vectors': vectors, 'mismatches': mismatches, 'seconds': seconds }, f )
+		os.replace( temporary, self._checkpoint_path(number) )
+
+	def run(self, count=None, seed=0):
+		""" Run the sweep: the shards found in the checkpoint directory are not simulated again
+
+		:param count: number of random vectors (default: all the input vectors)
+		:param seed: the seed of the random vectors
+		:type count: int
+		:type seed: int
+		:rtype: SweepResult
+		"""
+		start = time.perf_counter()
+		shards = self.shards(count, seed)
+		key = self._key(shards)
+		done = []
+		if self.checkpoint_dir is not None:
+			os.makedirs( self.checkpoint_dir, exist_ok=True )
+			done = [ r for r in ( self._load_checkpoint(k, key) for k in range(len(shards)) ) if r is not None ]
+		resumed = set( r[0] for r in done )
+		tasks = [ (self.simulator_class, self.builder, self.reference, self.widths, k, shard)
+			for k, shard in enumerate(shards) if k not in resumed ]
+
+		pool = multiprocessing.Pool(self.processes) if self.processes > 0 and tasks else None
+		mismatch_file = open(self.mismatch_path, 'w') if self.mismatch_path is not None else None
+		result = SweepResult( self.processes, len(resumed) )
+
+		def record(shard_result):
+			number, vectors, mismatches, seconds = shard_result
+			result.vectors += vectors
+			result.mismatch_count += len(mismatches)
+			result.mismatches.extend( mismatches[ :self.max_mismatches-len(result.mismatches) ] )
+			if mismatch_file is not None:
+				for vector, expected, actual in mismatches:
+					mismatch_file.write( json.dumps( { 'shard': number, 'vector': vector, 'expected': expected, 'actual': actual } ) + '\n' )
+				mismatch_file.flush()
+
+		try:
+			# the checkpointed shards first, then the new ones as they complete
+			for shard_result in done:
+				record(shard_result)
+			for shard_result in ( pool.imap_unordered(_run_shard, tasks) if pool is not None else map(_run_shard, tasks) ):
+				if self.checkpoint_dir is not None:
+					self._save_checkpoint( shard_result, key )
+				record(shard_result)
+				result.simulated += shard_result[1]
+				result.worker_seconds += shard_result[3]
+		finally:
+			if mismatch_file is not None:
+				mismatch_file.close()
+			if pool is not None:
+				pool.close()
+				pool.join()
+		result.seconds = time.perf_counter() - start
+		return result
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+#
+# digital_circuit_sweep_test.py: unit tests for the test-vector sweeps
+
+import os
+import json
+import tempfile
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_sweep import *
+
+
+def full_adder(sim):
+	a, b, c_in, s, c_out = sim.WireArray(5)
+	sim.FullAdder(a, b, c_in, s, c_out)
+	return [[a], [b], [c_in]], [[s], [c_out]]
+
+def full_add(a, b, c):
+	return (a + b + c) & 1, (a + b + c) >> 1
+
+def adder_5(sim):
+	x, y, s = sim.WireArray(5), sim.WireArray(5), sim.WireArray(6)
+	sim.RippleCarryAdder(x, y, s)
+	return [x, y], [s]
+
+def add(x, y):
+	return x + y
+
+def add_without_carry(x, y):
+	return (x + y) & 0x1f
+
+
+class SweepUnitTest( unittest.TestCase ):
+
+	def testVectors(self):
+		self.assertEqual( shard_vectors( ('exhaustive', 0, 4), [1, 1] ), [ (0, 0), (1, 0), (0, 1), (1, 1) ] )
+		self.assertEqual( shard_vectors( ('exhaustive', 5, 6), [2, 3] ), [ (1, 1) ] )
+		self.assertEqual( shard_vectors( ('random', 7, 10), [4, 4] ), shard_vectors( ('random', 7, 10), [4, 4] ))
+
+	def testFullAdder(self):
+		result = Sweep( full_adder, full_add, CircuitLibrary, processes=0 ).run()
+		self.assertEqual( result.vectors, 8 )
+		self.assertTrue( result.passed )
+
+	def testExhaustive(self):
+		sweep = Sweep( adder_5, add, CircuitLibrary, processes=2, shard_size=100 )
+		self.assertEqual( len(sweep.shards()), 11 )
+		result = sweep.run()
+		self.assertEqual( (result.vectors, result.simulated, result.mismatch_count), (1024, 1024, 0) )
+		self.assertGreater( result.vectors_per_sec_per_core, 0 )
+
+	def testRandom(self):
+		result = Sweep( adder_5, add, CircuitLibrary, processes=0, shard_size=64 ).run(count=200, seed=1)
+		self.assertEqual( result.vectors, 200 )
+		self.assertTrue( result.passed )
+
+	def testMismatches(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'mismatches.txt')
+			result = Sweep( adder_5, add_without_carry, CircuitLibrary, processes=0, mismatch_path=path, max_mismatches=3 ).run()
+			# the sums of 32 and more
+			self.assertEqual( result.mismatch_count, 496 )
+			self.assertEqual( len(result.mismatches), 3 )
+			vector, expected, actual = result.mismatches[0]
+			self.assertEqual( actual, (sum(vector),) )
+			with open(path) as f:
+				lines = [ json.loads(line) for line in f ]
+			self.assertEqual( len(lines), 496 )
+			self.assertTrue( all( sum(m['vector']) == m['actual'][0] != m['expected'][0] for m in lines ))
+
+	def testCheckpoints(self):
+		""" A sweep run again resumes from its checkpoints, and reports the same mismatches """
+		with tempfile.TemporaryDirectory() as directory:
+			checkpoints = os.path.join(directory, 'checkpoints')
+			path = os.path.join(directory, 'mismatches.txt')
+			sweep = Sweep( adder_5, add_without_carry, CircuitLibrary, processes=0, shard_size=256,
+				checkpoint_dir=checkpoints, mismatch_path=path )
+			first = sweep.run()
+			self.assertEqual( (first.resumed, len(os.listdir(checkpoints))), (0, 4) )
+			# an interrupted sweep: one shard is lost
+			os.remove( os.path.join(checkpoints, sorted(os.listdir(checkpoints))[1]) )
+			second = sweep.run()
+			self.assertEqual( (second.resumed, second.simulated, second.vectors), (3, 256, 1024) )
+			self.assertEqual( second.mismatch_count, first.mismatch_count )
+			with open(path) as f:
+				self.assertEqual( sum( 1 for line in f ), first.mismatch_count )
+			# the checkpoints of another sweep are not used
+			other = Sweep( adder_5, add, CircuitLibrary, processes=0, shard_size=256, checkpoint_dir=checkpoints ).run()
+			self.assertEqual( (other.resumed, other.mismatch_count), (0, 0) )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
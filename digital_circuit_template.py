@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+#
+# digital_circuit_template.py: reusable sub-circuits
+#
+# A CircuitTemplate captures, once, the gates a circuit function (HalfAdder, FullAdder...) builds,
+# in the layout of the netlist, over local wire numbers: the ports first, in the order they are
+# passed, then the internal wires. Stamping out an instance allocates the internal wires in one
+# block, and offsets the template's wire numbers: no Python construction code runs again, and
+# all the instances are connected in one bulk operation:
+#
+#	full_adder = CircuitTemplate(CircuitLibrary, 'FullAdder', 5)
+#	instantiate(sim, [ (full_adder, [a0, b0, c0, s0, c1]), (full_adder, [a1, b1, c1, s1, c2]) ])
+#
+#	ripple_carry_adder(sim, x, y, s)	# the templates of the simulator's class, cached
+
+from array import array
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+
+
+class CircuitTemplate(object):
+	""" The frozen netlist of a sub-circuit, with numbered ports """
+
+	def __init__(self, simulator_class, build, port_count, name=None):
+		"""
+		:param simulator_class: the class that provides the circuit functions build() calls
+		:param build: a method name of simulator_class, or a function sim, *ports -> ...
+		:param port_count: number of wires build() is passed
+		:param name: name of the template (default: the method or function name)
+		:type simulator_class: type
+		:type build: str or function
+		:type port_count: int
+		:type name: str
+		:raises ValueError: if the sub-circuit attaches procedures to its wires
+		"""
+		sim = simulator_class()
+		ports = sim.WireArray(port_count)
+		if isinstance(build, str):
+			getattr(sim, build)(*ports)
+		else:
+			build(sim, *ports)
+		if sim.actions:
+			raise ValueError('a template holds gates only: {} attaches procedures to its wires'.format(build))
+		net = sim.netlist
+		self.name = name or getattr(build, '__name__', build)
+		self.port_count = port_count
+		self.internal_count = net.wire_count - port_count
+		# the values of the internal wires (constants...)
+		self.internal_values = bytes( net.values[port_count:] )
+		self.gate_types = array('B', net.gate_type)
+		self.input_start = array('i', net.gate_input_start)
+		self.inputs = array('i', net.gate_inputs)
+		self.outputs = array('i', net.gate_output)
+
+	@property
+	def gate_count(self):
+		return len(self.gate_types)
+
+	def instantiate(self, sim, ports):
+		""" Stamp out one instance of the template
+
+		:param sim: the simulator to build the instance on
+		:param ports: the wires (or wire indices) connected to the ports, in order
+		:type sim: Simulator
+		:type ports: list
+		:returns: the range of the internal wires of the instance
+		:rtype: range
+		"""
+		return instantiate( sim, [ (self, ports) ] )[0]
+
+
+def instantiate(sim, instances):
+	""" Stamp out template instances on a simulator, and connect all their gates in one go. The
+	    gates keep the order of the instances.
+
+	:param sim: the simulator to build the instances on
+	:param instances: (template, ports) pairs, the ports being wires or wire indices
+	:type sim: Simulator
+	:type instances: list
+	:returns: the range of the internal wires of each instance
+	:rtype: list
+	"""
+	net = sim.netlist
+	for template, ports in instances:
+		if len(ports) != template.port_count:
+			raise ValueError('{} has {} ports, {} given'.format(template.name, template.port_count, len(ports)))
+	# the internal wires of all the instances, in one block
+	first_wire = net.new_wires( sum( template.internal_count for template, ports in instances )).start
+	gate_types = array('B')
+	input_start = array('i', [0])
+	inputs = array('i')
+	outputs = array('i')
+	internals = []
+	k = 0
+	while k < len(instances):
+		# a run of instances of the same template is stamped out at once
+		template = instances[k][0]
+		end = k + 1
+		while end < len(instances) and instances[end][0] is template:
+			end += 1
+		m = end - k
+		width = template.port_count + template.internal_count
+		# local wire number of instance i -> wire index: wire_map[ i*width + local ]
+		wire_map = []
+		for i, (t, ports) in enumerate(instances[k:end]):
+			wire_map.extend( w.index if isinstance(w, _WireObject) else w for w in ports )
+			internal = range( first_wire + i*template.internal_count, first_wire + (i+1)*template.internal_count )
+			wire_map.extend(internal)
+			internals.append(internal)
+			if any(template.internal_values):
+				net.values[ internal.start:internal.stop ] = template.internal_values
+		first_wire += m*template.internal_count
+		base = len(inputs)
+		n_inputs = len(template.inputs)
+		gate_types.extend( template.gate_types * m )
+		input_start.extend( array('i', [ base + i*n_inputs + s for i in range(m) for s in template.input_start[1:] ]) )
+		inputs.extend( array('i', map( wire_map.__getitem__, [ i*width + w for i in range(m) for w in template.inputs ] )))
+		outputs.extend( array('i', map( wire_map.__getitem__, [ i*width + w for i in range(m) for w in template.outputs ] )))
+		k = end
+	if gate_types:
+		sim._add_gates( gate_types, input_start, inputs, outputs )
+	return internals
+
+
+# (simulator class, method name) -> template
+_templates = {}
+
+def template_for(simulator_class, method_name, port_count):
+	""" The template of a circuit function of a simulator class, captured on first use
+
+	:rtype: CircuitTemplate
+	"""
+	template = _templates.get( (simulator_class, method_name) )
+	if template is None:
+		template = CircuitTemplate( simulator_class, method_name, port_count )
+		_templates[ (simulator_class, method_name) ] = template
+	return template
+
+
+def ripple_carry_adder(sim, x_arr, y_arr, s_arr):
+	""" The n-bit ripple-carry adder of the simulator's class (a half-adder, then n-1 full adders),
+	    stamped out from the templates of its HalfAdder() and FullAdder() functions
+
+	:param sim: the simulator to build the adder on
+	:param x_arr: first operand, a n-wire array (LSB on the left)
+	:param y_arr: second operand, a n-wire array (LSB on the left)
+	:param s_arr: sum, a n+1-wire array (LSB on the left)
+	:type sim: Simulator
+	:type x_arr: list
+	:type y_arr: list
+	:type s_arr: list
+	"""
+	n = len(x_arr)
+	half_adder = template_for( sim.__class__, 'HalfAdder', 4 )
+	full_adder = template_for( sim.__class__, 'FullAdder', 5 )
+	# carries: c[i] is the carry out of bit i, the last one is the MSB of the sum
+	c = list( sim.netlist.new_wires(n-1) ) + [ s_arr[n] ]
+	instances = [ (half_adder, [ x_arr[0], y_arr[0], s_arr[0], c[0] ]) ]
+	instances.extend( (full_adder, [ x_arr[i], y_arr[i], c[i-1], s_arr[i], c[i] ]) for i in range(1, n) )
+	instantiate( sim, instances )
+	return 'ok'
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+#
+# digital_circuit_template_test.py: unit tests for the circuit templates
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary, NativeCircuitLibrary
+from digital_circuit_template import *
+
+
+class CircuitTemplateUnitTest( unittest.TestCase ):
+
+	def testCapture(self):
+		half_adder = CircuitTemplate(CircuitLibrary, 'HalfAdder', 4)
+		self.assertEqual( half_adder.name, 'HalfAdder' )
+		self.assertEqual( half_adder.gate_count, 4 )
+		self.assertEqual( half_adder.internal_count, 2 )
+		# the ports come first: a, b, s, c
+		self.assertEqual( sorted(half_adder.outputs)[:2], [2, 3] )
+
+	def testFullAdder(self):
+		full_adder = template_for(CircuitLibrary, 'FullAdder', 5)
+		sim = CircuitLibrary()
+		a, b, c_in, s, c_out = sim.WireArray(5)
+		internal = full_adder.instantiate( sim, [a, b, c_in, s, c_out] )
+		self.assertEqual( len(internal), full_adder.internal_count )
+		self.assertEqual( sim.netlist.gate_count, full_adder.gate_count )
+		for v in range(8):
+			sim.set_wires( [a, b, c_in], v )
+			sim.propagate()
+			self.assertEqual( sim.wires_to_integer([s, c_out]), bin(v).count('1') )
+
+	def testRippleCarryAdder(self):
+		""" The stamped-out adder is the adder RippleCarryAdder() builds """
+		for library in (CircuitLibrary, NativeCircuitLibrary):
+			for n in (1, 2, 7, 32):
+				sim = library()
+				x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+				ripple_carry_adder(sim, x, y, s)
+				reference = library()
+				reference.RippleCarryAdder( reference.WireArray(n), reference.WireArray(n), reference.WireArray(n+1) )
+				self.assertEqual( sim.netlist.gate_count, reference.netlist.gate_count )
+				rng = random.Random(n)
+				for i in range(20):
+					a, b = rng.getrandbits(n), rng.getrandbits(n)
+					sim.set_wires(x, a)
+					sim.set_wires(y, b)
+					sim.propagate()
+					self.assertEqual( sim.wires_to_integer(s), a+b, (library.__name__, n) )
+
+	def testFunctionTemplate(self):
+		""" A template built by a function, with a constant internal wire """
+		def and_one_or(sim, a, b, o):
+			one, t = sim.Wire(), sim.Wire()
+			sim.netlist.values[one.index] = 1
+			sim.AndGate(a, one, t)
+			sim.OrGate(t, b, o)
+		template = CircuitTemplate(Simulator, and_one_or, 3)
+		self.assertEqual( template.name, 'and_one_or' )
+		sim = Simulator()
+		ports = [ sim.WireArray(3) for i in range(3) ]
+		instantiate( sim, [ (template, p) for p in ports ] )
+		ports[0][0].set_signal(1)
+		ports[2][1].set_signal(1)
+		sim.propagate()
+		self.assertEqual( [ p[2].get_signal() for p in ports ], [1, 0, 1] )
+
+	def testInvalid(self):
+		def probed(sim, a, b):
+			sim.Inverter(a, b)
+			b.probe('b')
+		self.assertRaises( ValueError, CircuitTemplate, Simulator, probed, 2 )
+		half_adder = template_for(CircuitLibrary, 'HalfAdder', 4)
+		sim = CircuitLibrary()
+		self.assertRaises( ValueError, half_adder.instantiate, sim, sim.WireArray(3) )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
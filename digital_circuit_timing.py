@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+#
+# digital_circuit_timing.py: static timing analysis
+#
+# The worst-case settle time of a circuit, without simulation: one pass over the netlist, in
+# topological order, gives the latest arrival time of every wire (a gate's output arrives its delay
+# after the latest of its inputs); one pass in reverse order gives the time every wire is required
+# by, for the outputs to settle in time; their difference is the slack. Both passes are linear in
+# the size of the netlist, and the critical path is followed back from the latest output.
+#
+#	sta = TimingAnalysis(sim)
+#	sta.delay			# worst settle time of the outputs
+#	sta.critical_path()		# [ PathStep(wire, gate, arrival), ... ]
+#	sta.slack_of(s[3])
+#
+# The analysis is topological: it assumes every path can be sensitized, so that the delay is an
+# upper bound on any settle time observed in simulation (tight for adders). Only gates are timed:
+# the procedures attached to the wires (word-level operations, probes) are ignored.
+
+import collections
+import itertools
+import operator
+from array import array
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+from digital_circuit_levelized import CombinationalLoopException
+
+
+# a step of a timing path: the wire, the gate that drives it (None for an input), and its arrival time
+PathStep = collections.namedtuple("PathStep", "wire gate arrival")
+
+# required time of the wires that no output depends on
+_UNCONSTRAINED = 2**62
+
+
+class TimingAnalysis(object):
+	""" Arrival times, required times and slacks of the wires of the netlist built on a simulator,
+	    with the gate delays of the simulator (inverter_delay, and_gate_delay, or_gate_delay...) """
+
+	def __init__(self, sim, outputs=None, required_time=None):
+		"""
+		:param sim: the simulator the circuit was built on
+		:param outputs: the wires that must settle (default: the driven wires that no gate reads)
+		:param required_time: the time the outputs must settle by (default: the latest output arrival time)
+		:type sim: Simulator
+		:type outputs: list
+		:type required_time: int
+		:raises CombinationalLoopException: if the netlist contains a loop
+		"""
+		self.simulator = sim
+		net = sim.netlist
+		# flat lists, built once and indexed by the passes: the input slots of gate g are
+		# _start[g] to _start[g+1]-1 in _inputs; the output wire and the delay of each gate
+		self._start = net.gate_input_start.tolist()
+		self._inputs = net.gate_inputs.tolist()
+		self._output = net.gate_output.tolist()
+		self._gate_delays = list( map( sim._delays().__getitem__, net.gate_type ))
+		self.order = self._topological_order(net)
+		if outputs is None:
+			read = set(self._inputs)
+			self.outputs = [ w for w, d in enumerate(net.driver) if d >= 0 and w not in read ]
+		else:
+			self.outputs = [ w.index if isinstance(w, _WireObject) else w for w in outputs ]
+		self._arrival_times(net)
+		self.delay = max( (self.arrival[w] for w in self.outputs), default=0 )
+		self.required_time = self.delay if required_time is None else required_time
+		self._required_times(net)
+
+	def _topological_order(self, net):
+		""" The gates, each after the gates that drive its inputs. The gates are usually created after
+		    the gates that drive them, in which case the creation order is kept; otherwise Kahn's
+		    algorithm runs over the CSR fan-out (built here only). """
+		start, inputs, gate_output = self._start, self._inputs, self._output
+		driver = net.driver
+		# the driver of each input slot, and the gate it belongs to; the loops run in C
+		slot_driver = list( map( driver.__getitem__, inputs ))
+		slot_gate = list( itertools.chain.from_iterable( map( itertools.repeat, range(net.gate_count),
+			map( operator.sub, itertools.islice(start, 1, None), start ))))
+		if all( map( operator.lt, slot_driver, slot_gate ) ):
+			return range(net.gate_count)
+		net.update_fanout(force=True)
+		fanout_start, fanout = net.fanout_start, net.fanout
+		# number of driven inputs not timed yet, for each gate
+		pending = array('i', [0]*net.gate_count)
+		for g, d in zip(slot_gate, slot_driver):
+			if d >= 0:
+				pending[g] += 1
+		order = array('i', [ g for g, count in enumerate(pending) if count == 0 ])
+		k = 0
+		while k < len(order):
+			w = gate_output[ order[k] ]
+			k += 1
+			for h in fanout[ fanout_start[w]:fanout_start[w+1] ]:
+				pending[h] -= 1
+				if pending[h] == 0:
+					order.append(h)
+		if len(order) != net.gate_count:
+			raise CombinationalLoopException('{} gates are part of, or depend on, a loop'.format(net.gate_count-len(order)))
+		return order
+
+	def _arrival_times(self, net):
+		start, inputs, gate_output, gate_delays = self._start, self._inputs, self._output, self._gate_delays
+		arrival = [0]*net.wire_count
+		for g in self.order:
+			k, end = start[g], start[g+1]
+			a = arrival[ inputs[k] ]
+			k += 1
+			while k < end:
+				t = arrival[ inputs[k] ]
+				if t > a:
+					a = t
+				k += 1
+			arrival[ gate_output[g] ] = a + gate_delays[g]
+		self.arrival = arrival
+
+	def _critical_input(self, g):
+		""" The input of a gate its output arrival time comes from """
+		return max( self._inputs[ self._start[g]:self._start[g+1] ], key=self.arrival.__getitem__ )
+
+	def _required_times(self, net):
+		start, inputs, gate_output, gate_delays = self._start, self._inputs, self._output, self._gate_delays
+		required = [_UNCONSTRAINED]*net.wire_count
+		for w in self.outputs:
+			required[w] = self.required_time
+		for g in reversed(self.order):
+			r = required[ gate_output[g] ]
+			if r == _UNCONSTRAINED:
+				continue
+			r -= gate_delays[g]
+			k, end = start[g], start[g+1]
+			while k < end:
+				w = inputs[k]
+				if r < required[w]:
+					required[w] = r
+				k += 1
+		self.required = required
+
+	def arrival_of(self, wire):
+		""" The latest time a wire settles, after its inputs changed at time 0
+
+		:param wire: a wire (or its index)
+		:type wire: _WireObject
+		:rtype: int
+		"""
+		return self.arrival[ wire.index if isinstance(wire, _WireObject) else wire ]
+
+	def required_of(self, wire):
+		""" The latest time a wire may settle for the outputs to settle by the required time
+
+		:param wire: a wire (or its index)
+		:type wire: _WireObject
+		:returns: the required time, or None if no output depends on the wire
+		:rtype: int
+		"""
+		r = self.required[ wire.index if isinstance(wire, _WireObject) else wire ]
+		return None if r == _UNCONSTRAINED else r
+
+	def slack_of(self, wire):
+		""" Required time minus arrival time: 0 on the critical path (with the default required time),
+		    negative if the wire is late
+
+		:param wire: a wire (or its index)
+		:type wire: _WireObject
+		:returns: the slack, or None if no output depends on the wire
+		:rtype: int
+		"""
+		r = self.required_of(wire)
+		return None if r is None else r - self.arrival_of(wire)
+
+	def critical_path(self, output=None):
+		""" The path of latest arrival times to an output, from the input it starts at
+
+		:param output: the end of the path (default: the latest output)
+		:type output: _WireObject
+		:returns: PathStep tuples (wire, index of the driving gate or None, arrival time), input first
+		:rtype: list
+		"""
+		net = self.simulator.netlist
+		if output is None:
+			if not self.outputs:
+				return []
+			w = max( self.outputs, key=lambda w: self.arrival[w] )
+		else:
+			w = output.index if isinstance(output, _WireObject) else output
+		path = []
+		while True:
+			g = net.driver[w]
+			path.append( PathStep( _WireObject(self.simulator, w), g if g >= 0 else None, self.arrival[w] ))
+			if g < 0:
+				break
+			w = self._critical_input(g)
+		path.reverse()
+		return path
+
+	def report(self, n=None):
+		""" The critical path, in printable form
+
+		:param n: maximum number of steps listed (the last ones)
+		:type n: int
+		:rtype: str
+		"""
+		net = self.simulator.netlist
+		path = self.critical_path()
+		lines = [ 'delay {}, {} gates, {} outputs, critical path of {} gates'.format(
+			self.delay, net.gate_count, len(self.outputs), max(len(path)-1, 0)) ]
+		for step in (path if n is None else path[-n:]):
+			gate = 'input' if step.gate is None else '{} gate {}'.format( GATE_TYPES[ net.gate_type[step.gate] ], step.gate )
+			lines.append( '  {:>8}  wire {} ({})  {}'.format( step.arrival, step.wire.index, step.wire.name, gate ))
+		return '\n'.join(lines)
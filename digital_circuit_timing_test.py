@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+#
+# digital_circuit_timing_test.py: unit tests for the static timing analysis
+
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_timing import *
+
+
+class TimingAnalysisUnitTest( unittest.TestCase ):
+
+	def _adder(self, n, adder='RippleCarryAdder'):
+		sim = CircuitLibrary()
+		x, y, s = sim.WireArray(n), sim.WireArray(n), sim.WireArray(n+1)
+		getattr(sim, adder)(x, y, s)
+		sim.propagate()
+		return sim, x, y, s
+
+	def testArrivalTimes(self):
+		""" o = x.!x: the AND gate waits for the inverter """
+		sim = Simulator()
+		x, nx, o, unused = sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire()
+		sim.AndGate(x, nx, o)
+		sim.Inverter(x, nx)
+		sim.Inverter(x, unused)
+		sta = TimingAnalysis(sim, outputs=[o])
+		self.assertEqual( [ sta.arrival_of(w) for w in (x, nx, o) ], [0, 2, 5] )
+		self.assertEqual( sta.delay, 5 )
+		self.assertEqual( [ sta.slack_of(w) for w in (x, nx, o) ], [0, 0, 0] )
+		self.assertIsNone( sta.slack_of(unused) )
+		self.assertEqual( [ (step.wire, step.arrival) for step in sta.critical_path() ], [ (x, 0), (nx, 2), (o, 5) ])
+		self.assertEqual( sta.critical_path()[0].gate, None )
+
+		sta = TimingAnalysis(sim, outputs=[o], required_time=4)
+		self.assertEqual( sta.slack_of(o), -1 )
+
+	def testRippleCarryAdder(self):
+		""" The carry chain is the critical path, and the delay is the settle time of the worst vector """
+		n = 16
+		sim, x, y, s = self._adder(n)
+		sta = TimingAnalysis(sim)
+		path = sta.critical_path()
+		self.assertIn( path[0].wire, x+y )
+		self.assertIn( path[-1].wire, s )
+		self.assertEqual( path[-1].arrival, sta.delay )
+		self.assertEqual( min( sta.slack_of(w) for w in s ), 0 )
+		self.assertTrue( all( sta.slack_of(w) >= 0 for w in x+y+s ))
+
+		sim.set_wires(x, 2**n - 1)
+		sim.propagate()
+		start = sim.agenda.current_time
+		sim.set_wires(y, 1)
+		sim.propagate()
+		self.assertEqual( sim.agenda.current_time - start, sta.delay )
+
+	def testUpperBound(self):
+		""" No simulated settle time exceeds the static delay """
+		n = 12
+		for adder in ('RippleCarryAdder', 'KoggeStoneAdder', 'CarryLookaheadAdder'):
+			sim, x, y, s = self._adder(n, adder)
+			delay = TimingAnalysis(sim).delay
+			rng = random.Random(0)
+			for v in range(50):
+				sim.set_wires(x, rng.getrandbits(n))
+				sim.set_wires(y, rng.getrandbits(n))
+				start = sim.agenda.current_time
+				sim.propagate()
+				self.assertLessEqual( sim.agenda.current_time - start, delay, adder )
+
+	def testCreationOrder(self):
+		""" Gates created before the gates that drive them """
+		sim = Simulator()
+		a, b, c, d = sim.Wire(), sim.Wire(), sim.Wire(), sim.Wire()
+		sim.OrGate(c, a, d)
+		sim.Inverter(b, c)
+		sim.AndGate(a, a, b)
+		sta = TimingAnalysis(sim)
+		self.assertEqual( list(sta.order), [2, 1, 0] )
+		self.assertEqual( sta.delay, 10 )
+
+	def testLoop(self):
+		sim = Simulator()
+		a, b = sim.Wire(), sim.Wire()
+		sim.Inverter(a, b)
+		sim.Inverter(b, a)
+		self.assertRaises( CombinationalLoopException, TimingAnalysis, sim )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+#
+# digital_circuit_waveform.py: waveform recording
+#
+# A recorder attaches to a simulator, and records the transitions of the selected wires (or of
+# all wires), stamped with the simulated time. Transitions are appended to two flat arrays
+# (times, and codes (wire << 1) | value) by the simulation loop itself, then written out in
+# chunks: the cost of recording is a couple of appends per transition.
+#
+# Two formats are available:
+#
+# - VCD (Value Change Dump, IEEE 1364), that waveform viewers (GTKWave...) read
+# - a compact binary format (see BinaryWaveformWriter), and its reader
+#
+#	with VCDWriter(sim, 'adder.vcd', wires=x+y+s):
+#		sim.set_wires(x, 23)
+#		sim.propagate()
+
+import sys
+import struct
+from array import array
+
+from digital_circuit_core import *
+from digital_circuit_core import _WireObject
+
+
+class WaveformRecorder(object):
+	""" Base class of the waveform writers: the transitions are buffered, then written in chunks
+	 of up to buffer_size transitions.
+
+	 The set of recorded wires is fixed when the recorder is created: wires created afterwards
+	 are not recorded.
+	"""
+
+	binary = False
+
+	def __init__(self, sim, out, wires=None, names=None, buffer_size=65536):
+		"""
+		:param sim: the simulator to record
+		:param out: a path or a file object (None for recorders that keep the transitions in memory)
+		:param wires: the wires to record (default: all the wires of the simulator)
+		:param names: wire index -> name (default: the wire's name, or 'n<index>' for unnamed wires)
+		:param buffer_size: number of transitions kept in memory before writing them out
+		:type sim: Simulator
+		:type wires: list
+		:type names: dict
+		:type buffer_size: int
+		"""
+		if isinstance(out, str):
+			self.out = open(out, 'wb' if self.binary else 'w')
+			self.owns_file = True
+		else:
+			self.out = out
+			self.owns_file = False
+		self.simulator = sim
+		if wires is None:
+			self.indices = list(range(sim.wire_count))
+		else:
+			self.indices = [ (w.index if isinstance(w, _WireObject) else w) for w in wires ]
+		names = names or {}
+		self.names = [ names.get(w) or _WireObject(sim, w).name or 'n{}'.format(w) for w in self.indices ]
+		self.buffer_size = buffer_size
+		self.times = array('q')
+		self.codes = array('i')
+		self._watched = bytearray(sim.wire_count)
+		for w in self.indices:
+			self._watched[w] = 1
+		self.transition_count = 0
+		self.started = False
+
+	def watched(self, wire_count):
+		""" For the simulation loop: the recorded wire flags (a bytearray covering wire_count wires),
+		    and the time and code buffers to append the transitions to
+
+		:rtype: tuple
+		"""
+		if len(self._watched) < wire_count:
+			self._watched.extend( bytes(wire_count - len(self._watched)) )
+		return self._watched, self.times, self.codes
+
+	def record(self, time, w, value):
+		""" Record a transition, if the wire is recorded
+
+		:param time: simulated time
+		:param w: wire index
+		:param value: new value
+		:type time: int
+		:type w: int
+		:type value: int
+		"""
+		if w < len(self._watched) and self._watched[w]:
+			self.times.append(time)
+			self.codes.append( (w << 1) | value )
+			if len(self.codes) >= self.buffer_size:
+				self.flush()
+
+	def start(self):
+		""" Write the header and the current values, then attach to the simulator """
+		if self.started:
+			return
+		self.started = True
+		self._write_header()
+		values = self.simulator.netlist.values
+		time = self.simulator.agenda.current_time
+		for w in self.indices:
+			self.times.append(time)
+			self.codes.append( (w << 1) | values[w] )
+		self.flush()
+		self.simulator.waveform = self
+
+	def stop(self):
+		""" Detach from the simulator (the recorder can be started again, on the same output) """
+		if self.simulator.waveform is self:
+			self.simulator.waveform = None
+		self.flush()
+
+	def flush(self):
+		if self.codes:
+			self.transition_count += len(self.codes)
+			self._write_chunk( self.times, self.codes )
+			# the simulation loop holds references to the buffers: empty them in place
+			del self.times[:]
+			del self.codes[:]
+		if self.out is not None:
+			self.out.flush()
+
+	def close(self):
+		self.stop()
+		if self.owns_file:
+			self.out.close()
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+def _vcd_identifier(k):
+	""" Short VCD identifier of the k-th variable, made of printable characters ('!' to '~') """
+	identifier = ''
+	while True:
+		identifier += chr(33 + k % 94)
+		k //= 94
+		if k == 0:
+			return identifier
+
+
+class VCDWriter(WaveformRecorder):
+	""" Waveform writer, in the Value Change Dump format::
+
+		$timescale 1ns $end
+		$scope module circuit $end
+		$var wire 1 ! x $end
+		...
+		$enddefinitions $end
+		#0
+		0!
+		#3
+		1!
+	"""
+
+	def __init__(self, sim, out, wires=None, names=None, buffer_size=65536, timescale='1ns', module='circuit'):
+		"""
+		:param timescale: the time unit of the simulated time
+		:param module: name of the scope the wires are declared in
+		:type timescale: str
+		:type module: str
+		"""
+		WaveformRecorder.__init__(self, sim, out, wires, names, buffer_size)
+		self.timescale = timescale
+		self.module = module
+		self.identifiers = dict( (w, _vcd_identifier(k)) for k, w in enumerate(self.indices) )
+		self.last_time = None
+
+	def _write_header(self):
+		lines = [ '$version digital_circuit $end', '$timescale {} $end'.format(self.timescale),
+			'$scope module {} $end'.format(self.module) ]
+		for w, name in zip(self.indices, self.names):
+			lines.append( '$var wire 1 {} {} $end'.format(self.identifiers[w], name.replace(' ', '_')) )
+		lines += [ '$upscope $end', '$enddefinitions $end', '' ]
+		self.out.write( '\n'.join(lines) )
+
+	def _write_chunk(self, times, codes):
+		identifiers = self.identifiers
+		last_time = self.last_time
+		lines = []
+		for time, code in zip(times, codes):
+			if time != last_time:
+				lines.append( '#{}'.format(time) )
+				last_time = time
+			lines.append( '01'[code & 1] + identifiers[code >> 1] )
+		lines.append('')
+		self.last_time = last_time
+		self.out.write( '\n'.join(lines) )
+
+
+def read_vcd(f):
+	""" Decode a VCD file made of scalar wires: yield the transitions as (time, name, value) tuples
+
+	:param f: a text file object
+	:rtype: generator
+	"""
+	names = {}
+	time = 0
+	for line in f:
+		tokens = line.split()
+		if not tokens:
+			continue
+		if tokens[0] == '$var':
+			names[ tokens[3] ] = tokens[4]
+		elif tokens[0][0] == '#':
+			time = int(tokens[0][1:])
+		elif tokens[0][0] in '01xz' and not tokens[0].startswith('$'):
+			for token in tokens:
+				if token[1:] in names:
+					yield (time, names[token[1:]], int(token[0]) if token[0] in '01' else None)
+
+
+_BINARY_MAGIC = b'DCWF\x01'
+_HEADER = struct.Struct('<I')
+_NAME = struct.Struct('<IH')
+
+def _little_endian(a):
+	if sys.byteorder != 'little':
+		a = array(a.typecode, a)
+		a.byteswap()
+	return a.tobytes()
+
+class BinaryWaveformWriter(WaveformRecorder):
+	""" Waveform writer, in a compact little-endian binary format:
+
+	- header: magic 'DCWF\\x01', number of wires (uint32), then for each wire: index (uint32),
+	  name length (uint16), name (utf-8)
+	- chunks: number of transitions n (uint32), n times (int64), n codes (int32): (wire index << 1) | value
+
+	See read_binary_waveform().
+	"""
+
+	binary = True
+
+	def _write_header(self):
+		parts = [ _BINARY_MAGIC, _HEADER.pack(len(self.indices)) ]
+		for w, name in zip(self.indices, self.names):
+			name = name.encode('utf-8')
+			parts.append( _NAME.pack(w, len(name)) + name )
+		self.out.write( b''.join(parts) )
+
+	def _write_chunk(self, times, codes):
+		self.out.write( _HEADER.pack(len(codes)) + _little_endian(times) + _little_endian(codes) )
+
+
+def read_binary_waveform(f):
+	""" Decode a binary waveform: yield the transitions as (time, name, value) tuples
+
+	:param f: a binary file object
+	:rtype: generator
+	"""
+	data = f.read()
+	if not data.startswith(_BINARY_MAGIC):
+		raise ValueError('not a binary waveform')
+	pos = len(_BINARY_MAGIC)
+	count, = _HEADER.unpack_from(data, pos)
+	pos += _HEADER.size
+	names = {}
+	for k in range(count):
+		w, length = _NAME.unpack_from(data, pos)
+		pos += _NAME.size
+		names[w] = data[pos:pos+length].decode('utf-8')
+		pos += length
+	while pos < len(data):
+		n, = _HEADER.unpack_from(data, pos)
+		pos += _HEADER.size
+		times, codes = array('q'), array('i')
+		times.frombytes( data[pos:pos+8*n] )
+		pos += 8*n
+		codes.frombytes( data[pos:pos+4*n] )
+		pos += 4*n
+		if sys.byteorder != 'little':
+			times.byteswap()
+			codes.byteswap()
+		for time, code in zip(times, codes):
+			yield (time, names[code >> 1], code & 1)
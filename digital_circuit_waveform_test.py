@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+#
+# digital_circuit_waveform_test.py: unit tests for the waveform writers
+
+import io
+import random
+import unittest
+from digital_circuit_library import CircuitLibrary
+from digital_circuit_waveform import *
+
+
+class WaveformUnitTest( unittest.TestCase ):
+
+	def _glitch(self, sim):
+		x, y, o = sim.Wire('x'), sim.Wire('y'), sim.Wire('o')
+		sim.Inverter(x, y)
+		sim.AndGate(x, y, o)
+		sim.propagate()
+		return x, y, o
+
+	def testVCD(self):
+		sim = Simulator()
+		x, y, o = self._glitch(sim)
+		start = sim.agenda.current_time
+		out = io.StringIO()
+		with VCDWriter( sim, out, wires=[x, y, o], names={ x.index: 'x', y.index: 'y', o.index: 'o' }, buffer_size=2 ) as vcd:
+			self.assertIs( sim.waveform, vcd )
+			x.set_signal(1)
+			sim.propagate()
+		self.assertIsNone( sim.waveform )
+		self.assertEqual( vcd.transition_count, 7 )
+		self.assertIn( '$var wire 1 " y $end', out.getvalue() )
+		out.seek(0)
+		transitions = [ (t - start, name, value) for t, name, value in read_vcd(out) ]
+		self.assertEqual( transitions, [ (0, 'x', 0), (0, 'y', 1), (0, 'o', 0), (0, 'x', 1), (2, 'y', 0), (3, 'o', 1), (5, 'o', 0) ])
+
+	def testSelection(self):
+		""" Only the selected wires are recorded """
+		sim = Simulator()
+		x, y, o = self._glitch(sim)
+		out = io.StringIO()
+		with VCDWriter( sim, out, wires=[o] ):
+			x.set_signal(1)
+			sim.propagate()
+		out.seek(0)
+		self.assertEqual( [ value for t, name, value in read_vcd(out) ], [0, 1, 0] )
+
+	def testBinary(self):
+		""" The binary format carries the same transitions, whether the loop is the fast or the instrumented one """
+		recordings = []
+		for traced in (False, True):
+			sim = CircuitLibrary()
+			x, y, s = sim.WireArray(8), sim.WireArray(8), sim.WireArray(9)
+			sim.RippleCarryAdder(x, y, s)
+			sim.propagate()
+			out = io.BytesIO()
+			rng = random.Random(1)
+			names = dict( (w, 'w{}'.format(w)) for w in range(sim.wire_count) )
+			with BinaryWaveformWriter( sim, out, names=names, buffer_size=100 ):
+				if traced:
+					set_trace_sink( JSONLTraceSink(io.StringIO()) )
+				for i in range(20):
+					sim.set_wires(x, rng.getrandbits(8))
+					sim.set_wires(y, rng.getrandbits(8))
+					sim.propagate()
+				set_trace_sink(None)
+			out.seek(0)
+			recordings.append( list( read_binary_waveform(out) ))
+			# the last values recorded on the sum wires are the final ones
+			final = {}
+			for t, name, value in recordings[-1]:
+				final[name] = value
+			self.assertEqual( [ final[ names[w.index] ] for w in s ], [ w.get_signal() for w in s ] )
+		self.assertEqual( recordings[0], recordings[1] )
+		self.assertGreater( len(recordings[0]), 100 )
+
+
+def main():
+	unittest.main()
+
+if __name__ == '__main__':
+	main()